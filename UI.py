@@ -9,7 +9,21 @@ from tkinter import ttk
 import re
 import os
 import datetime
+import json
+import threading
 import danmu_multitransmit
+import msg_queue
+import metrics
+import segmentation
+import blocked_words
+import history_writer
+import session_log
+import history_index
+import scrollback
+import status_channel
+
+
+STATUS_BATCH = 500  # 界面每次最多处理多少个发送结果
 
 
 class DataManager():
@@ -181,35 +195,6 @@ class MainInterface():
         self.word_fix_index = 0  # 索引，用于切换前后缀
         self.words_limit_len = 20  # 一句话最大长度，好像b站20级以下用户限制是20,20级以上是30，该参数从文件中读取
 
-        try:
-            if not os.path.exists("./history/"):
-                # 保存历史记录
-                os.makedirs("./history/")  # 创建文件夹
-        except:
-            tkinter.messagebox.showerror(
-                title='提示',
-                message='创建history文件夹失败，exception in MainInterface:__init__',
-                parent=self.root  # 这样才会显示在当前窗口上方
-            )
-            print("创建history文件夹失败，exception in MainInterface:__init__")
-            exit(-1)
-        cur_time = datetime.datetime.strftime(datetime.datetime.now(), '%Y-%m-%d_%H-%M-%S')
-        # 创建文件用来存数据，文件名不能有'< > / \ | : " * ?'这些字符
-        try:
-            self.Logger = open("./history/"+cur_time+".txt", "a", encoding="utf-8")
-            self.Logger.write('room_list:'+ str(room_id_list) + '\n')
-            self.Logger.write('content_sample:' + content_sample + '\n')
-            self.Logger.write('word_fix_list:' + str(word_fix_list) + '\n')
-            self.Logger.write('####\n')
-            # self.Logger.flush()
-        except IOError:
-            tkinter.messagebox.showerror(
-                title='提示',
-                message='日志文件创建或写入失败，exception in MainInterface:__init__',
-                parent=self.root  # 这样才会显示在当前窗口上方
-            )
-            print("日志文件创建或写入失败，exception in MainInterface:__init__")
-            exit(-1)
         try:
             with open("./config/UIConfig.txt", 'r', encoding="utf-8") as f:
                 data_dict = {}
@@ -243,16 +228,16 @@ class MainInterface():
             exit(-1)
 
         try:
-            with open("./config/RunningConfig.txt", 'r', encoding="utf-8") as f:
-                all_lines = f.readlines()
-                for line in all_lines:
-                    line = line.strip(" \r\n")
-                    if len(line) == 0:
-                        continue
-                    parts = re.split("[: \t\r\n]+", line, 1)
-                    if parts[0] == "words_limit":
-                        self.words_limit_len = int(parts[1])
-                        break
+            running_info = danmu_multitransmit.readRunningConfig()
+            if 'words_limit' in running_info:
+                self.words_limit_len = int(running_info['words_limit'])
+            # 有多个账号时每条弹幕可能由任意一个账号发送，取各账号中最小的限制
+            account_list = danmu_multitransmit.parseAccounts(running_info)
+            if len(account_list) > 0:
+                self.words_limit_len = min(account['words_limit'] for account in account_list)
+            # 记录框最多保留多少行，超出时一次去掉多少行
+            self.scrollback_lines = int(running_info.get('scrollback_lines', '1000'))
+            self.scrollback_chunk = max(1, int(running_info.get('scrollback_chunk', '200')))
         except IOError:
             tkinter.messagebox.showerror(
                 title='提示',
@@ -270,6 +255,56 @@ class MainInterface():
             print("其他错误，exception in MainInterface:__init__")
             exit(-1)
 
+        try:
+            if not os.path.exists("./history/"):
+                # 保存历史记录
+                os.makedirs("./history/")  # 创建文件夹
+        except:
+            tkinter.messagebox.showerror(
+                title='提示',
+                message='创建history文件夹失败，exception in MainInterface:__init__',
+                parent=self.root  # 这样才会显示在当前窗口上方
+            )
+            print("创建history文件夹失败，exception in MainInterface:__init__")
+            exit(-1)
+        cur_time = datetime.datetime.strftime(datetime.datetime.now(), '%Y-%m-%d_%H-%M-%S')
+        # 创建文件用来存数据，文件名不能有'< > / \ | : " * ?'这些字符
+        try:
+            # 由后台线程写入，界面线程不会被慢的磁盘卡住
+            self.Logger = history_writer.createHistoryWriter("./history/"+cur_time+".txt", running_info)
+            self.Logger.write('room_list:'+ str(room_id_list) + '\n')
+            self.Logger.write('content_sample:' + content_sample + '\n')
+            self.Logger.write('word_fix_list:' + str(word_fix_list) + '\n')
+            self.Logger.write('####\n')
+            # self.Logger.flush()
+            # 结构化的发送日志，记录每条消息在各直播间的发送情况，session_log为0时为None
+            self.session_log = session_log.createSessionLog("./history/"+cur_time+".jsonl", running_info)
+            if self.session_log is not None:
+                self.session_log.onSession(room_id_list, content_sample, word_fix_list)
+            # 发送的内容在后台加入history/index.db，可以用history_index.py查找，history_index为0时为None
+            self.history_indexer = history_index.createHistoryIndexer(
+                cur_time+".txt", room_id_list, content_sample, running_info)
+        except IOError:
+            tkinter.messagebox.showerror(
+                title='提示',
+                message='日志文件创建或写入失败，exception in MainInterface:__init__',
+                parent=self.root  # 这样才会显示在当前窗口上方
+            )
+            print("日志文件创建或写入失败，exception in MainInterface:__init__")
+            exit(-1)
+
+        try:
+            # 本地屏蔽词，包含的弹幕不加入队列
+            self.blocked_filter = blocked_words.createBlockedWordFilter()
+        except IOError:
+            tkinter.messagebox.showerror(
+                title='提示',
+                message='屏蔽词文件读入失败，不检查屏蔽词，exception in MainInterface:__init__',
+                parent=self.root  # 这样才会显示在当前窗口上方
+            )
+            print("屏蔽词文件读入失败，exception in MainInterface:__init__")
+            self.blocked_filter = blocked_words.BlockedWordFilter()
+
         self.word_count_label = tkinter.Label(
             self.root,
             text=str(self.getFixLen()) + '/' + str(self.words_limit_len),  # 已经有前后缀了
@@ -341,10 +376,33 @@ class MainInterface():
             self.root,
             font=(self.font[0], int(self.font[1])),
             bg='#2B2B2B',
-            fg='white'
+            fg='white',
+            yscrollcommand=self.onHistoryScroll  # 滚动到最上面时读回去掉的行
         )
-        self.text_history.place(relx=0, y=40, relwidth=1, relheight=0.88)
+        self.scrollback = scrollback.SpillStore()  # 记录框中去掉的行
+        self.scrollback_loading = False
+        self.spilled_status_dict = {}  # 行已经被去掉时才出结果的点，key为点的mark，value为结果，读回来时再改颜色
+        self.text_history.place(relx=0, y=40, relwidth=1, relheight=1, height=-60)  # 下面留出状态栏
         self.text_history.config(state=tkinter.DISABLED)  # 禁止输入，自己要输入时再改normal
+        self.text_history.tag_configure('blocked', foreground='#FF6B6B', underline=True)  # 标出屏蔽词
+        # 每行后面每个直播间一个点，颜色表示在这个直播间的发送结果
+        self.text_history.tag_configure('room_' + status_channel.ROOM_PENDING, foreground='#808080')
+        self.text_history.tag_configure('room_sent', foreground='#6BCB77')
+        self.text_history.tag_configure('room_failed', foreground='#FF6B6B')
+        self.text_history.tag_configure('room_skipped', foreground='#FFD93D')
+        self.status_channel = status_channel.StatusChannel()  # 发送线程把各直播间的结果放到这里，界面线程取走
+        self.status_pending_dict = {}  # 还有直播间没出结果的消息，key为msg_id，value为还剩几个直播间
+        self.room_index_dict = {}  # 房间号对应每行后面的第几个点，run中设置
+
+        # 最下面的状态栏
+        self.status_label = tkinter.Label(
+            self.root,
+            text='',
+            bg='gray',
+            anchor='w',
+            font=(self.font[0], 9)
+        )
+        self.status_label.place(relx=0, rely=1, anchor='sw', relwidth=1, height=20)
 
         self.root.protocol("WM_DELETE_WINDOW", self.stop)  # 重写关闭窗口时的处理
 
@@ -356,6 +414,8 @@ class MainInterface():
         self.text_history.unbind("<Alt_L>")
 
         self.text_input.bind("<Return>", self.submitInputContent)  # 按下回车提交输入
+        self.text_input.bind("<Control-Return>", self.submitUrgentInputContent)  # Ctrl+回车优先发送
+        self.text_input.bind("<Control-b>", self.addBlockedWord)  # Ctrl+B把选中的内容加为屏蔽词
         # self.text_input.bind("<Up>", self.changeWordFixBackward)  # 上下方向键改变前后缀
         # self.text_input.bind("<Down>", self.changeWordFixForward)  # 上下方向键改变前后缀
         self.root.bind("<Tab>", self.changeWordFixForward)  # tab键改变前后缀
@@ -364,55 +424,197 @@ class MainInterface():
     def entryChange(self, new_str):
         # 是对下面字数限制函数的修改，不再限制字数
         # 加这个函数只是为了追踪每次输入变化，别的绑定方法应该也可以，这里简单处理，沿用之前的
-        total_len = len(new_str) + self.getFixLen()
+        total_len = segmentation.textLen(new_str) + self.getFixLen()  # 按b站的规则算长度
         self.word_count_label['text'] = str(total_len) + '/' + str(self.words_limit_len)  # 更改字数显示
+        self.text_input.configure(bg='#2B2B2B')  # 改过之后去掉包含屏蔽词的提示
         return True  # 不管输入多长都是返回True
 
     def entryNumValidate(self, new_str):
         # 输入字数验证
         # print(len(new_str))
-        total_len = len(new_str) + self.getFixLen()
+        total_len = segmentation.textLen(new_str) + self.getFixLen()
         if total_len <= self.words_limit_len:  # 加上前后缀后不超过限定
             self.word_count_label['text'] = str(total_len) + '/' + str(self.words_limit_len)  # 更改字数显示
             return True
         return False
 
-    def submitInputContent(self, event):
+    def submitUrgentInputContent(self, event):
+        # 提交一行着急的输入，会排在队列中普通消息的前面
+        self.submitInputContent(event, msg_queue.PRIORITY_HIGH)
+
+    def submitInputContent(self, event, priority=msg_queue.PRIORITY_NORMAL):
         # 提交一行输入
-        # 修改过后字数超出限制自动分行
+        # 修改过后字数超出限制自动分行，尽量在标点、空格处分，不会把一个字或单词从中间分开
         content = self.text_input.get()
-        limit_len = self.words_limit_len-self.getFixLen()  # 一次能填多长内容
+        limit_len = max(1, self.words_limit_len-self.getFixLen())  # 一次能填多长内容
         if content is not None:
-            while len(content) != 0:
-                to_send = content
-                if len(to_send) > limit_len:
-                    # 要分段
-                    to_send = content[0:limit_len]
-                    content = content[limit_len:len(content)]
-                else:
-                    content = ''  # 长度置0
-
+            segment_list = segmentation.splitText(content, limit_len)
+            # 先检查屏蔽词，有一段包含就都不发送，留在输入框里改了再发
+            fix = self.word_fix[self.word_fix_index] if len(self.word_fix) > 0 else ('', '')
+            blocked_list = []
+            for to_send in segment_list:
+                text = fix[0] + to_send + fix[1]
+                match_list = self.blocked_filter.findMatches(text)
+                if len(match_list) > 0:
+                    blocked_list.append((text, match_list))
+            if len(blocked_list) > 0:
+                self.showBlocked(content, blocked_list)
+                return
+            self.text_input.delete(0, tkinter.END)
+            for to_send in segment_list:
+                prefix = ''
+                suffix = ''
                 if len(self.word_fix) > 0:
                     the_fix = self.word_fix[self.word_fix_index]
                     self.Logger.write(the_fix[0] + the_fix[1] + ":" + to_send + "\n")  # 记录
-                    to_send = the_fix[0] + to_send + the_fix[1]  # 加上前后缀
+                    prefix, suffix = the_fix[0], the_fix[1]  # 发送时加上前后缀
                 else:
                     self.Logger.write(":" + to_send + "\n")  # 记录
-                self.text_history.config(state=tkinter.NORMAL)  # 之后再改为禁止
-                self.text_history.insert(tkinter.END, to_send+"\n")
-                self.text_history.see(tkinter.END)  # 显示最后部分
-                self.text_input.delete(0, tkinter.END)
+                if self.history_indexer is not None:
+                    self.history_indexer.addMessage(prefix + suffix, to_send)  # 和txt记录中一样，前后缀连在一起
+                danmu_msg = self.transmitter.createMsg(to_send, priority, prefix, suffix)
+                self.appendMsgLine(danmu_msg)  # 先显示为还没发送，发送结果由pollTransmitter更新
+
+                if not self.transmitter.addDanmuMsg(danmu_msg):
+                    # 消息队列满了，这条没有加入
+                    self.appendHistory("(消息队列已满，上一条未发送)\n")
+
+    def showBlocked(self, content, blocked_list):
+        # 输入框变红并选中第一个屏蔽词，记录里标出各段中的屏蔽词
+        self.text_input.configure(bg='#5C2B2B')
+        match_list = self.blocked_filter.findMatches(content)
+        if len(match_list) > 0:  # 也可能是加上前后缀之后才包含
+            self.text_input.selection_range(match_list[0][0], match_list[0][1])
+            self.text_input.icursor(match_list[0][1])
+        chunk_list = []  # 和Text.insert的参数一样，内容和标签交替
+        for text, match_list in blocked_list:
+            chunk_list += ["(包含屏蔽词，未发送：", ()]
+            pos = 0
+            for start, end in match_list:
+                chunk_list += [text[pos:start], (), text[start:end], 'blocked']
+                pos = end
+            chunk_list += [text[pos:] + ")\n", ()]
+        self.appendHistory(*chunk_list)
+
+    def addBlockedWord(self, event):
+        # 把输入框中选中的内容加为屏蔽词，之后包含它的弹幕都不会发送
+        if not self.text_input.selection_present():
+            return 'break'
+        content = self.text_input.get()
+        word = content[self.text_input.index(tkinter.SEL_FIRST):self.text_input.index(tkinter.SEL_LAST)]
+        if self.blocked_filter.addWord(word):
+            self.appendHistory("(已添加屏蔽词：", (), word.strip(), 'blocked', ")\n")
+        return 'break'  # 阻止事件继续传递
 
-                self.text_history.config(state=tkinter.DISABLED)  # 禁止输入，自己要输入时再改normal
+    def appendHistory(self, *chunks):
+        # 在记录框最后加入内容，参数和Text.insert一样，可以是内容和标签交替
+        self.text_history.config(state=tkinter.NORMAL)  # 之后再改为禁止
+        self.text_history.insert(tkinter.END, *chunks)
+        self.trimHistory()
+        self.text_history.see(tkinter.END)  # 显示最后部分
+        self.text_history.config(state=tkinter.DISABLED)  # 禁止输入，自己要输入时再改normal
 
-                self.transmitter.addMsg(to_send)
-                self.Logger.flush()
+    def getStatusMark(self, msg_id, room_index):
+        return 'status_' + str(msg_id) + '_' + str(room_index)
+
+    def appendMsgLine(self, danmu_msg):
+        # 加入一行消息，后面每个直播间一个点，点的位置用mark记下来，更新时不用在记录框里找
+        self.text_history.config(state=tkinter.NORMAL)
+        self.text_history.insert(tkinter.END, danmu_msg.text + ' ')
+        for room_index in range(len(self.room_index_dict)):
+            mark = self.getStatusMark(danmu_msg.msg_id, room_index)
+            self.text_history.mark_set(mark, 'end-1c')
+            self.text_history.mark_gravity(mark, tkinter.LEFT)  # 在后面插入内容时mark不动
+            self.text_history.insert(tkinter.END, '●', 'room_' + status_channel.ROOM_PENDING)
+        self.status_pending_dict[danmu_msg.msg_id] = len(self.room_index_dict)
+        self.text_history.insert(tkinter.END, '\n')
+        self.trimHistory()
+        self.text_history.see(tkinter.END)
+        self.text_history.config(state=tkinter.DISABLED)
+
+    def updateRoomStatus(self):
+        # 取出一批发送结果，把对应的点改成结果的颜色，一次最多处理STATUS_BATCH个，剩下的下次再处理
+        for msg_id, room_id, status in self.status_channel.drain(STATUS_BATCH):
+            remaining = self.status_pending_dict.get(msg_id)
+            room_index = self.room_index_dict.get(room_id)
+            if remaining is None or room_index is None:
+                continue  # 不是在这个界面输入的消息，如重放的
+            mark = self.getStatusMark(msg_id, room_index)
+            if not self.text_history.index(mark).endswith('.0'):  # 这一行被去掉时mark会移到行首
+                self.text_history.tag_remove('room_' + status_channel.ROOM_PENDING, mark, mark + '+1c')
+                self.text_history.tag_add('room_' + status, mark, mark + '+1c')
+            else:
+                self.spilled_status_dict[mark] = status
+            self.text_history.mark_unset(mark)
+            if remaining > 1:
+                self.status_pending_dict[msg_id] = remaining - 1
+            else:
+                del self.status_pending_dict[msg_id]
+
+    def getHistoryLineNum(self):
+        return int(self.text_history.index('end-1c').split('.')[0]) - 1  # 最后一行是空的
+
+    def dumpHistory(self, start, end):
+        # 把一段内容连同标签一起取出来，返回[[内容, 标签列表, 点的mark]]，不是还没出结果的点时mark为None
+        segment_list = []
+        tag_list = []
+        status_mark = None
+        pending_tag = 'room_' + status_channel.ROOM_PENDING
+        for key, value, _ in self.text_history.dump(start, end, text=True, tag=True, mark=True):
+            if key == 'tagon' and value != 'sel':  # 选中的部分不用存
+                tag_list.append(value)
+            elif key == 'tagoff' and value in tag_list:
+                tag_list.remove(value)
+            elif key == 'mark' and value.startswith('status_'):
+                status_mark = value
+            elif key == 'text':
+                if status_mark is not None and not (value.startswith('●') and pending_tag in tag_list):
+                    status_mark = None  # 之前去掉的行的mark都在行首，不是这里的点
+                segment_list.append([value, list(tag_list), status_mark])
+                status_mark = None
+        return segment_list
+
+    def trimHistory(self):
+        # 超过scrollback_lines行时从最早的开始一块块去掉，存到临时文件里，颜色等标签也一起存
+        while self.getHistoryLineNum() > self.scrollback_lines:
+            chunk_end = str(self.scrollback_chunk + 1) + '.0'
+            self.scrollback.push(json.dumps(self.dumpHistory('1.0', chunk_end), ensure_ascii=False))
+            self.text_history.delete('1.0', chunk_end)
+
+    def onHistoryScroll(self, first, last):
+        # 记录框滚动时调用，到了最上面并且有去掉的行时，等这次滚动处理完再读回一块
+        if float(first) <= 0.0 and len(self.scrollback) > 0 and not self.scrollback_loading:
+            self.scrollback_loading = True
+            self.root.after_idle(self.loadOlderHistory)
+
+    def loadOlderHistory(self):
+        self.scrollback_loading = False
+        data = self.scrollback.pop()
+        if data is None:
+            return
+        segment_list = json.loads(data)
+        pending_tag = 'room_' + status_channel.ROOM_PENDING
+        mark_set = set(self.text_history.mark_names())
+        self.text_history.config(state=tkinter.NORMAL)
+        self.text_history.mark_set('scrollback_load', '1.0')  # 插入的位置，默认右侧，插入后跟着往后移
+        for text, tag_list, status_mark in segment_list:
+            if status_mark is not None:
+                status = self.spilled_status_dict.pop(status_mark, None)
+                if status is not None:  # 去掉之后才出的结果
+                    tag_list = [tag for tag in tag_list if tag != pending_tag] + ['room_' + status]
+                elif status_mark in mark_set:  # 还没出结果，mark放回点的前面，出结果时照常更新
+                    self.text_history.mark_set(status_mark, 'scrollback_load')
+            self.text_history.insert('scrollback_load', text, tuple(tag_list))
+        self.text_history.mark_unset('scrollback_load')
+        self.text_history.config(state=tkinter.DISABLED)
+        line_num = sum([text.count('\n') for text, _, _ in segment_list])
+        self.text_history.yview(str(line_num + 1) + '.0')  # 保持原来看的位置，继续往上滚动再读下一块
 
     def getFixLen(self):
         if len(self.word_fix) == 0:
             return 0
-        fix_len = len(self.word_fix[self.word_fix_index][0]) + \
-                  len(self.word_fix[self.word_fix_index][1])  # 前后缀加起来有多长
+        fix_len = segmentation.textLen(self.word_fix[self.word_fix_index][0]) + \
+                  segmentation.textLen(self.word_fix[self.word_fix_index][1])  # 前后缀加起来有多长
         return fix_len
 
     def changeWordFixForward(self, event):
@@ -434,7 +636,7 @@ class MainInterface():
                 # 裁剪
                 self.text_input.delete(left_len ,tkinter.END)
             """
-            self.word_count_label['text'] = str(fix_len+len(self.text_input.get())) + '/' + str(self.words_limit_len)  # 更改字数显示
+            self.word_count_label['text'] = str(fix_len+segmentation.textLen(self.text_input.get())) + '/' + str(self.words_limit_len)  # 更改字数显示
         return 'break'  # 阻止事件继续传递
 
     def changeWordFixBackward(self, event):
@@ -457,34 +659,131 @@ class MainInterface():
                 # 裁剪
                 self.text_input.delete(left_len, tkinter.END)
             """
-            self.word_count_label['text'] = str(fix_len + len(self.text_input.get())) + '/' + str(self.words_limit_len)  # 更改字数显示
+            self.word_count_label['text'] = str(fix_len + segmentation.textLen(self.text_input.get())) + '/' + str(self.words_limit_len)  # 更改字数显示
 
         return 'break'  # 阻止事件继续传递
 
     def backToSetting(self):
         # 关闭当前界面，主要是为了重建transmitter
-        if self.transmitter is not None:
-            self.transmitter.stop()  # 关闭线程
+        transmitter = self.transmitter
+        if transmitter is not None:
+            transmitter.stop()  # 关闭线程
         self.transmitter = None
         self.Logger.flush()  # 写出并关闭记录文件
         self.Logger.close()
+        self.closeSessionLog(transmitter)
+        if self.history_indexer is not None:
+            self.history_indexer.close()
+        self.scrollback.close()
         self.root.destroy()
         # 返回设置界面
         self.setting_manager.restart_setting_page()
 
     def stop(self):
-        if self.transmitter is not None:
-            self.transmitter.stop()  # 关闭线程
+        transmitter = self.transmitter
+        if transmitter is not None:
+            transmitter.stop()  # 关闭线程
         self.transmitter = None
         self.Logger.flush()  # 写出并关闭记录文件
         self.Logger.close()
+        self.closeSessionLog(transmitter)
+        if self.history_indexer is not None:
+            self.history_indexer.close()
+        self.scrollback.close()
         self.root.destroy()
         if self.setting_manager is not None:
             self.setting_manager.stop()  # 因为正常情况下这个窗口只是隐藏，为了能再返回，最后退出时要关闭
 
+    def closeSessionLog(self, transmitter):
+        # 发送线程还在发剩下的消息，这些事件也要记下来，所以等发送线程都结束了再关闭发送日志
+        # 不在界面线程里等，界面可以马上关闭
+        if self.session_log is None:
+            return
+        if transmitter is None:
+            self.session_log.close()
+            return
+
+        def closeAfterSent(log):
+            transmitter.join()
+            log.close()
+        threading.Thread(target=closeAfterSent, args=(self.session_log,)).start()
+
+    def pollTransmitter(self):
+        # 发送器在别的线程中，不能直接操作界面，这里定时看一下它的状态
+        if self.transmitter is None:
+            return  # 已经关闭了
+        alert_list = self.transmitter.getAlerts() + self.Logger.getErrors()  # 记录写入出错也在这里提示
+        if self.session_log is not None:
+            alert_list += self.session_log.getErrors()
+        if self.history_indexer is not None:
+            alert_list += self.history_indexer.getErrors()
+        if len(alert_list) > 0:
+            # 发送失败等提示直接显示在记录里，不弹窗，以免打断输入
+            self.appendHistory(''.join(["(" + alert + ")\n" for alert in alert_list]))
+        self.updateRoomStatus()
+        if not self.resolve_reported:
+            self.checkResolveProgress()
+        else:
+            self.updateStatus()
+        if self.transmitter is not None:
+            self.root.after(100, self.pollTransmitter)
+
+    def updateStatus(self):
+        # 状态栏显示队列中的消息数、预计多久发完、最近请求用时
+        queue_depth, drain_time, latency_p95 = self.transmitter.getStatus()
+        self.status_label['text'] = '队列 ' + str(queue_depth) + '条 | 预计 ' + \
+            metrics.formatSeconds(drain_time) + ' | p95 ' + \
+            metrics.formatSeconds(latency_p95)
+
+    def checkResolveProgress(self):
+        # 直播间真实id在后台获取，获取完了再提示失败的直播间
+        done_num, total_num, finished = self.transmitter.getResolveProgress()
+        if not finished:
+            self.status_label['text'] = '正在获取直播间信息 ' + str(done_num) + '/' + str(total_num)
+            return
+        self.resolve_reported = True
+        self.status_label['text'] = ''
+        room_error_dict = dict(self.transmitter.room_error_dict)
+        if len(room_error_dict) > 0:
+            # 有的直播间获取失败，提示一下，其他直播间照常发送
+            error_info = ''
+            for room_id, error in room_error_dict.items():
+                error_info += '房间号' + room_id + '：' + error + '\n'
+            if len(room_error_dict) == total_num:
+                tkinter.messagebox.showerror(
+                    title='提示',
+                    message='所有直播间都获取失败\n' + error_info,
+                    parent=self.root  # 这样才会显示在当前窗口上方
+                )
+                self.backToSetting()
+                return
+            tkinter.messagebox.showwarning(
+                title='提示',
+                message='以下直播间获取失败，不会发送\n' + error_info,
+                parent=self.root  # 这样才会显示在当前窗口上方
+            )
+
     def run(self):
-        self.transmitter = danmu_multitransmit.DanmuMultiTransimitter(self.room_id_list)
+        # 窗口马上显示，可以直接输入，直播间信息在后台获取，获取完之前的消息会先在队列里等着
+        try:
+            self.transmitter = danmu_multitransmit.DanmuMultiTransimitter(self.room_id_list)
+        except danmu_multitransmit.TransmitterError as e:
+            tkinter.messagebox.showerror(
+                title='提示',
+                message=str(e),
+                parent=self.root  # 这样才会显示在当前窗口上方
+            )
+            print(e)
+            self.backToSetting()  # 改好配置之后可以重新进入
+            return
+        self.transmitter.setVariantFixes(self.word_fix)  # 重复弹幕可以换用其他前后缀
+        if self.session_log is not None:
+            self.transmitter.addListener(self.session_log)
+        self.transmitter.addListener(self.status_channel)
+        self.room_index_dict = {room_id: index for index, room_id in enumerate(self.transmitter.getRoomIds())}
         self.transmitter.start()
+        self.resolve_reported = False  # 是否已经提示过获取结果
+        self.pollTransmitter()
         self.root.mainloop()
 
 
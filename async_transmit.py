@@ -0,0 +1,205 @@
+"""
+asyncio版的弹幕发送，和ActualTransimitter做的事一样，对外也是addMsg、start、stop
+所有直播间在一个事件循环里发送，每个直播间一个协程，不用每个直播间开一个线程
+事件循环跑在单独的线程里，界面线程通过call_soon_threadsafe把消息交给事件循环
+需要aiohttp，没有安装时不能使用
+"""
+import asyncio
+import collections
+import random
+import threading
+import time
+import danmu_multitransmit
+import msg_queue
+import send_result
+import pacing
+import transmit_listener
+import coalesce
+import dedup
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def isAvailable():
+    return aiohttp is not None
+
+
+class AsyncTransimitter(danmu_multitransmit.SenderBase):
+    def __init__(self, room_target_list, account, running_info, scheduler, listener):
+        self.room_target_list = room_target_list  # 真实id由DanmuMultiTransimitter在后台获取
+
+        self.running_info = running_info
+        self.csrf_token = account['csrf_token']
+        self.cookie = account['cookie']
+        self.account = account['name']  # 调度器中账号的key
+        self.account_key = pacing.getAccountKey(account)  # 保存自适应间隔时用的key
+        self.scheduler = scheduler
+        self.loop = asyncio.new_event_loop()  # 在start创建的线程里运行
+        self.msg_queue = msg_queue.createMsgQueue(running_info, self.dropMsg)  # 共用的消息队列，由dispatch分发到各直播间的队列
+        self.batch_size = 64  # dispatch每次最多从共用队列取多少条
+        self.thread = None
+        self.http_timeout = float(running_info.get('http_timeout', '5'))
+        self.send_url = danmu_multitransmit.getApiBase(running_info) + danmu_multitransmit.SEND_PATH
+        self.result_policy = send_result.createResultPolicy(running_info)  # 发送结果的处理方式
+        self.random = random.Random()  # 重发间隔的随机部分用
+        self.coalescer = coalesce.createCoalescer(running_info, account['words_limit'])  # 积压时合并消息，不合并时为None
+        self.deduplicator = dedup.createDeduplicator(running_info, account['words_limit'])  # 不处理重复弹幕时为None
+        self.pacing_state_path = pacing.getStatePath(running_info)
+        self.pacer = pacing.createPacer(running_info, account)  # 自适应发送间隔，不使用时为None
+        if self.pacer is not None:
+            self.scheduler.setAccountInterval(self.account, self.pacer.interval)  # 从上次学到的间隔开始
+        self.paused_until = 0.0  # 账号暂停到什么时候，time.monotonic
+        self.account_stopped = False  # 账号未登录或被禁言，不再发送
+        self.alert_deque = collections.deque()  # 要在界面上提示的信息，界面线程取走
+        self.room_queue_list = []  # 各直播间的队列，main中创建
+        self.listener = listener  # 发送过程中的事件通知给它
+
+    def addMsg(self, danmu_msg):
+        # 共用队列是线程安全的，可以直接在界面线程放入，返回是否加入成功
+        return self.msg_queue.put(danmu_msg, priority=danmu_msg.priority)
+
+    def dropMsg(self, danmu_msg):
+        # 队列满了被drop_oldest丢掉的消息，和reject时一样，这个账号的直播间都记为失败
+        for room_target in self.room_target_list:
+            danmu_multitransmit.finishRoom(self.listener, danmu_msg, room_target, transmit_listener.ROOM_FAILED)
+
+    def getPendingSendNum(self):
+        # 还要发送多少次，在界面线程中调用，只是估计，不加锁
+        return len(self.msg_queue) * len(self.room_target_list) + \
+            sum([room_queue.qsize() for room_queue in self.room_queue_list])
+
+    def stop(self):
+        # 关闭共用队列，和线程版一样要等剩余消息发完
+        self.msg_queue.close()
+        print("end!")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
+
+    def run(self):
+        print("start run!")
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.main())
+        finally:
+            self.loop.close()
+
+    async def main(self):
+        pool_size = int(self.running_info.get('pool_size', '10'))
+        keep_alive = self.running_info.get('keep_alive', '1') != '0'
+        connector = aiohttp.TCPConnector(limit=pool_size, force_close=not keep_alive)
+        # cookie原样放在Cookie请求头里，和线程版一样；用cookies参数时aiohttp会给整个字符串加引号、把;转义成\073，b站读不出SESSDATA
+        headers = dict(danmu_multitransmit.SEND_HEADERS)
+        headers['Cookie'] = self.cookie
+        async with aiohttp.ClientSession(
+            headers=headers,
+            connector=connector
+        ) as session:
+            # 各直播间的队列也按优先级排，元素为(优先级, 序号, 消息)，序号保证同一优先级内先进先出
+            room_queue_list = [asyncio.PriorityQueue() for _ in self.room_target_list]
+            self.room_queue_list = room_queue_list
+            room_task_list = []
+            for room_target, room_queue in zip(self.room_target_list, room_queue_list):
+                room_task_list.append(asyncio.ensure_future(self.roomSender(session, room_target, room_queue)))
+            await self.dispatch(room_queue_list)
+            await asyncio.gather(*room_task_list)  # 等各直播间的剩余消息发完
+        if self.pacer is not None:
+            pacing.saveInterval(self.pacing_state_path, self.account_key, self.pacer.interval)  # 下次从这个间隔开始
+
+    async def dispatch(self, room_queue_list):
+        # 把共用队列里的消息分给每个直播间，共用队列的等待是阻塞的，放到线程池里等
+        seq = 0
+        while True:
+            msgs = await self.loop.run_in_executor(None, self.msg_queue.get_many, self.batch_size)
+            if len(msgs) == 0:
+                # 队列已经关闭，通知各直播间结束，优先级最低，等其他消息发完
+                for room_queue in room_queue_list:
+                    room_queue.put_nowait((msg_queue.PRIORITY_NUM, seq, None))
+                break
+            for msg in msgs:
+                self.listener.onDequeue(msg, self.account)
+            if self.coalescer is not None:
+                # 各直播间的队列中积压最多的加上这一批和共用队列中剩下的，算作积压的条数
+                max_room_backlog = max([room_queue.qsize() for room_queue in room_queue_list])
+                backlog_num = len(msgs) + len(self.msg_queue) + max_room_backlog
+                msgs = self.coalescer.coalesceList(msgs, backlog_num)
+            for msg in msgs:
+                for room_queue in room_queue_list:
+                    room_queue.put_nowait((msg.priority, seq, msg))
+                seq += 1
+
+    async def waitRoomReady(self, room_target):
+        # 等直播间的真实id获取完，获取是在别的线程中进行的
+        ready = asyncio.Event()
+        room_target.addReadyCallback(lambda: self.loop.call_soon_threadsafe(ready.set))
+        await ready.wait()
+
+    async def roomSender(self, session, room_target, room_queue):
+        await self.waitRoomReady(room_target)  # 获取完之前消息先在直播间的队列里等着
+        while True:
+            _, _, msg = await room_queue.get()
+            if msg is None:
+                break
+            if room_target.real_id is None:  # 获取真实id失败的直播间不发送
+                danmu_multitransmit.finishRoom(self.listener, msg, room_target, transmit_listener.ROOM_FAILED)
+                continue
+            status = await self.sendWithRetry(session, msg, room_target)
+            danmu_multitransmit.finishRoom(self.listener, msg, room_target, status)
+
+    async def sendWithRetry(self, session, msg, room_target):
+        # 按发送结果处理，重发时只有这个直播间在等，不影响其他直播间，返回这个直播间的最终状态
+        attempt = 0
+        while True:
+            pause_time = self.paused_until - time.monotonic()
+            if pause_time > 0:
+                await asyncio.sleep(pause_time)  # 账号暂停时所有直播间都不发
+            if self.account_stopped:  # 剩下的消息和重发都不再发送
+                return transmit_listener.ROOM_FAILED
+            text = self.checkDuplicate(msg, room_target, time.monotonic())
+            if text is None:
+                return transmit_listener.ROOM_SKIPPED
+            result = await self.sendDanmu(session, msg, room_target, attempt, text)
+            decision = self.afterSend(msg, room_target, attempt, text, result, time.monotonic())
+            if decision.status is not None:
+                return decision.status
+            attempt += 1
+            self.listener.onRetry(msg, room_target, self.account, attempt, decision.delay)
+            await asyncio.sleep(decision.delay)
+
+    async def sendDanmu(self, session, msg, room_target, attempt, text=None):
+        # 发送一条弹幕，返回send_result.SendResult，text为None时发送msg.text
+        text = msg.text if text is None else text
+        data = danmu_multitransmit.makeSendData(text, room_target.real_id, self.csrf_token)
+        # 和线程版用同一个调度器，只是等待时不阻塞其他直播间
+        wait_time = self.scheduler.reserve(self.account, room_target.real_id)
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+        self.listener.onSendStart(msg, room_target, self.account, attempt)
+        start_time = time.monotonic()
+        result = await self.post(session, data)
+        self.listener.onSendEnd(msg, room_target, self.account, attempt, result, time.monotonic() - start_time, wait_time,
+                                text)
+        return result
+
+    async def post(self, session, data):
+        try:
+            async with session.post(
+                self.send_url,
+                data=data,
+                timeout=aiohttp.ClientTimeout(total=self.http_timeout)
+            ) as send_response:
+                try:
+                    body = await send_response.json(content_type=None)
+                except ValueError:
+                    body = None
+                return send_result.classifyResponse(send_response.status, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return send_result.classifyException(e)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,77 @@
+"""
+屏蔽词检查的性能测试，对比逐个屏蔽词查找和blocked_words的Aho–Corasick自动机
+统计建自动机的时间、每段弹幕检查的时间、运行中添加一个屏蔽词的时间
+在仓库根目录运行: python benchmark/bench_blocked_words.py --words 10000,50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import blocked_words
+
+
+CHARS = '的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学abcdefghijklmnopqrstuvwxyz0123456789'
+
+
+def makeWord(rng, min_len, max_len):
+    return ''.join(rng.choice(CHARS) for _ in range(rng.randint(min_len, max_len)))
+
+
+def naiveFind(word_list, text):
+    # 原来的做法：每个屏蔽词都在弹幕里找一遍
+    return [word for word in word_list if word in text]
+
+
+def formatPercentiles(samples):
+    # 每段检查用时的p50/p99，单位微秒
+    samples = sorted(samples)
+    return '/'.join(['%.1fus' % (samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1e6)
+                     for p in (50, 99)])
+
+
+def measure(check, segment_list):
+    samples = []
+    for segment in segment_list:
+        start_time = time.perf_counter()
+        check(segment)
+        samples.append(time.perf_counter() - start_time)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description='屏蔽词检查性能测试')
+    parser.add_argument('--words', default='1000,10000,50000', help='屏蔽词数量，逗号分隔可以对比多个')
+    parser.add_argument('--segments', type=int, default=2000, help='检查多少段弹幕')
+    parser.add_argument('--length', type=int, default=30, help='每段弹幕多长')
+    parser.add_argument('--adds', type=int, default=500, help='运行中添加多少个屏蔽词')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    segment_list = [makeWord(rng, args.length, args.length) for _ in range(args.segments)]
+    for word_num in [int(num) for num in args.words.split(',')]:
+        word_list = [makeWord(rng, 2, 8) for _ in range(word_num)]
+        start_time = time.perf_counter()
+        blocked_filter = blocked_words.BlockedWordFilter(word_list)
+        build_time = time.perf_counter() - start_time
+        start_num = len(blocked_filter)
+
+        naive_samples = measure(lambda text: naiveFind(word_list, text), segment_list[:200])
+        ac_samples = measure(blocked_filter.findMatches, segment_list)
+        add_samples = measure(blocked_filter.addWord, [makeWord(rng, 2, 8) for _ in range(args.adds)])
+        delta_samples = measure(blocked_filter.findMatches, segment_list)  # 有运行中添加的屏蔽词时
+
+        print('屏蔽词%d个，建自动机%.1fms' % (start_num, build_time * 1e3))
+        print('    逐个查找   每段p50/p99 ' + formatPercentiles(naive_samples))
+        print('    自动机     每段p50/p99 ' + formatPercentiles(ac_samples))
+        print('    添加后     每段p50/p99 ' + formatPercentiles(delta_samples))
+        print('    添加%d个   每个平均%.2fms，最慢%.1fms(合并在后台线程中进行)' % (
+            args.adds, statistics.mean(add_samples) * 1e3, max(add_samples) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+消息队列的简单性能测试，对比原来ActualTransimitter中手写的环形缓冲区和现在的MsgQueue
+在仓库根目录运行: python benchmark/bench_msg_queue.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import msg_queue
+
+
+class LegacyRingBuffer():
+    # 原来ActualTransimitter里的实现，只保留addMsg、getMsg和stop
+    def __init__(self):
+        self.msg_box_size = 16
+        self.msg_list = [None] * self.msg_box_size
+        self.msg_num = 0
+        self.msg_save_index = 0
+        self.msg_get_index = 0
+        self.mutex = threading.Lock()
+        self.semaphore = threading.Semaphore(0)
+
+    def addMsg(self, msg):
+        self.mutex.acquire()
+        try:
+            if self.msg_num >= self.msg_box_size:
+                temp = self.msg_list
+                self.msg_box_size = self.msg_box_size * 2
+                self.msg_list = [None] * self.msg_box_size
+                trans_index = 0
+                while trans_index < self.msg_num:
+                    self.msg_list[trans_index] = temp[self.msg_get_index]
+                    trans_index += 1
+                    self.msg_get_index = (self.msg_get_index+1) % self.msg_num
+                self.msg_get_index = 0
+                self.msg_save_index = self.msg_num
+            self.msg_num += 1
+            self.msg_list[self.msg_save_index] = msg
+            self.msg_save_index = (self.msg_save_index + 1) % self.msg_box_size
+        finally:
+            self.mutex.release()
+        self.semaphore.release()
+
+    def getMsg(self):
+        msg = None
+        self.semaphore.acquire()
+        self.mutex.acquire()
+        try:
+            if self.msg_num > 0:
+                self.msg_num -= 1
+                msg = self.msg_list[self.msg_get_index]
+                self.msg_get_index = (self.msg_get_index+1) % self.msg_box_size
+        finally:
+            self.mutex.release()
+        return msg
+
+    def stop(self):
+        self.semaphore.release()
+
+
+class MsgQueueAdapter():
+    # 包装成和LegacyRingBuffer一样的接口，方便用同一套测试
+    def __init__(self, maxsize=0, policy=msg_queue.POLICY_BLOCK):
+        self.queue = msg_queue.MsgQueue(maxsize, policy)
+
+    def addMsg(self, msg):
+        self.queue.put(msg)
+
+    def getMsg(self):
+        msg = self.queue.get()
+        return None if msg is msg_queue.MsgQueue.STOP else msg
+
+    def stop(self):
+        self.queue.close()
+
+
+def benchFillThenDrain(make_queue, msg_num):
+    # 先放满再取空，原来的实现在这种情况下要多次扩容
+    q = make_queue()
+    start = time.perf_counter()
+    for i in range(msg_num):
+        q.addMsg(i)
+    for i in range(msg_num):
+        q.getMsg()
+    return time.perf_counter() - start
+
+
+def benchProducerConsumer(make_queue, msg_num):
+    # 一个线程放一个线程取，和界面线程、发送线程的关系一样
+    q = make_queue()
+
+    def consume():
+        while q.getMsg() is not None:
+            pass
+
+    consumer = threading.Thread(target=consume)
+    start = time.perf_counter()
+    consumer.start()
+    for i in range(msg_num):
+        q.addMsg(i)
+    q.stop()
+    consumer.join()
+    return time.perf_counter() - start
+
+
+def benchBatch(msg_num, batch_size):
+    # MsgQueue的put_many、get_many，每批只拿一次锁
+    q = msg_queue.MsgQueue()
+    msgs = list(range(batch_size))
+    start = time.perf_counter()
+    for i in range(msg_num // batch_size):
+        q.put_many(msgs)
+    while len(q) > 0:
+        q.get_many(batch_size)
+    return time.perf_counter() - start
+
+
+def report(name, seconds, msg_num):
+    print("%-40s %8.1f ms  %8.2f us/msg" % (name, seconds * 1000, seconds * 1e6 / msg_num))
+
+
+def main():
+    msg_num = 200000
+    report("legacy ring buffer, fill then drain", benchFillThenDrain(LegacyRingBuffer, msg_num), msg_num)
+    report("MsgQueue, fill then drain", benchFillThenDrain(MsgQueueAdapter, msg_num), msg_num)
+    report("legacy ring buffer, producer/consumer", benchProducerConsumer(LegacyRingBuffer, msg_num), msg_num)
+    report("MsgQueue, producer/consumer", benchProducerConsumer(MsgQueueAdapter, msg_num), msg_num)
+    report("MsgQueue(1000, block), producer/consumer",
+           benchProducerConsumer(lambda: MsgQueueAdapter(1000), msg_num), msg_num)
+    report("MsgQueue put_many/get_many, batch 64", benchBatch(msg_num, 64), msg_num)
+
+
+if __name__ == "__main__":
+    main()
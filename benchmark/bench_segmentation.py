@@ -0,0 +1,113 @@
+"""
+分段的性能测试，对比原来直接按长度切和segmentation.splitText
+用随机生成的大段粘贴文字(中文、英文、数字、emoji混合)，统计速度、段数、超出长度的段、被切开的字和单词、各段长度的差异
+在仓库根目录运行: python benchmark/bench_segmentation.py --size 200000 --limit 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import segmentation
+
+
+CHINESE = '的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感'
+ENGLISH_WORDS = ['hello', 'world', 'stream', 'bilibili', 'awesome', 'gg', 'nice', 'wonderful', 'internationalization']
+EMOJI = ['😀', '👍', '👍🏽', '❤️', '👨‍👩‍👧‍👦', '🇨🇳', '1️⃣', '🎉']
+PUNCTUATION = ['，', '。', '！', '？', '、', ', ', '. ', '~']
+
+
+def makeText(size, rng):
+    # 生成大约size个字的文字
+    parts = []
+    length = 0
+    while length < size:
+        dice = rng.random()
+        if dice < 0.6:
+            part = ''.join(rng.choice(CHINESE) for _ in range(rng.randint(2, 12)))
+        elif dice < 0.75:
+            part = ' ' + ' '.join(rng.choice(ENGLISH_WORDS) for _ in range(rng.randint(1, 4))) + ' '
+        elif dice < 0.8:
+            part = str(rng.randint(0, 10 ** rng.randint(1, 8)))
+        elif dice < 0.88:
+            part = rng.choice(EMOJI)
+        else:
+            part = rng.choice(PUNCTUATION)
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+
+def legacySplit(content, limit_len):
+    # 原来MainInterface.submitInputContent中的分段
+    segment_list = []
+    while len(content) != 0:
+        to_send = content
+        if len(to_send) > limit_len:
+            to_send = content[0:limit_len]
+            content = content[limit_len:len(content)]
+        else:
+            content = ''
+        segment_list.append(to_send)
+    return segment_list
+
+
+def countBroken(line, segment_list):
+    # 在原文中找到每一段的位置，返回(切开的字, 切开的单词)的个数
+    broken_cluster_num = 0
+    broken_word_num = 0
+    pos = 0
+    for segment in segment_list:
+        index = line.find(segment, pos)
+        if index > 0:
+            first = segment[0]
+            if segmentation.isExtend(first) or first == '\u200d' or \
+                    (segmentation.isRegionalIndicator(first) and segmentation.isRegionalIndicator(line[index - 1])):
+                broken_cluster_num += 1  # 段的开头是接着上一个字的组合符号、零宽连接符等
+            elif segmentation.WORD_CHAR.match(line[index - 1]) and segmentation.WORD_CHAR.match(first):
+                broken_word_num += 1  # 上一段以字母数字结尾，这一段紧接着以字母数字开头
+        pos = index + len(segment)
+    return broken_cluster_num, broken_word_num
+
+
+def report(name, split, text, limit):
+    lines = [line for line in text.split('\n') if len(line) > 0]
+    start_time = time.perf_counter()
+    line_segment_list = [(line, split(line, limit)) for line in lines]
+    elapsed = time.perf_counter() - start_time
+    segment_list = []
+    broken_cluster_num = 0
+    broken_word_num = 0
+    for line, line_segments in line_segment_list:
+        segment_list += line_segments
+        broken_num = countBroken(line, line_segments)
+        broken_cluster_num += broken_num[0]
+        broken_word_num += broken_num[1]
+    lengths = [segmentation.textLen(segment) for segment in segment_list]
+    print('%-10s %8.3fs %8.2fMB/s 段数%7d 超长%6d 切开的字%6d 切开的单词%6d 长度标准差%6.2f 最短%3d' % (
+        name, elapsed, len(text.encode('utf-8')) / elapsed / 1e6 if elapsed > 0 else 0.0, len(segment_list),
+        sum(1 for length in lengths if length > limit), broken_cluster_num, broken_word_num,
+        statistics.pstdev(lengths), min(lengths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分段性能测试')
+    parser.add_argument('--size', type=int, default=200000, help='一共多少字')
+    parser.add_argument('--line', type=int, default=200, help='每次粘贴多少字')
+    parser.add_argument('--limit', type=int, default=20, help='words_limit减去前后缀的长度')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    text = '\n'.join(makeText(args.line, rng) for _ in range(max(1, args.size // args.line)))
+    print('文字%d字，每次粘贴约%d字，每段最多%d，regex模块%s' % (
+        len(text), args.line, args.limit, '已安装' if segmentation.regex is not None else '未安装'))
+    report('legacy', legacySplit, text, args.limit)
+    report('segment', segmentation.splitText, text, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+用虚拟时间模拟长时间的发送，几秒内跑完，可以对比不同的发送策略
+在仓库根目录运行: python benchmark/bench_simulate.py --hours 2 --rooms 30 --pacing static,aimd
+用真实的输入节奏: python benchmark/bench_simulate.py --replay history/2024-01-31_20-00-00.jsonl --replay-speed 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import metrics
+import replay
+import simulator
+
+
+def formatPercentiles(values):
+    return '/'.join([metrics.formatSeconds(value) for value in values])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用虚拟时间模拟发送')
+    parser.add_argument('--hours', type=float, default=2.0)
+    parser.add_argument('--rooms', type=int, default=30)
+    parser.add_argument('--msg-interval', type=float, default=60.0, help='平均多少秒来一条消息')
+    parser.add_argument('--burst-interval', type=float, default=0.0, help='每隔多少秒来一次刷屏，0为没有')
+    parser.add_argument('--burst-size', type=int, default=10, help='每次刷屏几条')
+    parser.add_argument('--send-interval', type=float, default=1.0)
+    parser.add_argument('--room-interval', type=float, default=1.0)
+    parser.add_argument('--pacing', default='static', help='发送策略，逗号分隔可以对比多个，如static,aimd')
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--coalesce', default='0', help='是否合并积压的消息，逗号分隔可以对比，如0,1')
+    parser.add_argument('--words-limit', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--server-interval', type=float, default=1.0, help='模拟服务器判定发送太快的间隔')
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--filter-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay', default=None, help='用history中的记录作为输入，不随机生成')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='重放的速度，0为一开始全部到达')
+    parser.add_argument('--timeline', action='store_true', help='输出队列长度的变化')
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        workload = replay.makeReplayWorkload(args.replay, args.replay_speed)
+        print('重放' + args.replay + '，' + str(args.rooms) + '个直播间，' + str(len(workload)) + '条消息')
+    else:
+        duration = args.hours * 3600
+        workload = simulator.makeWorkload(
+            duration, args.msg_interval, random.Random(args.seed), args.burst_interval, args.burst_size)
+        print('模拟' + str(args.hours) + '小时，' + str(args.rooms) + '个直播间，' + str(len(workload)) + '条消息')
+    for pacing, coalesce in [(pacing, coalesce) for pacing in args.pacing.split(',')
+                             for coalesce in args.coalesce.split(',')]:
+        running_info = {
+            'send_interval': str(args.send_interval),
+            'room_interval': str(args.room_interval),
+            'pacing': pacing,
+            'queue_size': str(args.queue_size),
+            'coalesce': coalesce,
+            'words_limit': str(args.words_limit),
+        }
+        start_time = time.monotonic()
+        simulation = simulator.Simulation(
+            running_info, args.rooms, workload, seed=args.seed, sample_interval=600.0,
+            latency=args.latency, jitter=args.jitter, send_interval=args.server_interval,
+            fail_rate=args.fail_rate, filter_rate=args.filter_rate)
+        report = simulation.run()
+        real_time = time.monotonic() - start_time
+        print('[pacing=' + pacing + ' coalesce=' + coalesce + '] 用时' + metrics.formatSeconds(real_time) +
+              '，虚拟时间' + metrics.formatSeconds(report['duration']))
+        print('    发送' + str(report['sends']) + '次 ' + str(report['results']) + ' ' + str(report['room_status']))
+        print('    队列等待p50/p95/p99 ' + formatPercentiles(report['queue_wait']) +
+              '，发完所有直播间p50/p95/p99 ' + formatPercentiles(report['fanout']))
+        print('    等待发送间隔占比%.2f，最多积压%d次发送，被拒绝%d条，最后一条到达后%s发完，最终间隔%.2fs' % (
+            report['sleep_ratio'], report['max_pending'], report['rejected'],
+            metrics.formatSeconds(report['drain_time']), report['final_interval']))
+        if args.timeline:
+            for sample_time, queue_depth, pending in report['queue_samples']:
+                print('    %8.0fs 队列%5d条 待发送%6d次' % (sample_time, queue_depth, pending))
+
+
+if __name__ == "__main__":
+    main()
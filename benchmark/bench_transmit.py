@@ -0,0 +1,178 @@
+"""
+弹幕发送的性能测试，用本地模拟服务器代替b站，N个直播间 × M条消息
+输出吞吐量、一条消息发完所有直播间用时的分位数、按发送间隔等待的时间占比，可以保存下来对比不同版本
+等待时间占比是线程版发送线程的时间里有多少在等发送间隔，asyncio版各直播间的等待是重叠的，这一列不适用，显示为-
+在仓库根目录运行: python benchmark/bench_transmit.py --rooms 10 --messages 20
+保存结果: --output bench_results.jsonl，查看保存的结果: --show bench_results.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import danmu_multitransmit
+import transmit_listener
+import mock_live_server
+
+
+class BenchListener(transmit_listener.TransmitListener):
+    # 统计按发送间隔等待的时间和各直播间的最终状态
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.sleep_total = 0.0
+        self.send_num = 0
+        self.status_count = {}
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        with self.mutex:
+            self.sleep_total += sleep_time
+            self.send_num += 1
+
+    def onRoomDone(self, msg, room_target, status):
+        with self.mutex:
+            self.status_count[status] = self.status_count.get(status, 0) + 1
+
+
+def makeRunningInfo(args, api_base, temp_dir):
+    running_info = {
+        'api_base': api_base,
+        'engine': args.engine,
+        'send_interval': str(args.send_interval),
+        'room_interval': str(args.room_interval),
+        'pacing_margin': str(args.pacing_margin),
+        'pacing': args.pacing,
+        'pacing_state_path': os.path.join(temp_dir, 'PacingState.json'),
+        'room_cache_path': os.path.join(temp_dir, 'RoomIdCache.json'),
+        'retry_base': str(args.retry_base),
+        'queue_size': str(args.messages + 1),
+        'metrics_window': str(args.messages + 1),
+    }
+    for index in range(args.accounts):
+        suffix = '' if index == 0 else '_' + str(index + 1)
+        running_info['csrf_token' + suffix] = 'csrf' + str(index + 1)
+        running_info['cookie' + suffix] = 'SESSDATA=sess' + str(index + 1) + '; bili_jct=csrf' + str(index + 1) + \
+            '; DedeUserID=' + str(index + 1)
+    return running_info
+
+
+def runOnce(args):
+    server = mock_live_server.createServer(args)
+    api_base = server.start()
+    temp_dir_obj = tempfile.TemporaryDirectory()  # 缓存和自适应间隔写到临时目录，不影响正常使用的文件
+    try:
+        temp_dir = temp_dir_obj.name
+        room_id_list = [str(room_id) for room_id in range(1, args.rooms + 1)]
+        transmitter = danmu_multitransmit.DanmuMultiTransimitter(room_id_list, makeRunningInfo(args, api_base, temp_dir))
+        listener = BenchListener()
+        transmitter.listener.addListener(listener)
+        start_time = time.monotonic()
+        transmitter.start()
+        for index in range(args.messages):
+            transmitter.addMsg('bench' + str(index))
+        transmitter.stop()
+        transmitter.join()  # 两种发送器都等到剩余消息发完
+        elapsed = time.monotonic() - start_time
+    finally:
+        server.stop()
+        temp_dir_obj.cleanup()
+    sent_num = listener.status_count.get(transmit_listener.ROOM_SENT, 0)
+    fanout = transmitter.metrics.fanout_time.percentiles([50, 95, 99])
+    # 只按账号间隔算的理论最短用时，每个账号分到的直播间数不同，按最多的算，间隔包括配置的余量
+    max_room_num = max([len(sender.room_target_list) for sender in transmitter.sender_list])
+    ideal_time = max(0, args.messages * max_room_num - 1) * (args.send_interval + args.pacing_margin)
+    sleep_ratio = None
+    if args.engine == 'thread' and elapsed > 0:
+        sleep_ratio = listener.sleep_total / (elapsed * len(transmitter.sender_list))
+    return {
+        'elapsed': elapsed,
+        'sends': listener.send_num,
+        'sent': sent_num,
+        'throughput': sent_num / elapsed if elapsed > 0 else 0.0,
+        'fanout_p50': fanout[0],
+        'fanout_p95': fanout[1],
+        'fanout_p99': fanout[2],
+        'sleep_ratio': sleep_ratio,
+        'efficiency': ideal_time / elapsed if elapsed > 0 else 0.0,
+        'server_results': server.countResults(),
+        'room_status': dict(listener.status_count),
+    }
+
+
+RESULT_COLUMNS = [
+    # (名称, 宽度, 格式)
+    ('label', 12, 's'),
+    ('engine', 8, 's'),
+    ('rooms', 6, 'd'),
+    ('messages', 8, 'd'),
+    ('accounts', 8, 'd'),
+    ('elapsed', 8, '.2f'),
+    ('throughput', 10, '.2f'),
+    ('fanout_p50', 10, '.3f'),
+    ('fanout_p95', 10, '.3f'),
+    ('fanout_p99', 10, '.3f'),
+    ('sleep_ratio', 11, '.2f'),
+    ('efficiency', 10, '.2f'),
+]
+
+
+def printTable(record_list):
+    print(' '.join([name.rjust(width) for name, width, _ in RESULT_COLUMNS]))
+    for record in record_list:
+        cells = []
+        for name, width, fmt in RESULT_COLUMNS:
+            value = record.get(name)
+            cells.append(('-' if value is None else format(value, fmt)).rjust(width))
+        print(' '.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='弹幕发送性能测试')
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--accounts', type=int, default=1)
+    parser.add_argument('--engine', default='thread', choices=['thread', 'asyncio'])
+    parser.add_argument('--send-interval', type=float, default=0.2, help='客户端的send_interval')
+    parser.add_argument('--room-interval', type=float, default=0.0, help='客户端的room_interval')
+    parser.add_argument('--pacing-margin', type=float, default=0.0, help='客户端的pacing_margin')
+    parser.add_argument('--pacing', default='static', choices=['static', 'aimd'])
+    parser.add_argument('--retry-base', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=1, help='重复几次')
+    parser.add_argument('--label', default='', help='保存结果时的标记，如分支名')
+    parser.add_argument('--output', default=None, help='把结果追加到这个jsonl文件')
+    parser.add_argument('--show', default=None, help='显示保存的结果后退出')
+    mock_live_server.addServerArguments(parser)
+    parser.set_defaults(server_interval=0.2)
+    args = parser.parse_args()
+
+    if args.show is not None:
+        with open(args.show, 'r', encoding="utf-8") as f:
+            printTable([json.loads(line) for line in f if len(line.strip()) > 0])
+        return
+
+    record_list = []
+    for _ in range(args.repeat):
+        record = {
+            'label': args.label,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'engine': args.engine,
+            'rooms': args.rooms,
+            'messages': args.messages,
+            'accounts': args.accounts,
+            'args': vars(args),
+        }
+        record.update(runOnce(args))
+        record_list.append(record)
+        print('server:', record['server_results'], 'rooms:', record['room_status'])
+    printTable(record_list)
+    if args.output is not None:
+        with open(args.output, 'a', encoding="utf-8") as f:
+            for record in record_list:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == "__main__":
+    main()
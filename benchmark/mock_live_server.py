@@ -0,0 +1,186 @@
+"""
+本地模拟的b站直播接口，只实现发送要用到的/room/v1/Room/room_init和/msg/send
+发送时和真实接口一样检查cookie，要能解析出SESSDATA和bili_jct，并且bili_jct和csrf一样，否则返回-101未登录
+可以设置响应延迟、发送太快时返回"msg in 1s"、按比例返回服务器错误或被屏蔽，用来测试和做性能测试
+配合RunningConfig中的api_base使用，单独运行: python benchmark/mock_live_server.py --port 8080
+"""
+import argparse
+import http.cookies
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+
+class MockLiveServer():
+    def __init__(self, port=0, latency=0.0, jitter=0.0, send_interval=1.0, room_interval=0.0,
+                 fail_rate=0.0, filter_rate=0.0, bad_rooms=(), seed=None):
+        self.port = port  # 0表示随便选一个空闲端口
+        self.latency = latency  # 每个请求的响应延迟，秒
+        self.jitter = jitter  # 延迟随机增加0~jitter秒
+        self.send_interval = send_interval  # 同一个账号两条弹幕至少隔多久，太快返回"msg in 1s"，0为不限制
+        self.room_interval = room_interval  # 同一个直播间两条弹幕至少隔多久，0为不限制
+        self.fail_rate = fail_rate  # 按比例返回HTTP 500
+        self.filter_rate = filter_rate  # 按比例返回被屏蔽("f")
+        self.bad_rooms = set(bad_rooms)  # 这些房间号获取真实id时返回不存在
+        self.random = random.Random(seed)
+        self.mutex = threading.Lock()
+        self.account_last_time = {}  # key为csrf，上一次发送成功的时间
+        self.room_last_time = {}
+        self.send_log = []  # 每次发送为(时间, csrf, 直播间, 弹幕, 结果)，结果为ok、rate_limited、failed、filtered、not_logged_in
+        self.server = None
+
+    def realRoomId(self, room_id):
+        return int(room_id) + 100000
+
+    def handleRoomInit(self, query):
+        room_id = query.get('id', [''])[0]
+        if room_id in self.bad_rooms or not room_id.isdigit():
+            return 200, {'code': 60004, 'msg': '直播间不存在', 'message': '直播间不存在', 'data': None}
+        return 200, {'code': 0, 'msg': 'ok', 'message': 'ok', 'data': {'room_id': self.realRoomId(room_id)}}
+
+    def isLoggedIn(self, cookie_header, csrf):
+        # cookie中要有SESSDATA和bili_jct，bili_jct和表单中的csrf一样
+        cookie = http.cookies.SimpleCookie()
+        try:
+            cookie.load(cookie_header)
+        except http.cookies.CookieError:
+            return False
+        if 'SESSDATA' not in cookie or 'bili_jct' not in cookie:
+            return False
+        return len(csrf) > 0 and cookie['bili_jct'].value == csrf
+
+    def handleSend(self, form, cookie_header=''):
+        csrf = form.get('csrf', [''])[0]
+        room_id = form.get('roomid', [''])[0]
+        msg = form.get('msg', [''])[0]
+        now = time.monotonic()
+        with self.mutex:
+            if not self.isLoggedIn(cookie_header, csrf):
+                self.send_log.append((now, csrf, room_id, msg, 'not_logged_in'))
+                return 200, {'code': -101, 'data': [], 'message': '账号未登录', 'msg': '账号未登录'}
+            dice = self.random.random()
+            if dice < self.fail_rate:
+                result = 'failed'
+            elif now - self.account_last_time.get(csrf, -1e9) < self.send_interval or \
+                    now - self.room_last_time.get(room_id, -1e9) < self.room_interval:
+                result = 'rate_limited'
+            elif dice < self.fail_rate + self.filter_rate:
+                result = 'filtered'
+                self.account_last_time[csrf] = now
+                self.room_last_time[room_id] = now
+            else:
+                result = 'ok'
+                self.account_last_time[csrf] = now
+                self.room_last_time[room_id] = now
+            self.send_log.append((now, csrf, room_id, msg, result))
+        if result == 'failed':
+            return 500, None
+        message = {'ok': '', 'rate_limited': 'msg in 1s', 'filtered': 'f'}[result]
+        return 200, {'code': 0, 'data': [], 'message': message, 'msg': message}
+
+    def sleepLatency(self):
+        delay = self.latency + self.random.uniform(0, self.jitter) if self.jitter > 0 else self.latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def start(self):
+        # 在后台线程中运行，返回api_base
+        mock = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # 支持长连接，和真实服务器一样
+
+            def reply(self, status, body):
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                mock.sleepLatency()
+                if url.path == '/room/v1/Room/room_init':
+                    self.reply(*mock.handleRoomInit(urllib.parse.parse_qs(url.query)))
+                else:
+                    self.reply(404, None)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', '0'))
+                form = urllib.parse.parse_qs(self.rfile.read(length).decode('utf-8'))
+                mock.sleepLatency()
+                if urllib.parse.urlsplit(self.path).path == '/msg/send':
+                    self.reply(*mock.handleSend(form, self.headers.get('Cookie', '')))
+                else:
+                    self.reply(404, None)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        t = threading.Thread(target=self.server.serve_forever, daemon=True)
+        t.start()
+        return self.getApiBase()
+
+    def getApiBase(self):
+        return 'http://127.0.0.1:' + str(self.port)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def countResults(self):
+        with self.mutex:
+            result_count = {}
+            for _, _, _, _, result in self.send_log:
+                result_count[result] = result_count.get(result, 0) + 1
+        return result_count
+
+
+def addServerArguments(parser):
+    # 性能测试脚本也用这些参数
+    parser.add_argument('--latency', type=float, default=0.05, help='响应延迟，秒')
+    parser.add_argument('--jitter', type=float, default=0.0, help='延迟随机增加0~jitter秒')
+    parser.add_argument('--server-interval', type=float, default=1.0, help='同一账号发送太快的判定间隔，0为不限制')
+    parser.add_argument('--server-room-interval', type=float, default=0.0, help='同一直播间发送太快的判定间隔')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='返回HTTP 500的比例')
+    parser.add_argument('--filter-rate', type=float, default=0.0, help='返回被屏蔽的比例')
+    parser.add_argument('--bad-rooms', default='', help='不存在的房间号，逗号分隔')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def createServer(args, port=0):
+    return MockLiveServer(
+        port=port,
+        latency=args.latency,
+        jitter=args.jitter,
+        send_interval=args.server_interval,
+        room_interval=args.server_room_interval,
+        fail_rate=args.fail_rate,
+        filter_rate=args.filter_rate,
+        bad_rooms=[room_id for room_id in args.bad_rooms.split(',') if len(room_id) > 0],
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='本地模拟的b站直播接口')
+    parser.add_argument('--port', type=int, default=8080)
+    addServerArguments(parser)
+    args = parser.parse_args()
+    server = createServer(args, args.port)
+    print('api_base:' + server.start())
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print(server.countResults())
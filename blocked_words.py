@@ -0,0 +1,168 @@
+"""
+本地屏蔽词检查
+包含屏蔽词的弹幕发出去也会被b站吞掉，还要在每个直播间占一次发送间隔，所以加入队列前先在本地检查
+屏蔽词保存在resource/data/BlockedWordLib.txt，一行一个，#开头的行为注释
+用Aho–Corasick自动机匹配，检查一条弹幕的时间只和弹幕长度有关，和屏蔽词的数量无关
+运行中添加的屏蔽词放在一个小的自动机里，只重建这个小的，攒多了再合并到主自动机
+合并在后台线程中进行，屏蔽词多时重建要几百毫秒，不能卡住界面，建好之后在界面线程下次检查或添加时换上
+"""
+import os
+import threading
+
+
+BLOCKED_WORD_LIB_PATH = './resource/data/BlockedWordLib.txt'
+DELTA_LIMIT = 256  # 运行中添加的屏蔽词超过这么多就合并到主自动机
+
+
+class AhoCorasick():
+    # 多模式匹配的自动机，建好之后不再修改
+    def __init__(self, word_list):
+        self.goto = [{}]  # 每个节点的转移，key为字符
+        self.fail = [0]  # 失配时跳到的节点
+        self.out = [()]  # 到这个节点时匹配上的屏蔽词的长度
+        self.word_num = 0
+        for word in word_list:
+            self.addWord(word)
+        self.buildFail()
+
+    def addWord(self, word):
+        if len(word) == 0:
+            return
+        node = 0
+        for c in word:
+            next_node = self.goto[node].get(c)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][c] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = next_node
+        if len(word) not in self.out[node]:
+            self.out[node] = (len(word),)
+            self.word_num += 1
+
+    def buildFail(self):
+        # 按层遍历，每个节点的fail指向它的最长的、也在树中的后缀
+        queue = list(self.goto[0].values())
+        index = 0
+        while index < len(queue):
+            node = queue[index]
+            index += 1
+            for c, child in self.goto[node].items():
+                queue.append(child)
+                fail_node = self.fail[node]
+                while fail_node != 0 and c not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                fail_node = self.goto[fail_node].get(c, 0)
+                self.fail[child] = fail_node if fail_node != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]  # 后缀匹配上的也算
+
+    def search(self, text):
+        # 返回所有匹配上的(开始位置, 结束位置)
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        match_list = []
+        node = 0
+        for index, c in enumerate(text):
+            while node != 0 and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for word_len in out[node]:
+                match_list.append((index + 1 - word_len, index + 1))
+        return match_list
+
+
+class BlockedWordFilter():
+    def __init__(self, word_list=(), path=None):
+        # path不为None时，运行中添加的屏蔽词也写到这个文件里
+        self.path = path
+        self.word_set = set(word for word in word_list if len(word) > 0)
+        self.main_words = list(self.word_set)
+        self.main = AhoCorasick(self.main_words)
+        self.delta_words = []
+        self.delta = None  # 运行中添加的屏蔽词的自动机，没有时为None
+        self.merging = False  # 是否正在后台合并
+        self.merged = None  # 后台建好的(主自动机, 词表, 合并了delta_words中的前几个)，还没换上时不为None
+
+    def __len__(self):
+        return len(self.word_set)
+
+    def addWord(self, word):
+        # 运行中添加一个屏蔽词，返回是否是新加的
+        word = word.strip()
+        if len(word) == 0 or word in self.word_set:
+            return False
+        self.applyMerged()
+        self.word_set.add(word)
+        self.delta_words.append(word)
+        if len(self.delta_words) > DELTA_LIMIT and not self.merging:
+            # 攒多了合并到主自动机，平时只重建小的，合并完之前这些词还在小的自动机里
+            self.merging = True
+            thread = threading.Thread(
+                target=self.buildMerged, args=(self.main_words + self.delta_words, len(self.delta_words)), daemon=True)
+            thread.start()
+        self.delta = AhoCorasick(self.delta_words)
+        if self.path is not None:
+            try:
+                with open(self.path, 'a', encoding="utf-8") as f:
+                    f.write(word + '\n')
+            except IOError:
+                print("屏蔽词写入失败，exception in BlockedWordFilter:addWord")
+        return True
+
+    def buildMerged(self, word_list, delta_num):
+        # 在后台线程中建主自动机，只在最后赋值一次，由使用的线程换上
+        self.merged = (AhoCorasick(word_list), word_list, delta_num)
+
+    def applyMerged(self):
+        # 后台合并完了就换上新的主自动机，小的自动机只留合并之后添加的词
+        merged = self.merged
+        if merged is None:
+            return
+        self.merged = None
+        self.main, self.main_words, delta_num = merged
+        self.delta_words = self.delta_words[delta_num:]
+        self.delta = AhoCorasick(self.delta_words) if len(self.delta_words) > 0 else None
+        self.merging = False
+
+    def findMatches(self, text):
+        # 返回text中所有屏蔽词的位置[(开始, 结束)]，按开始位置排序，重叠的合并成一段
+        self.applyMerged()
+        match_list = self.main.search(text)
+        if self.delta is not None:
+            match_list += self.delta.search(text)
+        if len(match_list) == 0:
+            return match_list
+        match_list.sort()
+        merged_list = [match_list[0]]
+        for start, end in match_list[1:]:
+            last_start, last_end = merged_list[-1]
+            if start < last_end:
+                merged_list[-1] = (last_start, max(last_end, end))
+            else:
+                merged_list.append((start, end))
+        return merged_list
+
+
+def readBlockedWords(path=BLOCKED_WORD_LIB_PATH):
+    # 读取屏蔽词列表，文件不存在时为空
+    word_list = []
+    if not os.path.exists(path):
+        return word_list
+    with open(path, 'r', encoding="utf-8") as f:
+        for line in f:
+            line = line.strip(" \t\r\n")
+            if len(line) == 0 or line.startswith('#'):
+                continue
+            word_list.append(line)
+    return word_list
+
+
+def createBlockedWordFilter(path=BLOCKED_WORD_LIB_PATH):
+    return BlockedWordFilter(readBlockedWords(path), path)
+
+
+if __name__ == "__main__":
+    pass
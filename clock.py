@@ -0,0 +1,34 @@
+"""
+发送器用到的时间，默认用time.monotonic和time.sleep
+模拟时换成VirtualClock，sleep只是把时间往后拨，几个小时的发送几秒就能模拟完
+"""
+import time
+
+
+class SystemClock():
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock():
+    # 虚拟时间，只能在一个线程中使用
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.time += seconds
+
+    def advanceTo(self, t):
+        self.time = max(self.time, t)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,71 @@
+"""
+积压消息的合并
+输入比发送快时，队列里会积压很多短消息，每条都要在每个直播间占一次发送间隔
+队列中积压的消息达到coalesce_backlog条时，把相邻的优先级和前后缀都相同的消息合并成一条，合并后不超过words_limit
+"""
+import segmentation
+
+
+class Coalescer():
+    def __init__(self, words_limit, backlog, separator):
+        self.words_limit = words_limit  # 这个账号能发的最大长度
+        self.backlog = backlog  # 积压多少条时开始合并
+        self.separator = separator  # 合并时各条之间加的内容
+
+    def mergedLen(self, first, body_len, msg):
+        # 把msg接到后面之后的总长度
+        return segmentation.textLen(first.prefix) + body_len + segmentation.textLen(self.separator) + \
+            segmentation.textLen(msg.body) + segmentation.textLen(first.suffix)
+
+    def canMerge(self, first, body_len, msg):
+        return msg.priority == first.priority and msg.prefix == first.prefix and msg.suffix == first.suffix and \
+            self.mergedLen(first, body_len, msg) <= self.words_limit
+
+    def coalesceFromQueue(self, first, msg_queue):
+        # first是刚从队列取出的消息，积压够多时继续从队列取能合并的消息，返回合并后的消息(没有合并时就是first)
+        if len(msg_queue) < self.backlog:
+            return first
+        merge_list = []
+        body_len = segmentation.textLen(first.body)
+        while True:
+            msg = msg_queue.get_if(lambda next_msg: self.canMerge(first, body_len, next_msg))
+            if msg is None:
+                break
+            merge_list.append(msg)
+            body_len += segmentation.textLen(self.separator) + segmentation.textLen(msg.body)
+        if len(merge_list) == 0:
+            return first
+        return first.merge(merge_list, self.separator)
+
+    def coalesceList(self, msg_list, backlog_num):
+        # 合并一批按顺序取出的消息中相邻的，backlog_num为当前积压了多少条
+        if backlog_num < self.backlog:
+            return msg_list
+        result = []
+        index = 0
+        while index < len(msg_list):
+            first = msg_list[index]
+            merge_list = []
+            body_len = segmentation.textLen(first.body)
+            index += 1
+            while index < len(msg_list) and self.canMerge(first, body_len, msg_list[index]):
+                merge_list.append(msg_list[index])
+                body_len += segmentation.textLen(self.separator) + segmentation.textLen(msg_list[index].body)
+                index += 1
+            result.append(first.merge(merge_list, self.separator) if len(merge_list) > 0 else first)
+        return result
+
+
+def createCoalescer(running_info, words_limit):
+    # coalesce为1时合并，否则返回None
+    if running_info.get('coalesce', '0') != '1':
+        return None
+    return Coalescer(
+        words_limit,
+        int(running_info.get('coalesce_backlog', '3')),
+        running_info.get('coalesce_separator', '，'),
+    )
+
+
+if __name__ == "__main__":
+    pass
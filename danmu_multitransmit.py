@@ -5,10 +5,37 @@ ActualTransimitter实际进行弹幕发送
 """
 # import pandas as pd
 import requests
+import requests.adapters
 import threading
 import time
 import re
-import tkinter
+import queue
+import heapq
+import collections
+import itertools
+import random
+import rate_scheduler
+import msg_queue
+import room_id_cache
+import room_resolver
+import send_result
+import pacing
+import metrics
+import metrics_server
+import transmit_listener
+import clock
+import coalesce
+import dedup
+import transport
+
+
+API_BASE = "https://api.live.bilibili.com"
+SEND_PATH = "/msg/send"
+SEND_HEADERS = {
+    'authority': 'api.live.bilibili.com',
+    'accept-encoding': 'gzip, deflate, br',
+    'referer': 'https://live.bilibili.com/',
+}
 
 
 def getCurTime():
@@ -25,85 +52,431 @@ def is_integer(s):
     return False
 
 
-def getRoomId(simple_id):
-    # 使用api获取房间的真实id
-    url = "https://api.live.bilibili.com/room/v1/Room/room_init"
+def makeSendData(msg, room_id, csrf_token):
+    # 发送数据
+    """
+    mode: 弹幕显示模式（滚动、顶部、底部）
+    font_size: 字体尺寸
+    color: 颜色
+    timestamp: 时间戳
+    rnd: 随机数
+    uid_crc32: 用户ID文本的CRC32
+    msg_type: 是否礼物弹幕（节奏风暴）
+    bubble: 右侧评论栏气泡
+    msg: 弹幕内容
+    uid: 用户ID
+    uname: 用户名
+    admin: 是否房管
+    vip: 是否月费老爷
+    svip: 是否年费老爷
+    urank: 用户身份，用来判断是否正式会员，猜测非正式会员为5000，正式会员为10000
+    mobile_verify: 是否绑定手机
+    uname_color: 用户名颜色
+    medal_level: 勋章等级
+    medal_name: 勋章名
+    runame: 勋章房间主播名
+    room_id: 勋章房间ID
+    mcolor: 勋章颜色
+    special_medal: 特殊勋章
+    user_level: 用户等级
+    ulevel_color: 用户等级颜色
+    ulevel_rank: 用户等级排名，>50000时为'>50000'
+    old_title: 旧头衔
+    title: 头衔
+    privilege_type: 舰队类型，0非舰队，1总督，2提督，3舰长
+    """
     data = {
-        'id': simple_id
+        'color': "16777215",
+        'fontsize': "25",
+        'mode': "1",
+        'msg': msg,
+        'rnd': getCurTime(),  # 时间戳不改好像也没事
+        'roomid': room_id,
+        'bubble': "0",
+        'csrf_token': csrf_token,
+        'csrf': csrf_token
     }
-    response = requests.get(url, params=data)  # 会在url后面接上"?id=xxx"
-    response.raise_for_status()  # 可能请求失败
+    return data
 
-    try:
-        room_id = response.json()['data']['room_id']  # 得到json格式的数据，进行字典化，根据格式获取room_id
-    except TypeError:
-        tkinter.messagebox.showerror(
-            title='提示',
-            message='请确认房间号是否正确',
-        )
-        raise SystemExit
-    return room_id
+
+def getApiBase(running_info):
+    # 配置中的api_base可以改成本地的模拟服务器，测试和性能测试时用，一般不用设置
+    return running_info.get('api_base', API_BASE).rstrip('/')
+
+
+def createSession(running_info, headers, cookie):
+    # 创建一个长连接的会话，连接池里的连接可以复用，不用每条弹幕都重新进行TCP和TLS握手
+    pool_size = int(running_info.get('pool_size', '10'))  # 连接池大小，配置里没有就用默认值
+    keep_alive = running_info.get('keep_alive', '1') != '0'  # 是否保持连接
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # 请求头和cookie直接绑定到会话上，之后每次请求不用再构造
+    # cookie是从浏览器复制的整个字符串，原样放在Cookie请求头里，放进cookie jar会变成一个名为cookie的值，b站读不出SESSDATA
+    session.headers.update(headers)
+    if not keep_alive:
+        session.headers['connection'] = 'close'
+    session.headers['Cookie'] = cookie
+    return session
+
+
+def readRunningConfig(path="./config/RunningConfig.txt"):
+    # 读取运行配置，每行"key:value"，读取失败时抛出IOError
+    running_info = {}
+    with open(path, 'r', encoding="utf-8") as f:
+        lines = f.readlines()
+        for line in lines:
+            line = line.strip(" \t\r\n")
+            if len(line) == 0:
+                continue
+            parts = re.split("[: \t\r\n]+", line, 1)
+            running_info[parts[0]] = parts[1].strip(" \r\n") if len(parts) > 1 else ""
+    return running_info
+
+
+def parseAccounts(running_info):
+    """
+    从配置中读出所有账号，第一个账号用csrf_token、cookie、words_limit、rooms
+    之后的账号在后面加上序号，如csrf_token_2、cookie_2、words_limit_2、rooms_2，序号要连续
+    rooms是固定分给这个账号的直播间号，逗号分隔，可以不填，没有固定的直播间会自动分给各账号
+    csrf_token或cookie为空的账号会被跳过
+    """
+    account_list = []
+    index = 1
+    while True:
+        suffix = "" if index == 1 else "_" + str(index)
+        if 'csrf_token' + suffix not in running_info and 'cookie' + suffix not in running_info:
+            break
+        csrf_token = running_info.get('csrf_token' + suffix, "")
+        cookie = running_info.get('cookie' + suffix, "")
+        if len(csrf_token) != 0 and len(cookie) != 0:
+            rooms = running_info.get('rooms' + suffix, "")
+            account_list.append({
+                'name': str(index),
+                'csrf_token': csrf_token,
+                'cookie': cookie,
+                'words_limit': int(running_info.get('words_limit' + suffix, running_info.get('words_limit', '20'))),
+                'rooms': [room.strip() for room in rooms.split(",") if len(room.strip()) != 0],
+            })
+        index += 1
+    return account_list
+
+
+def assignRooms(room_id_list, account_list):
+    # 把直播间分给各账号，先按配置固定分配，剩下的每次分给当前直播间最少的账号，返回和account_list对应的列表
+    account_room_lists = [[] for _ in account_list]
+    left_room_list = []
+    for room_id in room_id_list:
+        for index, account in enumerate(account_list):
+            if room_id in account['rooms']:
+                account_room_lists[index].append(room_id)
+                break
+        else:
+            left_room_list.append(room_id)
+    for room_id in left_room_list:
+        index = min(range(len(account_list)), key=lambda i: len(account_room_lists[i]))
+        account_room_lists[index].append(room_id)
+    return account_room_lists
+
+
+class DanmuMsg():
+    # 一条要发送的弹幕，发送器之间传递的都是这个
+    id_counter = itertools.count(1)  # 每条消息的编号，记录日志时用
+
+    def __init__(self, body, priority=msg_queue.PRIORITY_NORMAL, room_num=0, prefix='', suffix=''):
+        self.msg_id = next(DanmuMsg.id_counter)
+        self.body = body  # 输入的内容
+        self.prefix = prefix
+        self.suffix = suffix
+        self.text = prefix + body + suffix  # 已经加上前后缀的内容，发送的是这个
+        self.priority = priority
+        self.enqueue_time = time.monotonic()  # 加入队列的时间
+        self.remaining_room_num = room_num  # 还有几个直播间没处理完
+        self.mutex = threading.Lock()  # 多个账号的发送器会同时更新remaining_room_num
+        self.part_list = [self]  # 合并的消息由哪几条组成，发送结果要算到每一条上
+
+    def merge(self, msg_list, separator):
+        # 和后面几条合并成一条新消息，前后缀和优先级用这一条的
+        merged = DanmuMsg(separator.join([msg.body for msg in [self] + msg_list]), self.priority, 0,
+                          self.prefix, self.suffix)
+        merged.enqueue_time = self.enqueue_time
+        merged.part_list = [self] + msg_list
+        return merged
+
+    def finishRoom(self):
+        # 一个直播间处理完了，返回是不是最后一个
+        with self.mutex:
+            self.remaining_room_num -= 1
+            return self.remaining_room_num == 0
+
+
+def finishRoom(listener, msg, room_target, status):
+    # 一条消息在一个直播间不会再发了，所有直播间都处理完时通知onMsgDone，合并的消息按原来的每一条通知
+    for part in msg.part_list:
+        listener.onRoomDone(part, room_target, status)
+        if part.finishRoom():
+            listener.onMsgDone(part)
+
+
+class RoomTarget():
+    # 一个要发送的直播间，真实id在后台获取，获取完之前发给它的消息要先等着
+    def __init__(self, room_id):
+        self.room_id = room_id  # 输入的房间号，可能是短号
+        self.real_id = None  # 真实id，获取失败时一直是None
+        self.error = None  # 获取失败的原因
+        self.ready = threading.Event()  # 获取完了(不管成功失败)
+        self.callback_list = []  # 获取完时要调用的函数
+        self.mutex = threading.Lock()
+
+    def isReady(self):
+        return self.ready.is_set()
+
+    def setResult(self, real_id, error):
+        with self.mutex:
+            self.real_id = real_id
+            self.error = error
+            self.ready.set()
+            callback_list = self.callback_list
+            self.callback_list = []
+        for callback in callback_list:
+            callback()
+
+    def addReadyCallback(self, callback):
+        # 获取完时调用callback，如果已经获取完了就直接调用，callback可能在别的线程中调用
+        with self.mutex:
+            if not self.ready.is_set():
+                self.callback_list.append(callback)
+                return
+        callback()
+
+
+class TransmitterError(Exception):
+    # 配置有问题，不能创建发送器，异常信息是给用户看的提示
+    pass
 
 
 class DanmuMultiTransimitter():
-    def __init__(self, room_id_list):
-        # 读一下配置
+    def __init__(self, room_id_list, running_info=None):
+        # 读一下配置，running_info不为None时直接使用，不读配置文件(性能测试等用)
+        # 出错时抛出TransmitterError，由界面弹窗或命令行打印，这里不直接操作界面
         try:
             # 获取cookie等信息
-            with open("./config/RunningConfig.txt", 'r', encoding="utf-8") as f:
-                lines = f.readlines()
-                self.running_info = {}
-                for line in lines:
-                    line = line.strip(" \t\r\n")
-                    if len(line) == 0:
-                        continue
-                    parts = re.split("[: \t\r\n]+", line, 1)
-                    self.running_info[parts[0]] = parts[1].strip(" \r\n")
+            self.running_info = readRunningConfig() if running_info is None else running_info
         except IOError:
-            tkinter.messagebox.showerror(
-                title='提示',
-                message='没有找到配置文件或读入失败，exception in danmu_multitransmit.py:__init__',
-            )
-            print("没有找到配置文件或读入失败，exception in danmu_multitransmit.py:__init__")
-            exit(-1)
-        except:
-            tkinter.messagebox.showerror(
-                title='提示',
-                message='其他错误，exception in danmu_multitransmit.py:__init__',
+            raise TransmitterError('没有找到配置文件或读入失败，exception in danmu_multitransmit.py:__init__')
+        except Exception:
+            raise TransmitterError('其他错误，exception in danmu_multitransmit.py:__init__')
+
+        self.account_list = parseAccounts(self.running_info)
+        if len(self.account_list) == 0:
+            raise TransmitterError('请先设置csrf、cookie等信息')
+        # 发送频率由调度器控制，按账号和直播间分别限制
+        self.scheduler = rate_scheduler.createScheduler(self.running_info)
+        # 发送过程中的事件，统计等都通过listener获取
+        self.listener = transmit_listener.ListenerGroup()
+        self.metrics = metrics.TransmitMetrics(int(self.running_info.get('metrics_window', '1000')))
+        self.listener.addListener(self.metrics)
+        # 设置了metrics_port时在本地提供Prometheus格式的统计接口
+        self.metrics_server = None
+        metrics_port = int(self.running_info.get('metrics_port', '0'))
+        if metrics_port > 0:
+            prometheus_metrics = metrics_server.PrometheusMetrics()
+            self.listener.addListener(prometheus_metrics)
+            self.metrics_server = metrics_server.MetricsServer(metrics_port, prometheus_metrics, self.getGauges)
+        # 每个账号一个发送器，各自发送分到的直播间，engine为asyncio时用事件循环来发送
+        engine = self.running_info.get('engine', 'thread')
+        if engine == 'asyncio':
+            import async_transmit  # 需要aiohttp，用到时再导入
+            if not async_transmit.isAvailable():
+                raise TransmitterError('asyncio发送需要aiohttp，请先安装或将engine改为thread')
+            sender_class = async_transmit.AsyncTransimitter
+        else:
+            sender_class = ActualTransimitter
+        # 发送器马上创建好，直播间的真实id在后台获取，获取完之前的消息先在队列里等着
+        self.room_target_dict = {}
+        for room_id in room_id_list:
+            if room_id not in self.room_target_dict:
+                self.room_target_dict[room_id] = RoomTarget(room_id)
+        self.room_error_dict = {}  # 获取失败的直播间，由界面提示，其他直播间照常发送
+        self.resolve_done_num = 0
+        self.resolve_finished = threading.Event()
+        self.sender_list = []
+        account_room_lists = assignRooms(list(self.room_target_dict.keys()), self.account_list)
+        for account, account_room_list in zip(self.account_list, account_room_lists):
+            if len(account_room_list) == 0:
+                continue  # 账号比直播间多时，有的账号没有分到直播间
+            room_target_list = [self.room_target_dict[room_id] for room_id in account_room_list]
+            self.sender_list.append(
+                sender_class(room_target_list, account, self.running_info, self.scheduler, self.listener))
+        t = threading.Thread(target=self.resolveRooms, daemon=True)
+        t.start()
+
+    def resolveRooms(self):
+        # 在后台获取各直播间的真实id，先查本地缓存，缓存中有的直播间不用联网
+        try:
+            room_id_cache.resolveRoomIdsWithCache(
+                room_id_cache.createRoomIdCache(self.running_info),
+                list(self.room_target_dict.keys()),
+                float(self.running_info.get('http_timeout', '5')),
+                int(self.running_info.get('resolve_workers', '8')),
+                room_callback=self.onRoomResolved,
+                room_init_url=getApiBase(self.running_info) + room_resolver.ROOM_INIT_PATH
             )
-            print("其他错误，exception in danmu_multitransmit.py:__init__")
-            exit(-1)
+        finally:
+            for room_target in self.room_target_dict.values():
+                if not room_target.isReady():
+                    room_target.setResult(None, '获取失败')  # 出了意外也不能让发送线程一直等
+            self.resolve_finished.set()
+
+    def onRoomResolved(self, room_id, real_id, error):
+        if error is not None:
+            self.room_error_dict[room_id] = error
+        self.resolve_done_num += 1
+        self.room_target_dict[room_id].setResult(real_id, error)
+
+    def getResolveProgress(self):
+        # 返回(已经获取完几个, 一共几个, 是否全部获取完)
+        return self.resolve_done_num, len(self.room_target_dict), self.resolve_finished.is_set()
+
+    def getAlerts(self):
+        # 取出各发送器要提示的信息，在界面线程中调用
+        alert_list = []
+        for sender in self.sender_list:
+            while len(sender.alert_deque) > 0:
+                alert_list.append(sender.alert_deque.popleft())
+        return alert_list
+
+    def addMsg(self, msg, priority=msg_queue.PRIORITY_NORMAL, prefix='', suffix=''):
+        # 每条消息都要发到所有直播间，所以每个账号都要发一遍，返回是否所有账号都加入成功
+        # msg为输入的内容，发送时加上前后缀，前后缀分开传是为了合并消息时只合并中间的内容
+        return self.addDanmuMsg(self.createMsg(msg, priority, prefix, suffix))
+
+    def createMsg(self, msg, priority=msg_queue.PRIORITY_NORMAL, prefix='', suffix=''):
+        # 先创建消息再用addDanmuMsg加入，界面要用msg_id对应之后的发送结果
+        return DanmuMsg(msg, priority, len(self.room_target_dict), prefix, suffix)
 
-        if len(self.running_info['csrf_token']) == 0 or len(self.running_info['cookie']) == 0:
-            tkinter.messagebox.showerror(
-                title='提示',
-                message='请先设置csrf、cookie等信息',
+    def getRoomIds(self):
+        # 去掉重复之后的各直播间房间号，和发送结果中的房间号一样
+        return list(self.room_target_dict.keys())
+
+    def addDanmuMsg(self, danmu_msg):
+        self.listener.onEnqueue(danmu_msg)
+        accepted = True
+        for sender in self.sender_list:
+            if not sender.addMsg(danmu_msg):
+                accepted = False
+                for room_target in sender.room_target_list:
+                    finishRoom(self.listener, danmu_msg, room_target, transmit_listener.ROOM_FAILED)
+        return accepted
+
+    def getStatus(self):
+        # 状态栏显示用，返回(队列中的消息数, 预计多久发完, 最近请求用时的p95)，在界面线程中调用
+        queue_depth = 0
+        drain_time = 0.0
+        for sender in self.sender_list:
+            queue_depth = max(queue_depth, len(sender.msg_queue))
+            # 账号的发送间隔和单个直播间的发送间隔，哪个慢按哪个算
+            sender_drain_time = max(
+                sender.getPendingSendNum() * self.scheduler.getAccountInterval(sender.account),
+                len(sender.msg_queue) * self.scheduler.room_interval
             )
-            raise SystemExit
-        # 启动实际发送线程
-        self.sender = ActualTransimitter(room_id_list, self.running_info)
+            drain_time = max(drain_time, sender_drain_time)
+        latency_p95 = self.metrics.http_latency.percentiles([95])[0]
+        return queue_depth, drain_time, latency_p95
+
+    def getGauges(self):
+        # 统计接口抓取时调用，返回metrics_server.PrometheusMetrics.render要的gauge_list
+        queue_items = []
+        pending_items = []
+        interval_items = []
+        for sender in self.sender_list:
+            queue_items.append(((sender.account,), len(sender.msg_queue)))
+            pending_items.append(((sender.account,), sender.getPendingSendNum()))
+            interval_items.append(((sender.account,), self.scheduler.getAccountInterval(sender.account)))
+        return [
+            ('danmu_queue_depth', '队列中还没取出的消息数', ['account'], queue_items),
+            ('danmu_pending_sends', '还要发送的次数', ['account'], pending_items),
+            ('danmu_send_interval_seconds', '账号当前的发送间隔', ['account'], interval_items),
+        ]
 
-    def addMsg(self, msg):
-        self.sender.addMsg(msg)
+    def addListener(self, listener):
+        # 在start之前加入其他需要知道发送情况的listener，如界面的发送日志
+        self.listener.addListener(listener)
+
+    def setVariantFixes(self, fix_list):
+        # 设置重复时可以换用的前后缀列表，元素为(前缀, 后缀)，dedup为variant时使用
+        for sender in self.sender_list:
+            if sender.deduplicator is not None:
+                sender.deduplicator.setVariantFixes(fix_list)
 
     def start(self):
-        self.sender.start()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+        for sender in self.sender_list:
+            sender.start()
 
     def stop(self):
-        self.sender.stop()
-
-
-class ActualTransimitter():
-    def __init__(self, room_id_list, running_info):
-        self.msg_box_size = 16
-        self.msg_list = [None] * self.msg_box_size  # 消息队列能存放msg_box_size条消息，可以动态调整
-        self.msg_num = 0  # 现在队列中有几条消息待发送
-        self.msg_save_index = 0  # 消息队列中的索引，存放消息时用
-        self.msg_get_index = 0  # 取消息时用
-        self.last_send_time = time.time()  # # 上一次弹幕发送时间，用这个来判断1s间隔可能更好一点
-        self.mutex = threading.Lock()  # 一个锁，上面一些变量的访问都需要锁
-        self.semaphore = threading.Semaphore(0)  # 信号量，相当于消息数，初始为0，这样run里就不用忙等待了
-        # 也可以用管程来做
+        for sender in self.sender_list:
+            sender.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()  # 重新进入发送界面时要用同一个端口
+
+    def join(self):
+        # 等所有发送线程结束，stop之后要等剩余消息都发完才会返回
+        for sender in self.sender_list:
+            if sender.thread is not None:
+                sender.thread.join()
+
+
+class SenderBase():
+    """
+    两种发送器共用的发送前后处理，子类要有account、listener、scheduler、result_policy、
+    deduplicator、pacer、paused_until、account_stopped、alert_deque、random这些属性
+    """
+    def alert(self, info):
+        self.alert_deque.append('账号' + self.account + '：' + info)
+
+    def checkDuplicate(self, msg, room_target, now):
+        # 发送前调用，返回要发送的内容，和这个直播间最近的弹幕重复(发了也会被b站吞掉)时返回None
+        if self.deduplicator is None:
+            return msg.text
+        return self.deduplicator.check(msg, room_target.real_id, now)
+
+    def afterSend(self, msg, room_target, attempt, text, result, now):
+        # 发送后调用，记录发送的内容、调整发送间隔，返回send_result.SendDecision
+        if self.deduplicator is not None and result.isOk():
+            self.deduplicator.record(room_target.real_id, text, now)
+        if self.pacer is not None and self.pacer.onResult(result):
+            self.scheduler.setAccountInterval(self.account, self.pacer.interval)
+        label = '房间' + room_target.room_id + '「' + msg.text + '」'
+        decision = self.result_policy.decide(result, attempt, label, self.random)
+        if decision.pause_time > 0:
+            # 一个账号只暂停一次，暂停中不再延长也不重复提示，暂停过之后还是这样就停止发送
+            if self.paused_until > now:
+                decision.alert = None
+            elif self.paused_until > 0:
+                decision = send_result.SendDecision(
+                    transmit_listener.ROOM_FAILED, alert=label + result.describe() + '，暂停之后仍然这样，这个账号停止发送',
+                    stop_account=True)
+            else:
+                self.paused_until = now + decision.pause_time
+        if decision.stop_account:
+            if self.account_stopped:
+                decision.alert = None  # 同时在发的其他直播间也会得到这个结果，只提示一次
+            self.account_stopped = True
+        if decision.alert is not None:
+            self.alert(decision.alert)
+        return decision
+
+
+class ActualTransimitter(SenderBase):
+    def __init__(self, room_target_list, account, running_info, scheduler, listener, send_clock=None, send_transport=None,
+                 send_random=None):
+        # send_clock和send_transport为None时用真实的时间和网络请求，模拟时传入虚拟的(见simulator.py)
+        # send_random为重发间隔用的random.Random，模拟时传入固定了种子的
+        self.msg_queue = msg_queue.createMsgQueue(running_info, self.dropMsg)  # 有长度限制，满了之后按配置的策略处理
         """
         根据 MDN 的文档定义，请求方法为：GET、POST、HEAD，请求头 Content-Type 为：
         text/plain、multipart/form-data、application/x-www-form-urlencoded 的
@@ -111,147 +484,206 @@ class ActualTransimitter():
 
         如果请求头的 Content-Type 为 application/json 就会触发 CORS 预检请求，这里也会称为 “非简单请求”
         """
-        self.headers = {
-            'authority': 'api.live.bilibili.com',
-            'accept-encoding': 'gzip, deflate, br',
-            'referer': 'https://live.bilibili.com/',
-        }
+        self.headers = SEND_HEADERS
 
-        self.dest_room_true_id_list = []
-        for room_id in room_id_list:
-            self.dest_room_true_id_list.append(getRoomId(room_id))
+        self.room_target_list = room_target_list  # 真实id由DanmuMultiTransimitter在后台获取
+        self.thread = None  # 发送线程，start中创建
 
-        self.csrf_token = running_info['csrf_token']
-        self.cookie = running_info['cookie']
-        self.send_interval = float(running_info['send_interval'])  # 发消息间隔时间，这里的间隔设置为实际需求的间隔，目前是1s
+        self.csrf_token = account['csrf_token']
+        self.cookie = account['cookie']
+        self.account = account['name']  # 调度器中账号的key
+        self.account_key = pacing.getAccountKey(account)  # 保存自适应间隔时用的key
+        self.scheduler = scheduler  # 发送间隔由调度器控制，配置中的send_interval对应账号的发送间隔
+        self.clock = clock.SystemClock() if send_clock is None else send_clock
+        if send_transport is None:
+            # 包含账号信息，发送线程结束时关闭
+            session = createSession(running_info, self.headers, self.cookie)
+            send_transport = transport.RequestsTransport(
+                session, getApiBase(running_info) + SEND_PATH, float(running_info.get('http_timeout', '5')))
+        self.transport = send_transport
+        self.result_policy = send_result.createResultPolicy(running_info)  # 发送结果的处理方式
+        self.random = random.Random() if send_random is None else send_random
+        self.coalescer = coalesce.createCoalescer(running_info, account['words_limit'])  # 积压时合并消息，不合并时为None
+        self.deduplicator = dedup.createDeduplicator(running_info, account['words_limit'])  # 不处理重复弹幕时为None
+        self.pacing_state_path = pacing.getStatePath(running_info)
+        self.pacer = pacing.createPacer(running_info, account)  # 自适应发送间隔，不使用时为None
+        if self.pacer is not None:
+            self.scheduler.setAccountInterval(self.account, self.pacer.interval)  # 从上次学到的间隔开始
+        self.job_deque = collections.deque()  # 可以马上发送的任务，每个任务为(消息, 直播间, 第几次重发)
+        self.retry_heap = []  # 要重发的任务，元素为(重发时间, 序号, 任务)，按时间排序
+        self.retry_seq = 0
+        self.paused_until = 0.0  # 账号暂停到什么时候，self.clock的时间
+        self.account_stopped = False  # 账号未登录或被禁言，不再发送
+        self.alert_deque = collections.deque()  # 要在界面上提示的信息，界面线程取走
+        self.waiting_msg_dict = {}  # 还没获取到真实id的直播间积压的消息，key为RoomTarget
+        self.stopping = False  # stop之后队列里的消息已经取完，等剩下的任务做完就结束
+        self.listener = listener  # 发送过程中的事件通知给它
 
-    def sendDanmu(self, msg, room_id):
-        url_to_request = "https://api.live.bilibili.com/msg/send"
-        # 发送数据
-        """
-        mode: 弹幕显示模式（滚动、顶部、底部）
-        font_size: 字体尺寸
-        color: 颜色
-        timestamp: 时间戳
-        rnd: 随机数
-        uid_crc32: 用户ID文本的CRC32
-        msg_type: 是否礼物弹幕（节奏风暴）
-        bubble: 右侧评论栏气泡
-        msg: 弹幕内容
-        uid: 用户ID
-        uname: 用户名
-        admin: 是否房管
-        vip: 是否月费老爷
-        svip: 是否年费老爷
-        urank: 用户身份，用来判断是否正式会员，猜测非正式会员为5000，正式会员为10000
-        mobile_verify: 是否绑定手机
-        uname_color: 用户名颜色
-        medal_level: 勋章等级
-        medal_name: 勋章名
-        runame: 勋章房间主播名
-        room_id: 勋章房间ID
-        mcolor: 勋章颜色
-        special_medal: 特殊勋章
-        user_level: 用户等级
-        ulevel_color: 用户等级颜色
-        ulevel_rank: 用户等级排名，>50000时为'>50000'
-        old_title: 旧头衔
-        title: 头衔
-        privilege_type: 舰队类型，0非舰队，1总督，2提督，3舰长
-        """
-        data = {
-            'color': "16777215",
-            'fontsize': "25",
-            'mode': "1",
-            'msg': msg,
-            'rnd': getCurTime(),  # 时间戳不改好像也没事
-            'roomid': room_id,
-            'bubble': "0",
-            'csrf_token': self.csrf_token,
-            'csrf': self.csrf_token
-        }
-
-        # 包含账号信息
-        cookie = {'cookie': self.cookie}
-
-        diff_time = time.time() - self.last_send_time  # 离上一次发送过了多久
-        sleep_time = self.send_interval + 0.1 - diff_time  # 要等待多久才能再发，这里加0.1让时间稍微宽松一点
-        # print(sleep_time)
-        if sleep_time > 0:
-            time.sleep(sleep_time)  # b站弹幕好像要隔1s才能发1条，所以要这样来设置
-
-        self.last_send_time = time.time()  # 更新发送时间
-        send_response = requests.post(url_to_request, headers=self.headers, data=data, cookies=cookie)
-        # print(send_response.headers['date'])
-        # print(send_response.elapsed.total_seconds())  # 获取响应的时间
-        # 响应时间大概在0.1~0.2s左右
-        send_response.raise_for_status()  # 如果出错会有相应信息
-        # response = send_response.json()
-        # if response['message'] == "msg in 1s":
-        #    data['rnd'] = getCurTime()  # 重发
-        # else:
-        #    break
-
-    def addMsg(self, msg):
-        # 把消息加入到消息队列
-        self.mutex.acquire()
-        try:
-            if self.msg_num >= self.msg_box_size:
-                # 要扩容
-                temp = self.msg_list
-                self.msg_box_size = self.msg_box_size * 2
-                self.msg_list = [None] * self.msg_box_size
-                # 把原先的消息转移
-                trans_index = 0
-                while trans_index < self.msg_num:
-                    self.msg_list[trans_index] = temp[self.msg_get_index]
-                    trans_index += 1
-                    self.msg_get_index = (self.msg_get_index+1) % self.msg_num  # 这里num对应原来的容量
-                self.msg_get_index = 0
-                self.msg_save_index = self.msg_num
-
-            # 存下新的消息
-            self.msg_num += 1
-            self.msg_list[self.msg_save_index] = msg
-            self.msg_save_index = (self.msg_save_index + 1) % self.msg_box_size
-        finally:
-            self.mutex.release()
-        self.semaphore.release()  # 计数器加1
-
-    def getMsg(self):
-        # 从消息队列获取一条消息
-        msg = None
-        self.semaphore.acquire()  # 这个信号量可能在stop中被释放，也就是说下面msg_num可能为0，msg可能为None，对应结束情况
-        self.mutex.acquire()
-        try:
-            if self.msg_num > 0:
-                self.msg_num -= 1
-                msg = self.msg_list[self.msg_get_index]
-                self.msg_get_index = (self.msg_get_index+1) % self.msg_box_size
-        finally:
-            self.mutex.release()
+    def sendDanmu(self, msg, room_target, attempt, text=None):
+        # 发送一条弹幕，返回send_result.SendResult，text为None时发送msg.text，不为None时是为了避开重复换的内容
+        text = msg.text if text is None else text
+        data = makeSendData(text, room_target.real_id, self.csrf_token)
+
+        # b站弹幕好像要隔1s才能发1条，等到账号和直播间都有令牌了再发
+        sleep_time = self.scheduler.reserve(self.account, room_target.real_id)
+        self.clock.sleep(sleep_time)
+        self.listener.onSendStart(msg, room_target, self.account, attempt)
+        start_time = self.clock.now()
+        result = self.transport.post(data)
+        self.listener.onSendEnd(msg, room_target, self.account, attempt, result, self.clock.now() - start_time, sleep_time,
+                                text)
+        return result
+
+    def handleResult(self, job, text, result):
+        # 按发送结果处理，重发的任务放到retry_heap，不会挡住其他直播间
+        msg, room_target, attempt = job
+        decision = self.afterSend(msg, room_target, attempt, text, result, self.clock.now())
+        if decision.status is not None:
+            finishRoom(self.listener, msg, room_target, decision.status)
+            return
+        self.listener.onRetry(msg, room_target, self.account, attempt + 1, decision.delay)
+        heapq.heappush(self.retry_heap,
+                       (self.clock.now() + decision.delay, self.retry_seq, (msg, room_target, attempt + 1)))
+        self.retry_seq += 1
+
+    def addMsg(self, danmu_msg):
+        # 把消息加入到消息队列，返回是否加入成功，队列满了并且策略为reject时不会加入
+        return self.msg_queue.put(danmu_msg, priority=danmu_msg.priority)
+
+    def dropMsg(self, danmu_msg):
+        # 队列满了被drop_oldest丢掉的消息，和reject时一样，这个账号的直播间都记为失败
+        for room_target in self.room_target_list:
+            finishRoom(self.listener, danmu_msg, room_target, transmit_listener.ROOM_FAILED)
+
+    def getMsg(self, timeout=None):
+        # 从消息队列获取一条消息，队列为空时等待，超时抛出queue.Empty，stop之后取完剩余消息会得到None
+        msg = self.msg_queue.get(timeout)
+        if msg is msg_queue.MsgQueue.STOP:
+            return None
+        self.listener.onDequeue(msg, self.account)
         return msg
 
+    def getPendingSendNum(self):
+        # 还要发送多少次，在界面线程中调用，只是估计，不加锁
+        waiting_num = sum([len(msg_list) for msg_list in list(self.waiting_msg_dict.values())])
+        return len(self.msg_queue) * len(self.room_target_list) + len(self.job_deque) + \
+            len(self.retry_heap) + waiting_num
+
     def stop(self):
-        self.semaphore.release()  # 可能之前在等的时候关闭了
+        self.msg_queue.close()  # 可能之前在等的时候关闭了
         # 不是立即中断线程，是要等所有剩余消息发完
         print("end!")
 
+    def sendJob(self, job):
+        msg, room_target, attempt = job
+        if room_target.real_id is None:  # 获取真实id失败的直播间不发送
+            finishRoom(self.listener, msg, room_target, transmit_listener.ROOM_FAILED)
+            return
+        self.clock.sleep(self.paused_until - self.clock.now())  # 账号暂停时所有直播间都不发
+        if self.account_stopped:  # 剩下的消息和重发都不再发送
+            finishRoom(self.listener, msg, room_target, transmit_listener.ROOM_FAILED)
+            return
+        text = self.checkDuplicate(msg, room_target, self.clock.now())
+        if text is None:
+            finishRoom(self.listener, msg, room_target, transmit_listener.ROOM_SKIPPED)
+            return
+        result = self.sendDanmu(msg, room_target, attempt, text)  # send中会有相应的时间间隔
+        self.handleResult(job, text, result)
+
+    def nextJob(self):
+        # 先取到时间的重发任务，再按顺序取新任务，没有可以马上发送的任务时返回None
+        if len(self.retry_heap) > 0 and self.retry_heap[0][0] <= self.clock.now():
+            return heapq.heappop(self.retry_heap)[2]
+        if len(self.job_deque) > 0:
+            return self.job_deque.popleft()
+        return None
+
+    def nextWaitTime(self, waiting_msg_dict):
+        # 没有任务可以发送时最多等多久，None表示一直等到有新消息
+        wait_time = None
+        if len(self.retry_heap) > 0:
+            wait_time = max(0.0, self.retry_heap[0][0] - self.clock.now())
+        if len(waiting_msg_dict) > 0:
+            wait_time = 0.1 if wait_time is None else min(wait_time, 0.1)  # 有直播间在等真实id
+        return wait_time
+
+    def addWaitingJobs(self, waiting_msg_dict):
+        # 已经获取到真实id的直播间之前积压的消息变成任务，和平时一样按消息的顺序轮流发给各直播间
+        ready_list = [room_target for room_target in self.room_target_list
+                      if room_target in waiting_msg_dict and room_target.isReady()]
+        backlog_list = [waiting_msg_dict.pop(room_target) for room_target in ready_list]
+        max_len = max([len(backlog) for backlog in backlog_list], default=0)
+        for index in range(max_len):
+            for room_target, backlog in zip(ready_list, backlog_list):
+                if index < len(backlog):
+                    self.job_deque.append((backlog[index], room_target, 0))
+
+    def addMsgJobs(self, msg, waiting_msg_dict):
+        for room_target in self.room_target_list:
+            if room_target in waiting_msg_dict or not room_target.isReady():
+                waiting_msg_dict.setdefault(room_target, []).append(msg)  # 保持顺序，排在之前积压的后面
+            else:
+                self.job_deque.append((msg, room_target, 0))
+
+    def nextWakeTime(self):
+        # 多久之后有事可做，0表示现在就有，None表示只能等新消息，模拟时用来决定把时间拨到哪里
+        if len(self.job_deque) > 0 or len(self.msg_queue) > 0:
+            return 0.0
+        if self.msg_queue.closed and not self.stopping:
+            return 0.0  # 队列已经关闭，取出STOP就进入结束阶段
+        if self.stopping and len(self.retry_heap) == 0 and len(self.waiting_msg_dict) == 0:
+            return 0.0  # 再做一步就结束了
+        return self.nextWaitTime(self.waiting_msg_dict)
+
+    def step(self, timeout=None):
+        """
+        发送一个任务，或者取一条新消息，没有可做的事时最多等timeout秒(None为一直等到有事可做)
+        返回False表示stop之后所有任务都做完了
+        """
+        waiting_msg_dict = self.waiting_msg_dict
+        self.addWaitingJobs(waiting_msg_dict)
+        job = self.nextJob()
+        if job is not None:
+            self.sendJob(job)
+            return True
+        # 当前没有可以发送的任务，取一条新消息，job_deque空了才取，这样新来的优先级高的消息能排到前面
+        wait_time = self.nextWaitTime(waiting_msg_dict)
+        if self.stopping:
+            if wait_time is None:
+                return False  # 所有任务都做完了
+            self.clock.sleep(wait_time if timeout is None else min(wait_time, timeout))
+            return True
+        if timeout is not None:
+            wait_time = timeout if wait_time is None else min(wait_time, timeout)
+        try:
+            msg = self.getMsg(wait_time)
+        except queue.Empty:
+            return True
+        if msg is None:
+            # 结束，stop时关闭了队列，剩余消息取完后得到STOP，还要等积压的消息和重发发完
+            self.stopping = True
+            return True
+        if self.coalescer is not None:
+            msg = self.coalescer.coalesceFromQueue(msg, self.msg_queue)
+            for part in msg.part_list[1:]:
+                self.listener.onDequeue(part, self.account)
+        self.addMsgJobs(msg, waiting_msg_dict)
+        return True
+
+    def finish(self):
+        self.transport.close()
+        if self.pacer is not None:
+            pacing.saveInterval(self.pacing_state_path, self.account_key, self.pacer.interval)  # 下次从这个间隔开始
+
     def run(self):
         print("start run!")
-        while True:
-            msg = self.getMsg()  # 在获取消息时会等待
-            if msg is not None:
-                for one_id in self.dest_room_true_id_list:
-                    self.sendDanmu(msg, one_id)  # send中会有相应的时间间隔
-                    # print(self.msg_list)
-            else:
-                # 结束，得到的消息是空消息，因为stop时信号量释放了一次，但没有加入消息，所以会取到一条空消息
-                break
+        while self.step():
+            pass
+        self.finish()
 
     def start(self):
-        t = threading.Thread(target=self.run)
-        t.start()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+重复弹幕的处理
+b站会屏蔽同一直播间中和最近的弹幕内容一样的弹幕，发了也看不到，还白占一次发送间隔
+每个直播间记录最近发送成功的几条内容(只存hash)，要发送的内容和最近的重复时按dedup的设置处理：
+skip不发送，variant换一个前后缀或在后面加点内容再发，都不行时不发送
+"""
+import collections
+import segmentation
+
+
+DEDUP_OFF = 'off'
+DEDUP_SKIP = 'skip'
+DEDUP_VARIANT = 'variant'
+
+
+class RecentContentCache():
+    # 一个直播间最近发送的内容，最多size条，超过window秒的不算
+    def __init__(self, size, window):
+        self.size = size
+        self.window = window
+        self.entries = collections.OrderedDict()  # key为内容的hash，value为发送时间，按发送时间排序
+
+    def contains(self, text, now):
+        key = hash(text)
+        send_time = self.entries.get(key)
+        if send_time is None:
+            return False
+        if now - send_time > self.window:
+            del self.entries[key]
+            return False
+        return True
+
+    def add(self, text, now):
+        key = hash(text)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        self.entries[key] = now
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)  # 去掉最早的
+
+
+class Deduplicator():
+    def __init__(self, policy, size, window, variant_suffix_list, words_limit):
+        self.policy = policy
+        self.size = size
+        self.window = window
+        self.variant_fix_list = []  # 可以换用的前后缀，界面设置的前后缀列表
+        self.variant_suffix_list = variant_suffix_list  # 换不了前后缀时在后面加的内容
+        self.words_limit = words_limit
+        self.cache_dict = {}  # key为直播间真实id
+
+    def setVariantFixes(self, fix_list):
+        self.variant_fix_list = list(fix_list)
+
+    def getCache(self, room_id):
+        cache = self.cache_dict.get(room_id)
+        if cache is None:
+            cache = RecentContentCache(self.size, self.window)
+            self.cache_dict[room_id] = cache
+        return cache
+
+    def variants(self, msg):
+        # 按顺序生成可以换用的内容：先换其他前后缀，再在后面加内容
+        for prefix, suffix in self.variant_fix_list:
+            if prefix != msg.prefix or suffix != msg.suffix:
+                yield prefix + msg.body + suffix
+        for variant_suffix in self.variant_suffix_list:
+            yield msg.text + variant_suffix
+
+    def check(self, msg, room_id, now):
+        # 返回这个直播间要发送的内容，不用发送时返回None
+        cache = self.getCache(room_id)
+        if not cache.contains(msg.text, now):
+            return msg.text
+        if self.policy == DEDUP_VARIANT:
+            for text in self.variants(msg):
+                if segmentation.textLen(text) <= self.words_limit and not cache.contains(text, now):
+                    return text
+        return None
+
+    def record(self, room_id, text, now):
+        # 发送成功后记录
+        self.getCache(room_id).add(text, now)
+
+
+def createDeduplicator(running_info, words_limit):
+    # dedup为skip或variant时返回Deduplicator，否则返回None
+    policy = running_info.get('dedup', DEDUP_OFF)
+    if policy not in (DEDUP_SKIP, DEDUP_VARIANT):
+        return None
+    variant_suffixes = running_info.get('dedup_variant_suffixes', '～,。,！')
+    return Deduplicator(
+        policy,
+        int(running_info.get('dedup_size', '10')),
+        float(running_info.get('dedup_window', '60')),
+        [suffix for suffix in variant_suffixes.split(',') if len(suffix) > 0],
+        words_limit,
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,285 @@
+"""
+发送记录的全文索引
+history文件夹中的txt记录越来越多之后，找以前发过的内容要一个个文件翻，这里用SQLite建索引(history/index.db)
+发送界面打开期间，每条记录在后台线程中加入索引；以前的txt记录可以用rebuild重建
+sqlite支持FTS5的trigram分词时(3.34以上)用全文索引查找，否则用LIKE，结果一样只是慢一些
+命令行使用(在程序目录运行):
+    python history_index.py search 关键词 --room 房间号 --fix 前后缀 --since 2024-01-01 --until "2024-01-31 23:00"
+    python history_index.py update  # 把还没加入索引的txt记录加进去
+    python history_index.py rebuild  # 清空后重建所有txt记录的索引
+"""
+import argparse
+import ast
+import collections
+import datetime
+import glob
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+HISTORY_DIR = './history/'
+INDEX_FILE_NAME = 'index.db'
+HISTORY_TIME_FORMAT = '%Y-%m-%d_%H-%M-%S'  # txt记录的文件名
+BATCH_SIZE = 200  # 后台线程一次最多在一个事务中写多少条
+
+
+def connect(db_path):
+    # 打开索引并建表，返回(连接, 是否有全文索引)
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.execute('CREATE TABLE IF NOT EXISTS sessions('
+                 'id INTEGER PRIMARY KEY, file TEXT UNIQUE, start_time REAL, content_sample TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS session_rooms(session_id INTEGER, room TEXT)')
+    conn.execute('CREATE INDEX IF NOT EXISTS session_rooms_room ON session_rooms(room)')
+    conn.execute('CREATE TABLE IF NOT EXISTS messages('
+                 'id INTEGER PRIMARY KEY, session_id INTEGER, time REAL, word_fix TEXT, body TEXT)')
+    conn.execute('CREATE INDEX IF NOT EXISTS messages_time ON messages(time)')
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                     "body, content='messages', content_rowid='id', tokenize='trigram')")
+        has_fts = True
+    except sqlite3.OperationalError:
+        has_fts = False  # sqlite太旧，没有FTS5或trigram
+    conn.commit()
+    return conn, has_fts
+
+
+def addSession(conn, file_name, start_time, room_list, content_sample):
+    # 返回会话的id，同一个文件已经加过时返回None
+    try:
+        cursor = conn.execute('INSERT INTO sessions(file, start_time, content_sample) VALUES (?, ?, ?)',
+                              (file_name, start_time, content_sample))
+    except sqlite3.IntegrityError:
+        return None
+    session_id = cursor.lastrowid
+    conn.executemany('INSERT INTO session_rooms(session_id, room) VALUES (?, ?)',
+                     [(session_id, str(room)) for room in room_list])
+    return session_id
+
+
+def addMessage(conn, has_fts, session_id, msg_time, word_fix, body):
+    cursor = conn.execute('INSERT INTO messages(session_id, time, word_fix, body) VALUES (?, ?, ?, ?)',
+                          (session_id, msg_time, word_fix, body))
+    if has_fts:
+        conn.execute('INSERT INTO messages_fts(rowid, body) VALUES (?, ?)', (cursor.lastrowid, body))
+
+
+def parseHistoryFile(path):
+    # 解析一个txt记录，返回(开始时间, 直播间列表, 示例, 前后缀列表, 各条的生成器)，生成的每条为(前后缀, 内容)
+    start_time = datetime.datetime.strptime(
+        os.path.splitext(os.path.basename(path))[0], HISTORY_TIME_FORMAT).timestamp()
+    f = open(path, 'r', encoding="utf-8")
+    room_list = []
+    content_sample = ''
+    word_fix_list = []
+    try:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line == '####':
+                break
+            if line.startswith('room_list:'):
+                room_list = ast.literal_eval(line[len('room_list:'):])
+            elif line.startswith('content_sample:'):
+                content_sample = line[len('content_sample:'):]
+            elif line.startswith('word_fix_list:'):
+                word_fix_list = ast.literal_eval(line[len('word_fix_list:'):])
+    except (ValueError, SyntaxError):
+        f.close()
+        raise
+
+    def messages():
+        with f:
+            for line in f:
+                line = line.rstrip('\r\n')
+                if len(line) == 0:
+                    continue
+                word_fix, _, body = line.partition(':')  # 记录的格式为"前缀后缀:内容"
+                yield word_fix, body
+    return start_time, room_list, content_sample, word_fix_list, messages()
+
+
+def readEnqueueTimes(path):
+    # 同名的.jsonl发送日志中各条消息加入队列的时间，没有时为空，按顺序和txt记录中的各条对应
+    if not os.path.exists(path):
+        return []
+    import session_log  # 只有重建时用到
+    return [event['wall'] for event in session_log.readSessionLog(path) if event['event'] == 'enqueue']
+
+
+def indexHistoryFile(conn, has_fts, path):
+    # 把一个txt记录加入索引，已经加过的返回False
+    start_time, room_list, content_sample, _, messages = parseHistoryFile(path)
+    session_id = addSession(conn, os.path.basename(path), start_time, room_list, content_sample)
+    if session_id is None:
+        messages.close()
+        return False
+    time_list = readEnqueueTimes(os.path.splitext(path)[0] + '.jsonl')
+    for index, (word_fix, body) in enumerate(messages):
+        msg_time = time_list[index] if index < len(time_list) else start_time  # 没有发送日志时只知道会话开始的时间
+        addMessage(conn, has_fts, session_id, msg_time, word_fix, body)
+    return True
+
+
+def updateIndex(history_dir=HISTORY_DIR, rebuild=False):
+    # 把还没加入索引的txt记录加进去，rebuild时先清空，返回加了几个文件
+    conn, has_fts = connect(os.path.join(history_dir, INDEX_FILE_NAME))
+    try:
+        if rebuild:
+            conn.execute('DELETE FROM messages')
+            conn.execute('DELETE FROM session_rooms')
+            conn.execute('DELETE FROM sessions')
+            if has_fts:
+                conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('delete-all')")
+        file_num = 0
+        for path in sorted(glob.glob(os.path.join(history_dir, '*.txt'))):
+            try:
+                if indexHistoryFile(conn, has_fts, path):
+                    file_num += 1
+            except (ValueError, SyntaxError, IOError) as e:
+                print('跳过' + path + '：' + str(e))  # 文件名或开头的格式不对
+        conn.commit()
+        return file_num
+    finally:
+        conn.close()
+
+
+def search(conn, has_fts, text=None, word_fix=None, room=None, since=None, until=None, limit=50):
+    # 按条件查找，返回[(时间, 文件名, 前后缀, 内容)]，新的在前，since和until为时间戳
+    where_list = []
+    args = []
+    if text:
+        if has_fts and len(text) >= 3:  # trigram至少要3个字
+            where_list.append('m.id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)')
+            args.append('"' + text.replace('"', '""') + '"')
+        else:
+            where_list.append("m.body LIKE ? ESCAPE '\\'")
+            args.append('%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    if word_fix is not None:
+        where_list.append('m.word_fix = ?')
+        args.append(word_fix)
+    if room is not None:
+        where_list.append('m.session_id IN (SELECT session_id FROM session_rooms WHERE room = ?)')
+        args.append(str(room))
+    if since is not None:
+        where_list.append('m.time >= ?')
+        args.append(since)
+    if until is not None:
+        where_list.append('m.time <= ?')
+        args.append(until)
+    sql = 'SELECT m.time, s.file, m.word_fix, m.body FROM messages m JOIN sessions s ON m.session_id = s.id'
+    if len(where_list) > 0:
+        sql += ' WHERE ' + ' AND '.join(where_list)
+    sql += ' ORDER BY m.time DESC, m.id DESC LIMIT ?'
+    args.append(limit)
+    return conn.execute(sql, args).fetchall()
+
+
+class HistoryIndexer():
+    # 发送界面打开期间在后台线程中把记录加入索引，sqlite的连接只在这个线程中使用
+    def __init__(self, file_name, room_list, content_sample, history_dir=HISTORY_DIR):
+        self.db_path = os.path.join(history_dir, INDEX_FILE_NAME)
+        self.task_queue = queue.Queue()  # 元素为(时间, 前后缀, 内容)，None表示结束
+        self.error_deque = collections.deque()  # 出错的信息，界面线程取走
+        self.session_info = (file_name, time.time(), list(room_list), content_sample)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def addMessage(self, word_fix, body):
+        # 在界面线程中调用，马上返回
+        self.task_queue.put((time.time(), word_fix, body))
+
+    def getErrors(self):
+        error_list = []
+        while len(self.error_deque) > 0:
+            error_list.append(self.error_deque.popleft())
+        return error_list
+
+    def run(self):
+        try:
+            conn, has_fts = connect(self.db_path)
+            session_id = addSession(conn, *self.session_info)
+            conn.commit()
+        except sqlite3.Error as e:
+            self.error_deque.append('记录索引打开失败：' + str(e))
+            print("记录索引打开失败，exception in HistoryIndexer:run")
+            return
+        closed = False
+        while not closed:
+            batch = [self.task_queue.get()]
+            while len(batch) < BATCH_SIZE:  # 攒了多条时一个事务写完
+                try:
+                    batch.append(self.task_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                closed = True
+                batch.pop()
+            try:
+                for msg_time, word_fix, body in batch:
+                    addMessage(conn, has_fts, session_id, msg_time, word_fix, body)
+                conn.commit()
+            except sqlite3.Error as e:
+                self.error_deque.append('记录加入索引失败：' + str(e))
+                print("记录加入索引失败，exception in HistoryIndexer:run")
+        conn.close()
+
+    def close(self):
+        # 写完剩下的再返回
+        self.task_queue.put(None)
+        self.thread.join()
+
+
+def createHistoryIndexer(file_name, room_list, content_sample, running_info):
+    # history_index为0时不建索引，返回None
+    if running_info.get('history_index', '1') != '1':
+        return None
+    return HistoryIndexer(file_name, room_list, content_sample)
+
+
+def parseTime(text):
+    # 命令行中的时间，可以只有日期
+    for time_format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(text, time_format).timestamp()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError('时间格式为"2024-01-31"或"2024-01-31 23:00"')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查找发送记录')
+    parser.add_argument('--dir', default=HISTORY_DIR, help='history文件夹')
+    subparsers = parser.add_subparsers(dest='command')
+    search_parser = subparsers.add_parser('search', help='查找')
+    search_parser.add_argument('text', nargs='?', default=None, help='内容中包含的文字')
+    search_parser.add_argument('--fix', default=None, help='前后缀(前缀和后缀连在一起，和txt记录中一样)')
+    search_parser.add_argument('--room', default=None, help='发送到的房间号')
+    search_parser.add_argument('--since', type=parseTime, default=None)
+    search_parser.add_argument('--until', type=parseTime, default=None)
+    search_parser.add_argument('--limit', type=int, default=50)
+    subparsers.add_parser('update', help='把还没加入索引的txt记录加进去')
+    subparsers.add_parser('rebuild', help='清空后重建所有txt记录的索引')
+    args = parser.parse_args()
+
+    if args.command in ('update', 'rebuild'):
+        start_time = time.perf_counter()
+        file_num = updateIndex(args.dir, rebuild=args.command == 'rebuild')
+        print('加入了%d个记录文件，用时%.2fs' % (file_num, time.perf_counter() - start_time))
+    elif args.command == 'search':
+        conn, has_fts = connect(os.path.join(args.dir, INDEX_FILE_NAME))
+        start_time = time.perf_counter()
+        row_list = search(conn, has_fts, args.text, args.fix, args.room, args.since, args.until, args.limit)
+        elapsed = time.perf_counter() - start_time
+        for msg_time, file_name, word_fix, body in row_list:
+            print(datetime.datetime.fromtimestamp(msg_time).strftime('%Y-%m-%d %H:%M:%S') + '  ' +
+                  file_name + '  ' + word_fix + ':' + body)
+        print('找到%d条，用时%.1fms' % (len(row_list), elapsed * 1000))
+        conn.close()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
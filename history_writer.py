@@ -0,0 +1,100 @@
+"""
+发送记录的写入
+界面线程只把要写的内容交给后台线程，攒一批再写，慢的磁盘不会卡住输入
+攒够history_flush_size个字或过了history_flush_interval秒就写一次并flush，关闭时写完剩下的并fsync
+写入出错时不抛出，记下来由界面线程取走提示
+"""
+import collections
+import os
+import threading
+
+
+class HistoryWriter():
+    def __init__(self, path, flush_size=4096, flush_interval=1.0):
+        self.file = open(path, "a", encoding="utf-8")  # 打开失败时直接抛出IOError，由界面处理
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []  # 还没写的内容
+        self.buffer_len = 0
+        self.closed = False
+        self.flush_requested = False
+        self.error_deque = collections.deque()  # 写入出错的信息，界面线程取走
+        self.mutex = threading.Lock()
+        self.has_data = threading.Condition(self.mutex)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def write(self, text):
+        # 在界面线程中调用，只是放到缓冲里，马上返回
+        with self.mutex:
+            if self.closed:
+                return
+            self.buffer.append(text)
+            self.buffer_len += len(text)
+            if self.buffer_len >= self.flush_size:
+                self.has_data.notify()
+
+    def flush(self):
+        # 让后台线程尽快写出，不等写完
+        with self.mutex:
+            self.flush_requested = True
+            self.has_data.notify()
+
+    def getErrors(self):
+        error_list = []
+        while len(self.error_deque) > 0:
+            error_list.append(self.error_deque.popleft())
+        return error_list
+
+    def takeBatch(self):
+        # 等到攒够了、到时间了、要求flush或关闭时，取出缓冲中的内容
+        with self.mutex:
+            self.has_data.wait_for(
+                lambda: self.closed or self.flush_requested or self.buffer_len >= self.flush_size,
+                self.flush_interval)
+            batch = self.buffer
+            self.buffer = []
+            self.buffer_len = 0
+            self.flush_requested = False
+            return batch, self.closed
+
+    def writeBatch(self, batch):
+        if len(batch) == 0:
+            return
+        try:
+            self.file.write(''.join(batch))
+            self.file.flush()
+        except (IOError, ValueError) as e:
+            self.error_deque.append('记录写入失败：' + str(e))
+            print("记录写入失败，exception in HistoryWriter:writeBatch")
+
+    def run(self):
+        closed = False
+        while not closed:
+            batch, closed = self.takeBatch()
+            self.writeBatch(batch)
+        try:
+            os.fsync(self.file.fileno())  # 关闭时确保写到磁盘上
+            self.file.close()
+        except (IOError, ValueError) as e:
+            self.error_deque.append('记录关闭失败：' + str(e))
+            print("记录关闭失败，exception in HistoryWriter:run")
+
+    def close(self):
+        # 写完剩下的内容再返回，界面关闭时调用
+        with self.mutex:
+            self.closed = True
+            self.has_data.notify()
+        self.thread.join()
+
+
+def createHistoryWriter(path, running_info):
+    return HistoryWriter(
+        path,
+        int(running_info.get('history_flush_size', '4096')),
+        float(running_info.get('history_flush_interval', '1')),
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,56 @@
+"""
+发送情况的统计
+记录最近一段时间的请求用时、消息在队列中等待的时间、一条消息发完所有直播间的时间，可以算p50、p95、p99
+"""
+import collections
+import time
+import transmit_listener
+
+
+class RollingHistogram():
+    # 保存最近window个样本，算分位数时排序一次，样本不多，界面每秒取几次也没问题
+    def __init__(self, window):
+        self.samples = collections.deque(maxlen=window)  # deque的append是线程安全的
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def percentiles(self, p_list):
+        # 返回和p_list对应的分位数，p在0到100之间，没有样本时都是None
+        samples = sorted(list(self.samples))
+        if len(samples) == 0:
+            return [None for _ in p_list]
+        result = []
+        for p in p_list:
+            index = min(len(samples) - 1, int(len(samples) * p / 100.0))
+            result.append(samples[index])
+        return result
+
+
+class TransmitMetrics(transmit_listener.TransmitListener):
+    def __init__(self, window=1000):
+        self.http_latency = RollingHistogram(window)  # 每次请求用时
+        self.queue_wait = RollingHistogram(window)  # 从加入队列到被发送器取出
+        self.fanout_time = RollingHistogram(window)  # 从加入队列到所有直播间都处理完
+
+    def onDequeue(self, msg, account):
+        self.queue_wait.add(time.monotonic() - msg.enqueue_time)
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        self.http_latency.add(latency)
+
+    def onMsgDone(self, msg):
+        self.fanout_time.add(time.monotonic() - msg.enqueue_time)
+
+
+def formatSeconds(seconds):
+    # 状态栏显示用，没有数据时显示"-"
+    if seconds is None:
+        return '-'
+    if seconds < 1:
+        return str(int(seconds * 1000)) + 'ms'
+    return '%.1fs' % seconds
+
+
+if __name__ == "__main__":
+    pass
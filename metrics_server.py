@@ -0,0 +1,186 @@
+"""
+本地的统计接口，按Prometheus的文本格式输出，可以用Prometheus定时抓取
+RunningConfig.txt中设置了metrics_port才会启动，只监听127.0.0.1
+发送线程中只做计数器加一，拼接文本在抓取时进行
+计数器按线程分片，每个发送线程只改自己的那一片，不用加锁也不会少计，抓取时把各片加起来
+"""
+import bisect
+import http.server
+import threading
+import time
+import transmit_listener
+
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]  # 请求用时
+SLEEP_BUCKETS = [0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]  # 按发送间隔等待的时间、在队列中等待的时间
+
+
+def getShard(shard_dict, size):
+    # 当前线程的分片，长度为size的列表，第一次用时创建，setdefault是原子的
+    ident = threading.get_ident()
+    shard = shard_dict.get(ident)
+    if shard is None:
+        shard = shard_dict.setdefault(ident, [0] * size)
+    return shard
+
+
+class Counter():
+    def __init__(self):
+        self.shard_dict = {}  # key为线程id，每个线程只加自己的分片
+
+    def inc(self):
+        getShard(self.shard_dict, 1)[0] += 1
+
+    def value(self):
+        return sum([shard[0] for shard in list(self.shard_dict.values())])
+
+
+class LabeledCounter():
+    # 按标签分开计数，key为标签值的元组
+    def __init__(self):
+        self.counter_dict = {}
+
+    def inc(self, *label_values):
+        counter = self.counter_dict.get(label_values)
+        if counter is None:
+            counter = self.counter_dict.setdefault(label_values, Counter())  # setdefault是原子的，并发时只会留下一个
+        counter.inc()
+
+    def items(self):
+        return [(label_values, counter.value()) for label_values, counter in list(self.counter_dict.items())]
+
+
+class Histogram():
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # 和Counter一样按线程分片，每片为各bucket的计数(最后一个是大于所有上限的)加上sum
+        self.shard_dict = {}
+
+    def observe(self, value):
+        shard = getShard(self.shard_dict, len(self.buckets) + 2)
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def render(self, name, help_text):
+        lines = ['# HELP ' + name + ' ' + help_text, '# TYPE ' + name + ' histogram']
+        shard_list = list(self.shard_dict.values())
+        total = 0
+        for index, bound in enumerate(self.buckets + ['+Inf']):
+            total += sum([shard[index] for shard in shard_list])  # Prometheus的bucket是累计的
+            lines.append(name + '_bucket{le="' + str(bound) + '"} ' + str(total))
+        lines.append(name + '_sum ' + repr(float(sum([shard[-1] for shard in shard_list]))))
+        lines.append(name + '_count ' + str(total))
+        return lines
+
+
+def escapeLabel(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def renderLabels(label_names, label_values):
+    if len(label_names) == 0:
+        return ''
+    pairs = [name + '="' + escapeLabel(value) + '"' for name, value in zip(label_names, label_values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+def renderMetric(name, metric_type, help_text, label_names, items):
+    # items为[(标签值的元组, 数值)]
+    lines = ['# HELP ' + name + ' ' + help_text, '# TYPE ' + name + ' ' + metric_type]
+    for label_values, value in sorted(items):
+        lines.append(name + renderLabels(label_names, label_values) + ' ' + str(value))
+    return lines
+
+
+class PrometheusMetrics(transmit_listener.TransmitListener):
+    def __init__(self):
+        self.enqueued = Counter()  # 加入的消息数
+        self.sends = LabeledCounter()  # 按(直播间, 结果类别)统计发送次数
+        self.retries = LabeledCounter()  # 按直播间统计重发次数
+        self.room_done = LabeledCounter()  # 按(直播间, 最终状态)统计
+        self.send_latency = Histogram(LATENCY_BUCKETS)
+        self.pacing_sleep = Histogram(SLEEP_BUCKETS)
+        self.queue_wait = Histogram(SLEEP_BUCKETS)
+
+    def onEnqueue(self, msg):
+        self.enqueued.inc()
+
+    def onDequeue(self, msg, account):
+        self.queue_wait.observe(time.monotonic() - msg.enqueue_time)
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        self.sends.inc(room_target.room_id, result.result_class)
+        self.send_latency.observe(latency)
+        self.pacing_sleep.observe(sleep_time)
+
+    def onRetry(self, msg, room_target, account, attempt, delay):
+        self.retries.inc(room_target.room_id)
+
+    def onRoomDone(self, msg, room_target, status):
+        self.room_done.inc(room_target.room_id, status)
+
+    def render(self, gauge_list):
+        # gauge_list为[(名称, 说明, 标签名列表, [(标签值的元组, 数值)])]，抓取时才获取
+        lines = []
+        lines += renderMetric('danmu_messages_enqueued_total', 'counter', '加入队列的消息数',
+                              [], [((), self.enqueued.value())])
+        lines += renderMetric('danmu_sends_total', 'counter', '发送次数，按直播间和结果类别',
+                              ['room', 'result'], self.sends.items())
+        lines += renderMetric('danmu_retries_total', 'counter', '重发次数，按直播间',
+                              ['room'], self.retries.items())
+        lines += renderMetric('danmu_room_messages_total', 'counter', '消息在各直播间的最终状态',
+                              ['room', 'status'], self.room_done.items())
+        lines += self.send_latency.render('danmu_send_latency_seconds', '发送请求用时')
+        lines += self.pacing_sleep.render('danmu_pacing_sleep_seconds', '发送前按发送间隔等待的时间')
+        lines += self.queue_wait.render('danmu_queue_wait_seconds', '消息在队列中等待的时间')
+        for name, help_text, label_names, items in gauge_list:
+            lines += renderMetric(name, 'gauge', help_text, label_names, items)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer():
+    def __init__(self, port, prometheus_metrics, gauge_callback):
+        # gauge_callback返回render要的gauge_list，在抓取的线程中调用
+        self.port = port
+        self.prometheus_metrics = prometheus_metrics
+        self.gauge_callback = gauge_callback
+        self.server = None
+
+    def start(self):
+        # 端口被占用等情况返回False，不影响发送
+        server_self = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = server_self.prometheus_metrics.render(server_self.gauge_callback()).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不在控制台输出每次抓取
+
+        try:
+            self.server = http.server.ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        except OSError:
+            print("统计接口启动失败，端口" + str(self.port) + "可能被占用，exception in metrics_server:start")
+            return False
+        self.server.daemon_threads = True
+        t = threading.Thread(target=self.server.serve_forever, daemon=True)
+        t.start()
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+if __name__ == "__main__":
+    pass
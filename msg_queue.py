@@ -0,0 +1,163 @@
+"""
+发送器使用的消息队列
+有最大长度，满了之后按策略处理：block等待、drop_oldest丢掉最早的消息、reject不接收新消息
+drop_oldest丢掉的消息会交给on_drop，发送器用它把这条消息的直播间都记为失败
+close之后取完剩余消息会得到STOP，发送线程看到STOP就结束
+消息分几个优先级，每个优先级一个先进先出的队列，取的时候先取优先级高的
+优先级只有固定几个，所以放入和取出都是O(1)，同一优先级内顺序不变，分段的消息不会乱序
+"""
+import collections
+import queue
+import threading
+
+
+POLICY_BLOCK = 'block'
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_REJECT = 'reject'
+
+PRIORITY_HIGH = 0  # 着急的消息，如Ctrl+Enter发送的
+PRIORITY_NORMAL = 1  # 一般输入的消息
+PRIORITY_BACKGROUND = 2  # 脚本、批量的消息，其他消息都发完了才发
+PRIORITY_NUM = 3
+
+
+class MsgQueue():
+    STOP = object()  # 队列关闭并且取空之后get返回这个
+
+    def __init__(self, maxsize=0, policy=POLICY_BLOCK, on_drop=None):
+        if policy not in (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_REJECT):
+            raise ValueError("unknown queue policy: " + str(policy))
+        self.maxsize = maxsize  # 不大于0表示不限制长度
+        self.policy = policy
+        self.lanes = [collections.deque() for _ in range(PRIORITY_NUM)]  # 下标就是优先级
+        self.size = 0  # 各优先级加起来一共有多少条
+        self.closed = False
+        self.dropped_num = 0  # drop_oldest丢掉了多少条
+        self.on_drop = on_drop  # 丢掉一条消息时调用，参数为丢掉的消息，在放入的线程中调用，调用时没有拿着锁
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+        self.not_full = threading.Condition(self.mutex)
+
+    def __len__(self):
+        return self.size
+
+    def isFull(self):
+        return 0 < self.maxsize <= self.size
+
+    def popLocked(self):
+        # 从优先级最高的非空队列取一条，调用时要已经拿到锁并且队列不为空
+        for lane in self.lanes:
+            if len(lane) > 0:
+                self.size -= 1
+                return lane.popleft()
+
+    def dropOldestLocked(self):
+        # 满了时丢掉优先级最低的队列中最早的消息，返回丢掉的消息
+        for lane in reversed(self.lanes):
+            if len(lane) > 0:
+                self.size -= 1
+                self.dropped_num += 1
+                return lane.popleft()
+
+    def notifyDropped(self, dropped_list):
+        # 放开锁之后再通知，on_drop里可能要做别的事
+        if self.on_drop is not None:
+            for msg in dropped_list:
+                self.on_drop(msg)
+
+    def putLocked(self, msg, timeout, priority, dropped_list):
+        # 调用时要已经拿到锁，返回是否放入，丢掉的消息加到dropped_list中
+        if self.closed:
+            return False
+        if self.isFull():
+            if self.policy == POLICY_REJECT:
+                return False
+            elif self.policy == POLICY_DROP_OLDEST:
+                dropped_list.append(self.dropOldestLocked())
+            else:
+                if not self.not_full.wait_for(lambda: self.closed or not self.isFull(), timeout):
+                    return False  # 等待超时
+                if self.closed:
+                    return False
+        self.lanes[priority].append(msg)
+        self.size += 1
+        return True
+
+    def put(self, msg, timeout=None, priority=PRIORITY_NORMAL):
+        # 放入一条消息，返回是否放入，队列满了时按策略处理，block策略可以设置最多等多久
+        dropped_list = []
+        with self.mutex:
+            accepted = self.putLocked(msg, timeout, priority, dropped_list)
+            if accepted:
+                self.not_empty.notify()
+        self.notifyDropped(dropped_list)
+        return accepted
+
+    def put_many(self, msgs, timeout=None, priority=PRIORITY_NORMAL):
+        # 按顺序放入多条同一优先级的消息，只拿一次锁，返回放入了几条，有一条放不进去就停下
+        put_num = 0
+        dropped_list = []
+        with self.mutex:
+            for msg in msgs:
+                if not self.putLocked(msg, timeout, priority, dropped_list):
+                    break
+                put_num += 1
+            if put_num > 0:
+                self.not_empty.notify_all()
+        self.notifyDropped(dropped_list)
+        return put_num
+
+    def get(self, timeout=None):
+        # 取一条消息，队列为空时等待，超时抛出queue.Empty，已经关闭并且取空时返回STOP
+        with self.mutex:
+            if not self.not_empty.wait_for(lambda: self.closed or self.size > 0, timeout):
+                raise queue.Empty
+            if self.size == 0:
+                return MsgQueue.STOP
+            msg = self.popLocked()
+            self.not_full.notify()
+        return msg
+
+    def get_many(self, max_num, timeout=None):
+        # 按优先级最多取max_num条，至少等到有一条，超时抛出queue.Empty，已经关闭并且取空时返回空列表
+        with self.mutex:
+            if not self.not_empty.wait_for(lambda: self.closed or self.size > 0, timeout):
+                raise queue.Empty
+            msgs = []
+            while len(msgs) < max_num and self.size > 0:
+                msgs.append(self.popLocked())
+            if len(msgs) > 0:
+                self.not_full.notify_all()
+        return msgs
+
+    def get_if(self, predicate):
+        # 不等待，下一条要取的消息满足predicate时取出并返回，否则返回None，合并消息时用
+        with self.mutex:
+            for lane in self.lanes:
+                if len(lane) > 0:
+                    if not predicate(lane[0]):
+                        return None
+                    self.size -= 1
+                    msg = lane.popleft()
+                    self.not_full.notify()
+                    return msg
+        return None
+
+    def close(self):
+        # 关闭之后不再接收新消息，已有的消息还可以取出来，取完后得到STOP
+        with self.mutex:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+
+def createMsgQueue(running_info, on_drop=None):
+    return MsgQueue(
+        int(running_info.get('queue_size', '1000')),
+        running_info.get('queue_full_policy', POLICY_REJECT),
+        on_drop,
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,100 @@
+"""
+自适应发送间隔
+发送成功时间隔每次减少一点(加性减)，遇到发送太快的返回时间隔乘上一个倍数(乘性增)，间隔限制在上下限之间
+学到的间隔按账号保存在文件中，下次启动时从这个间隔开始
+"""
+import json
+import os
+import re
+import threading
+import send_result
+
+
+state_mutex = threading.Lock()  # 多个账号的发送线程可能同时保存
+
+
+class AimdPacer():
+    def __init__(self, interval, floor, ceiling, step, backoff):
+        self.floor = floor  # 间隔最小多少
+        self.ceiling = ceiling  # 间隔最大多少
+        self.step = step  # 每次发送成功减少多少
+        self.backoff = backoff  # 发送太快时乘多少
+        self.interval = min(ceiling, max(floor, interval))
+
+    def onSuccess(self):
+        self.interval = max(self.floor, self.interval - self.step)
+        return self.interval
+
+    def onRateLimited(self):
+        self.interval = min(self.ceiling, self.interval * self.backoff)
+        return self.interval
+
+    def onResult(self, result):
+        # 根据发送结果调整，返回间隔是否可能变了，其他类别的结果和发送快慢无关，不调整
+        if result.isOk():
+            self.onSuccess()
+            return True
+        if result.result_class == send_result.RESULT_RATE_LIMITED:
+            self.onRateLimited()
+            return True
+        return False
+
+
+def getAccountKey(account):
+    # 保存时用的key，优先用cookie中的用户id，这样调整配置中账号的顺序也没关系
+    match = re.search(r"DedeUserID=(\d+)", account['cookie'])
+    if match is not None:
+        return match.group(1)
+    return account['name']
+
+
+def loadState(path):
+    try:
+        with open(path, 'r', encoding="utf-8") as f:
+            state = json.load(f)
+        if isinstance(state, dict):
+            return state
+    except (IOError, ValueError):
+        pass
+    return {}
+
+
+def saveInterval(path, account_key, interval):
+    # 只更新这个账号的记录，其他账号的保持不变
+    with state_mutex:
+        state = loadState(path)
+        state[account_key] = interval
+        try:
+            temp_path = path + ".tmp"
+            with open(temp_path, 'w', encoding="utf-8") as f:
+                json.dump(state, f, indent=1)
+            os.replace(temp_path, path)
+        except IOError:
+            print("保存发送间隔失败，exception in pacing:saveInterval")
+
+
+def createPacer(running_info, account):
+    # pacing为aimd时返回AimdPacer，否则返回None，使用固定的send_interval
+    if running_info.get('pacing', 'static') != 'aimd':
+        return None
+    interval = float(running_info['send_interval'])
+    # 下限默认就是send_interval，b站大约1s只能发1条，比这个更快只会不停地遇到发送太快
+    floor = float(running_info.get('pacing_floor') or interval)
+    saved_interval = loadState(getStatePath(running_info)).get(getAccountKey(account))
+    if isinstance(saved_interval, (int, float)):
+        interval = saved_interval
+    return AimdPacer(
+        interval,
+        floor,
+        float(running_info.get('pacing_ceiling', '3.0')),
+        float(running_info.get('pacing_step', '0.02')),
+        float(running_info.get('pacing_backoff', '1.5')),
+    )
+
+
+def getStatePath(running_info):
+    return running_info.get('pacing_state_path', './resource/data/PacingState.json')
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,105 @@
+"""
+弹幕发送的速率控制
+用令牌桶来限制发送频率，账号和直播间各有一个桶，两个桶里都有令牌时才能发送
+时间用time.monotonic，不受系统时间调整的影响
+"""
+import threading
+import time
+
+
+class TokenBucket():
+    def __init__(self, rate, capacity, now):
+        self.rate = rate  # 每秒放入多少个令牌
+        self.capacity = capacity  # 桶里最多存多少个令牌，也就是最多能连发几条
+        self.tokens = float(capacity)  # 开始时桶是满的，第一条不用等
+        self.last = now  # 上一次计算令牌数的时间，预约了之后的发送时可能比现在晚
+
+    def refill(self, now):
+        if now > self.last:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+    def delay(self, now):
+        # 还要等多久才能拿到一个令牌
+        self.refill(now)
+        ready_time = self.last + max(0.0, (1.0 - self.tokens) / self.rate)
+        return max(0.0, ready_time - now)
+
+    def setRate(self, rate, now):
+        # 先按原来的速率算到现在，之后按新的速率放令牌
+        self.refill(now)
+        self.rate = rate
+
+    def consume(self, at):
+        # 在at时刻取走一个令牌，at不能早于delay算出来的时间
+        self.refill(at)
+        self.tokens -= 1
+
+
+class RateScheduler():
+    def __init__(self, account_interval, account_burst, room_interval, room_burst, clock=time.monotonic, margin=0.0):
+        # interval是平均多久能发一条，burst是最多能连发几条，interval不大于0表示不限制
+        # margin是每次多等的时间，默认为0，网络波动大、经常遇到发送太快时可以留一点余量
+        self.account_interval = account_interval
+        self.account_burst = account_burst
+        self.room_interval = room_interval
+        self.room_burst = room_burst
+        self.clock = clock
+        self.margin = margin
+        self.account_interval_dict = {}  # 单独设置了间隔的账号，自适应间隔时用
+        self.account_buckets = {}  # key为账号
+        self.room_buckets = {}  # key为直播间真实id
+        self.mutex = threading.Lock()  # 可能有多个发送线程共用
+
+    def getBucket(self, buckets, key, interval, burst, now):
+        if interval <= 0:
+            return None
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(1.0 / (interval + self.margin), burst, now)
+            buckets[key] = bucket
+        return bucket
+
+    def setAccountInterval(self, account, interval):
+        # 修改一个账号的发送间隔
+        with self.mutex:
+            self.account_interval_dict[account] = interval
+            bucket = self.account_buckets.get(account)
+            if bucket is not None:
+                bucket.setRate(1.0 / (interval + self.margin), self.clock())
+
+    def getAccountInterval(self, account):
+        return self.account_interval_dict.get(account, self.account_interval)
+
+    def reserve(self, account, room):
+        # 预约一次发送，返回还要等多久，返回后令牌已经被取走，等够时间直接发就行
+        with self.mutex:
+            now = self.clock()
+            buckets = [
+                self.getBucket(self.account_buckets, account,
+                               self.getAccountInterval(account), self.account_burst, now),
+                self.getBucket(self.room_buckets, room, self.room_interval, self.room_burst, now),
+            ]
+            buckets = [bucket for bucket in buckets if bucket is not None]
+            wait_time = 0.0
+            for bucket in buckets:
+                wait_time = max(wait_time, bucket.delay(now))
+            for bucket in buckets:
+                bucket.consume(now + wait_time)
+        return wait_time
+
+
+def createScheduler(running_info, clock=time.monotonic):
+    # 根据配置创建，send_interval对应账号的发送间隔，模拟时clock传入虚拟时间
+    return RateScheduler(
+        float(running_info['send_interval']),
+        int(running_info.get('account_burst', '1')),
+        float(running_info.get('room_interval', '1.0')),
+        int(running_info.get('room_burst', '1')),
+        clock,
+        float(running_info.get('pacing_margin', '0')),
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,149 @@
+"""
+重放发送记录
+把history中的txt记录或.jsonl发送日志中的消息，重新通过DanmuMultiTransimitter发到指定的直播间
+speed为1时按原来的间隔发送，为2时间隔减半，为0时不等待，按发送间隔尽快发；txt记录中没有时间，有同名的.jsonl时用它的时间
+文件一条条读，不会整个读进来；重放的消息为PRIORITY_BACKGROUND，手动输入的消息会先发
+也可以把记录变成simulator.Simulation的workload，用真实的输入节奏做离线测试(见benchmark/bench_simulate.py的--replay)
+命令行使用(在程序目录运行):
+    python replay.py history/2024-01-31_20-00-00.txt --rooms 123,456 --speed 2
+"""
+import argparse
+import os
+import threading
+import clock
+import history_index
+import msg_queue
+import session_log
+
+
+def sessionLogMessages(path):
+    # 从.jsonl发送日志中读出加入队列的消息
+    start_time = None
+    for event in session_log.readSessionLog(path):
+        if event['event'] != session_log.EVENT_ENQUEUE:
+            continue
+        if start_time is None:
+            start_time = event['mono']
+        yield event['mono'] - start_time, event['prefix'], event['body'], event['suffix']
+
+
+def textMessages(path):
+    # 从txt记录中读出消息，没有时间
+    _, _, _, word_fix_list, messages = history_index.parseHistoryFile(path)
+    fix_dict = {prefix + suffix: (prefix, suffix) for prefix, suffix in word_fix_list}  # 记录中前后缀是连在一起的
+    for word_fix, body in messages:
+        prefix, suffix = fix_dict.get(word_fix, (word_fix, ''))
+        yield None, prefix, body, suffix
+
+
+def readMessages(path):
+    """
+    一条条读出记录中的消息，生成(相对第一条的秒数, 前缀, 内容, 后缀)，不知道时间时为None
+    path可以是txt记录或.jsonl发送日志，txt记录有同名的.jsonl时读.jsonl
+    """
+    if not path.endswith('.jsonl'):
+        log_path = os.path.splitext(path)[0] + '.jsonl'
+        if not os.path.exists(log_path):
+            return textMessages(path)
+        path = log_path
+    return sessionLogMessages(path)
+
+
+def readRooms(path):
+    # 记录中发送的直播间
+    if path.endswith('.jsonl'):
+        for event in session_log.readSessionLog(path):
+            if event['event'] == session_log.EVENT_SESSION:
+                return event['rooms']
+        return []
+    _, room_list, _, _, messages = history_index.parseHistoryFile(path)
+    messages.close()
+    return room_list
+
+
+def makeReplayWorkload(path, speed=1.0, priority=msg_queue.PRIORITY_NORMAL):
+    # 变成simulator.Simulation的workload[(时间, 内容, 优先级)]，不知道时间或speed为0时都在开始时到达
+    workload = []
+    for offset, prefix, body, suffix in readMessages(path):
+        arrive_time = offset / speed if speed > 0 and offset is not None else 0.0
+        workload.append((arrive_time, prefix + body + suffix, priority))
+    return workload
+
+
+class Replayer():
+    def __init__(self, transmitter, messages, speed=1.0, priority=msg_queue.PRIORITY_BACKGROUND, replay_clock=None):
+        # messages为readMessages生成的消息，replay_clock为None时用真实时间，stop时不用等到下一条的时间
+        self.transmitter = transmitter
+        self.messages = messages
+        self.speed = speed
+        self.priority = priority
+        self.clock = clock.SystemClock() if replay_clock is None else replay_clock
+        self.stop_event = threading.Event() if replay_clock is None else None
+        self.thread = None
+        self.stopping = False
+        self.added_num = 0
+        self.rejected_num = 0  # 队列满了没有加入的
+
+    def wait(self, seconds):
+        if seconds <= 0:
+            return
+        if self.stop_event is not None:
+            self.stop_event.wait(seconds)
+        else:
+            self.clock.sleep(seconds)
+
+    def run(self):
+        start_time = self.clock.now()
+        for offset, prefix, body, suffix in self.messages:
+            if self.speed > 0 and offset is not None:
+                self.wait(start_time + offset / self.speed - self.clock.now())  # 按原来的间隔
+            if self.stopping:
+                break
+            if self.transmitter.addMsg(body, self.priority, prefix, suffix):
+                self.added_num += 1
+            else:
+                self.rejected_num += 1
+        self.messages.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重放发送记录')
+    parser.add_argument('path', help='history中的txt记录或.jsonl发送日志')
+    parser.add_argument('--rooms', default=None, help='发送到的房间号，逗号分隔，默认为记录中的直播间')
+    parser.add_argument('--speed', type=float, default=1.0, help='1为按原来的间隔，2为间隔减半，0为尽快发送')
+    args = parser.parse_args()
+
+    import danmu_multitransmit  # 会读取config/RunningConfig.txt，只有真正发送时用到
+    room_id_list = args.rooms.split(',') if args.rooms is not None else [str(room) for room in readRooms(args.path)]
+    if len(room_id_list) == 0:
+        print('记录中没有直播间，请用--rooms指定')
+        return
+    try:
+        transmitter = danmu_multitransmit.DanmuMultiTransimitter(room_id_list)
+    except danmu_multitransmit.TransmitterError as e:
+        print('不能开始重放：' + str(e))
+        return
+    transmitter.start()
+    replayer = Replayer(transmitter, readMessages(args.path), args.speed)
+    try:
+        replayer.run()
+    except KeyboardInterrupt:
+        print('中断重放，发完已加入的消息后结束')
+    transmitter.stop()
+    transmitter.join()
+    for alert in transmitter.getAlerts():
+        print(alert)
+    print('重放%d条，%d条未加入队列' % (replayer.added_num, replayer.rejected_num))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+短号到真实id的缓存，保存在文件中，重启或从设置界面返回后不用再联网获取
+每条记录有获取时间，超过room_cache_ttl的记录不再使用，要重新获取
+超过room_cache_revalidate但没超过ttl的记录照常使用，同时在后台重新获取一次，更新缓存
+"""
+import json
+import os
+import threading
+import time
+import room_resolver
+
+
+class RoomIdCache():
+    def __init__(self, path, ttl, revalidate_age):
+        self.path = path
+        self.ttl = ttl  # 记录多久之后过期，单位秒
+        self.revalidate_age = revalidate_age  # 记录多久之后要在后台重新获取
+        self.entries = {}  # key为房间号，value为{'room_id': 真实id, 'time': 获取时的时间戳}
+        self.mutex = threading.Lock()  # 后台线程也会更新
+        self.load()
+
+    def load(self):
+        # 读取失败就当没有缓存
+        try:
+            with open(self.path, 'r', encoding="utf-8") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (IOError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        # 先写临时文件再替换，写到一半出错不会破坏原来的缓存
+        with self.mutex:
+            content = json.dumps(self.entries, ensure_ascii=False, indent=1)
+        try:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, self.path)
+        except IOError:
+            print("保存直播间id缓存失败，exception in RoomIdCache:save")
+
+    def lookup(self, room_id_list):
+        # 返回(没过期的记录, 要重新获取的房间号)，没有记录或已经过期的房间号不在第一个字典里
+        now = time.time()
+        room_true_id_dict = {}
+        stale_room_id_list = []
+        with self.mutex:
+            for room_id in room_id_list:
+                entry = self.entries.get(room_id)
+                if entry is None:
+                    continue
+                age = now - entry['time']
+                if age > self.ttl or age < 0:
+                    continue
+                room_true_id_dict[room_id] = entry['room_id']
+                if age > self.revalidate_age:
+                    stale_room_id_list.append(room_id)
+        return room_true_id_dict, stale_room_id_list
+
+    def update(self, room_true_id_dict):
+        now = time.time()
+        with self.mutex:
+            for room_id, room_true_id in room_true_id_dict.items():
+                self.entries[room_id] = {'room_id': room_true_id, 'time': now}
+
+    def revalidateInBackground(self, room_id_list, timeout, max_workers, room_init_url=room_resolver.ROOM_INIT_URL):
+        # 在后台重新获取，只更新缓存文件，正在发送的直播间不受影响
+        if len(room_id_list) == 0:
+            return
+
+        def revalidate():
+            room_true_id_dict, _ = room_resolver.resolveRoomIds(
+                room_id_list, timeout, max_workers, room_init_url=room_init_url)
+            if len(room_true_id_dict) > 0:
+                self.update(room_true_id_dict)
+                self.save()
+
+        t = threading.Thread(target=revalidate, daemon=True)
+        t.start()
+
+
+def resolveRoomIdsWithCache(cache, room_id_list, timeout, max_workers, progress_callback=None, room_callback=None,
+                            room_init_url=room_resolver.ROOM_INIT_URL):
+    # 先查缓存，只有缓存中没有的直播间才联网获取，参数和返回值和room_resolver.resolveRoomIds一样
+    room_true_id_dict, stale_room_id_list = cache.lookup(room_id_list)
+    if room_callback is not None:
+        for room_id, room_true_id in room_true_id_dict.items():
+            room_callback(room_id, room_true_id, None)  # 缓存中有的直接算获取完了
+    missing_room_id_list = [room_id for room_id in room_id_list if room_id not in room_true_id_dict]
+    fetched_dict, error_dict = room_resolver.resolveRoomIds(
+        missing_room_id_list, timeout, max_workers, progress_callback, room_callback, room_init_url)
+    if len(fetched_dict) > 0:
+        cache.update(fetched_dict)
+        cache.save()
+    room_true_id_dict.update(fetched_dict)
+    cache.revalidateInBackground(stale_room_id_list, timeout, max_workers, room_init_url)
+    return room_true_id_dict, error_dict
+
+
+def createRoomIdCache(running_info):
+    return RoomIdCache(
+        running_info.get('room_cache_path', './resource/data/RoomIdCache.json'),
+        float(running_info.get('room_cache_ttl', '604800')),
+        float(running_info.get('room_cache_revalidate', '86400')),
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,76 @@
+"""
+获取直播间的真实id
+输入的房间号可能是短号，发送弹幕要用真实id，多个直播间用线程池同时获取
+出错时不直接退出，每个直播间的错误单独返回，由调用的地方决定怎么提示
+"""
+import concurrent.futures
+import requests
+
+
+ROOM_INIT_PATH = "/room/v1/Room/room_init"
+ROOM_INIT_URL = "https://api.live.bilibili.com" + ROOM_INIT_PATH
+
+
+class RoomIdError(Exception):
+    # 获取某个直播间真实id失败
+    pass
+
+
+def getRoomId(simple_id, timeout=5.0, room_init_url=ROOM_INIT_URL):
+    # 使用api获取房间的真实id，失败时抛出RoomIdError
+    data = {
+        'id': simple_id
+    }
+    try:
+        response = requests.get(room_init_url, params=data, timeout=timeout)  # 会在url后面接上"?id=xxx"
+        response.raise_for_status()  # 可能请求失败
+        room_id = response.json()['data']['room_id']  # 得到json格式的数据，进行字典化，根据格式获取room_id
+    except requests.Timeout:
+        raise RoomIdError('请求超时')
+    except requests.ConnectionError:
+        raise RoomIdError('网络连接失败')
+    except requests.HTTPError as e:
+        raise RoomIdError('请求失败，状态码' + str(e.response.status_code))
+    except requests.RequestException:
+        raise RoomIdError('请求失败')
+    except (TypeError, KeyError, ValueError):
+        raise RoomIdError('请确认房间号是否正确')  # 房间号不存在时data为空
+    return room_id
+
+
+def resolveRoomIds(room_id_list, timeout=5.0, max_workers=8, progress_callback=None, room_callback=None,
+                   room_init_url=ROOM_INIT_URL):
+    """
+    同时获取多个直播间的真实id
+    返回(room_true_id_dict, error_dict)，两个字典的key都是输入的房间号，value分别是真实id和错误信息
+    progress_callback(done_num, total_num)在调用这个函数的线程中调用，可以用来更新进度
+    room_callback(room_id, room_true_id, error)每获取完一个直播间调用一次，失败时room_true_id为None
+    room_init_url可以换成本地的模拟服务器
+    """
+    room_true_id_dict = {}
+    error_dict = {}
+    unique_room_id_list = list(dict.fromkeys(room_id_list))  # 去重，保持顺序
+    total_num = len(unique_room_id_list)
+    if total_num == 0:
+        return room_true_id_dict, error_dict
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, total_num)) as executor:
+        future_dict = {}
+        for room_id in unique_room_id_list:
+            future_dict[executor.submit(getRoomId, room_id, timeout, room_init_url)] = room_id
+        done_num = 0
+        for future in concurrent.futures.as_completed(future_dict):
+            room_id = future_dict[future]
+            try:
+                room_true_id_dict[room_id] = future.result()
+            except RoomIdError as e:
+                error_dict[room_id] = str(e)
+            if room_callback is not None:
+                room_callback(room_id, room_true_id_dict.get(room_id), error_dict.get(room_id))
+            done_num += 1
+            if progress_callback is not None:
+                progress_callback(done_num, total_num)
+    return room_true_id_dict, error_dict
+
+
+if __name__ == "__main__":
+    pass
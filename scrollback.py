@@ -0,0 +1,42 @@
+"""
+发送界面记录框的滚动缓冲
+记录框中的行一直增加的话，占的内存和刷新的时间都会越来越多，所以只保留最近scrollback_lines行
+超出时一次去掉最早的scrollback_chunk行，去掉的内容连同标签存到临时文件里，滚动到最上面时再一块块读回来
+读回来的行保留屏蔽词和各直播间结果的颜色，去掉时还没出结果的点读回来后照常更新
+完整的记录仍然在history文件夹中
+"""
+import tempfile
+
+
+class SpillStore():
+    # 存在临时文件中的栈，后放进去的先取出来，关闭时文件自动删除
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.chunk_list = []  # 每块的(在文件中的位置, 字节数)
+
+    def __len__(self):
+        return len(self.chunk_list)
+
+    def push(self, text):
+        data = text.encode('utf-8')
+        offset = self.chunk_list[-1][0] + self.chunk_list[-1][1] if len(self.chunk_list) > 0 else 0
+        self.file.seek(offset)
+        self.file.write(data)
+        self.chunk_list.append((offset, len(data)))
+
+    def pop(self):
+        # 取出最后放进去的一块，没有时返回None
+        if len(self.chunk_list) == 0:
+            return None
+        offset, length = self.chunk_list.pop()
+        self.file.seek(offset)
+        data = self.file.read(length)
+        self.file.truncate(offset)
+        return data.decode('utf-8')
+
+    def close(self):
+        self.file.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,183 @@
+"""
+长消息的分段
+b站按UTF-16的长度计算弹幕字数(和网页中js的length一样)，emoji等一个字符算2个，分段时按这个规则计算
+不会把一个字(包括emoji组合、带声调的字母等)从中间分开，尽量在标点、空格处分段，英文单词和数字不会被分开
+分段数一般和直接按长度切一样少，各段长度尽量平均，不会出现最后一段只有一两个字的情况
+安装了regex模块时用它来划分字(\\X)，否则用简化的规则，常见的emoji组合、组合符号、韩文字母都能处理
+界面中取出的emoji可能是UTF-16代理对(两个字符)，分段前先合成一个字符
+"""
+import math
+import re
+import unicodedata
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+
+SENTENCE_END = set('。！？!?…；;\n')  # 在这些后面分段最好
+CLAUSE_END = set('，,、：:）)】」』》”’~～')  # 其次是这些
+BREAK_SENTENCE = 3
+BREAK_CLAUSE = 2
+BREAK_SPACE = 1  # 空格处，或者中文和其他文字之间
+BREAK_NONE = 0  # 英文单词、数字中间，不得已才分
+WORD_CHAR = re.compile(r'[0-9A-Za-zÀ-ɏЀ-ӿ_\'\-]')  # 分段时不拆开的字母、数字
+
+
+def textLen(text):
+    # 按b站的规则算长度，基本平面以外的字符(大部分emoji)算2个
+    return len(text) + sum(1 for c in text if ord(c) > 0xFFFF)
+
+
+def isExtend(c):
+    # 要和前一个字符合在一起的字符：组合符号、变体选择符、肤色、标签字符
+    code = ord(c)
+    if 0xFE00 <= code <= 0xFE0F or 0xE0100 <= code <= 0xE01EF:
+        return True
+    if 0x1F3FB <= code <= 0x1F3FF or 0xE0020 <= code <= 0xE007F:
+        return True
+    return unicodedata.category(c) in ('Mn', 'Me', 'Mc')
+
+
+def isRegionalIndicator(c):
+    return 0x1F1E6 <= ord(c) <= 0x1F1FF
+
+
+def isSpacingVowel(c):
+    # 泰文、老挝文的SARA AM，和前面的字是一个字，但类别不是组合符号
+    return c in '\u0e33\u0eb3'
+
+
+def hangulType(c):
+    # 韩文字母的类型：L(初声)、V(中声)、T(终声)、LV、LVT，其他字符为None
+    code = ord(c)
+    if 0x1100 <= code <= 0x115F or 0xA960 <= code <= 0xA97C:
+        return 'L'
+    if 0x1160 <= code <= 0x11A7 or 0xD7B0 <= code <= 0xD7C6:
+        return 'V'
+    if 0x11A8 <= code <= 0x11FF or 0xD7CB <= code <= 0xD7FB:
+        return 'T'
+    if 0xAC00 <= code <= 0xD7A3:
+        return 'LV' if (code - 0xAC00) % 28 == 0 else 'LVT'
+    return None
+
+
+HANGUL_NEXT = {'L': ('L', 'V', 'LV', 'LVT'), 'V': ('V', 'T'), 'LV': ('V', 'T'), 'T': ('T',), 'LVT': ('T',)}
+
+
+def joinSurrogates(text):
+    # 把UTF-16代理对合成一个字符，单独的代理字符保留原样
+    if not any('\ud800' <= c <= '\udfff' for c in text):
+        return text
+    return text.encode('utf-16-le', 'surrogatepass').decode('utf-16-le', 'surrogatepass')
+
+
+def splitGraphemes(text):
+    # 把文字分成一个个用户看到的字，不完全是Unicode的规则，但常见的情况都能处理
+    text = joinSurrogates(text)
+    if regex is not None:
+        return regex.findall(r'\X', text)
+    clusters = []
+    index = 0
+    while index < len(text):
+        start = index
+        index += 1
+        if text[start] == '\r' and index < len(text) and text[index] == '\n':
+            index += 1
+        elif isRegionalIndicator(text[start]) and index < len(text) and isRegionalIndicator(text[index]):
+            index += 1  # 两个区域指示符组成一面旗子
+        else:
+            hangul = hangulType(text[start])
+            while hangul is not None and index < len(text) and hangulType(text[index]) in HANGUL_NEXT[hangul]:
+                hangul = hangulType(text[index])  # 初声、中声、终声组成一个字
+                index += 1
+            while index < len(text):
+                if isExtend(text[index]) or isSpacingVowel(text[index]):
+                    index += 1
+                elif text[index] == '\u200d' and index + 1 < len(text):
+                    index += 2  # 零宽连接符把前后两个emoji连成一个
+                elif text[index] == '\u200d':
+                    index += 1
+                else:
+                    break
+        clusters.append(text[start:index])
+    return clusters
+
+
+def isCjk(cluster):
+    return unicodedata.east_asian_width(cluster[0]) in ('W', 'F')
+
+
+def breakLevel(before, after):
+    # 在before和after两个字之间分段的好坏
+    if before[-1] in SENTENCE_END:
+        return BREAK_SENTENCE
+    if before[-1] in CLAUSE_END:
+        return BREAK_CLAUSE
+    if before.isspace() or after.isspace() or isCjk(before) or isCjk(after):
+        return BREAK_SPACE
+    if WORD_CHAR.match(before[-1]) and WORD_CHAR.match(after[0]):
+        return BREAK_NONE
+    return BREAK_SPACE
+
+
+def findBreak(clusters, lengths, start, limit, min_len, target):
+    # 从start开始找这一段在哪里结束，返回(结束位置, 评分)，评分为(分段位置的好坏, 和平均长度的差距)
+    best_end = None
+    best_key = None
+    seg_len = 0
+    for end in range(start + 1, len(clusters)):
+        seg_len += lengths[end - 1]
+        if seg_len > limit:
+            break
+        if seg_len < min_len:
+            continue
+        key = (breakLevel(clusters[end - 1], clusters[end]), -abs(seg_len - target))
+        if best_key is None or key > best_key:
+            best_key = key
+            best_end = end
+    return best_end, best_key
+
+
+def splitText(text, limit):
+    """
+    把text分成多段，每段按textLen算不超过limit，返回分好的列表
+    段数和直接切的一样少，在这个前提下优先在好的位置分段，同样好的位置中选让各段长度最平均的
+    只有单词太长、不多分一段就要从单词中间分开时才多分一段
+    每段去掉首尾的空白，空的段不要
+    """
+    if limit <= 0:
+        raise ValueError('limit must be positive')
+    clusters = splitGraphemes(text)
+    lengths = [textLen(cluster) for cluster in clusters]
+    segment_list = []
+    start = 0
+    remaining = sum(lengths)
+    while start < len(clusters):
+        if remaining <= limit:
+            segment_list.append(''.join(clusters[start:]))
+            break
+        segment_num = math.ceil(remaining / limit)  # 还要分几段
+        target = remaining / segment_num  # 平均每段多长
+        min_len = remaining - (segment_num - 1) * limit  # 这一段太短的话剩下的就要多分一段
+        best_end, best_key = findBreak(clusters, lengths, start, limit, min_len, target)
+        if best_key is not None and best_key[0] == BREAK_NONE:
+            # 只能在单词中间分，看看多分一段能不能避免
+            extra_end, extra_key = findBreak(clusters, lengths, start, limit, min_len - limit,
+                                             remaining / (segment_num + 1))
+            if extra_key is not None and extra_key[0] > BREAK_NONE:
+                best_end = extra_end
+        if best_end is None:
+            best_end = start + 1  # 一个字就超过了限制(很长的emoji组合)，只能单独一段
+            seg_len = lengths[start]
+        else:
+            seg_len = sum(lengths[start:best_end])
+        segment_list.append(''.join(clusters[start:best_end]))
+        remaining -= seg_len
+        start = best_end
+    return [segment.strip() for segment in segment_list if len(segment.strip()) > 0]
+
+
+if __name__ == "__main__":
+    pass
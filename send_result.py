@@ -0,0 +1,169 @@
+"""
+弹幕发送结果的分类和处理方式
+b站的发送接口即使失败，HTTP状态码一般也是200，具体原因在返回的json中，这里按返回内容分成几类
+每一类对应一种处理方式：retry过一会重发、skip不再发送、pause暂停这个账号一段时间、alert提示一下、
+stop这个账号不再发送(剩下的消息都记为失败)
+处理方式可以在RunningConfig.txt中用policy_类别名来修改，如policy_filtered:alert
+"""
+import transmit_listener
+
+
+RESULT_OK = 'ok'
+RESULT_RATE_LIMITED = 'rate_limited'  # 发送太快，如"msg in 1s"
+RESULT_TOO_LONG = 'too_long'  # 超出长度限制
+RESULT_FILTERED = 'filtered'  # 包含屏蔽词等被系统屏蔽
+RESULT_NOT_LOGGED_IN = 'not_logged_in'  # cookie或csrf过期
+RESULT_BANNED = 'banned'  # 账号被禁言
+RESULT_NETWORK = 'network'  # 网络错误或超时，没有收到回复
+RESULT_SERVER_ERROR = 'server_error'  # 服务器出错，5xx
+RESULT_UNKNOWN = 'unknown'  # 其他没见过的情况
+
+ACTION_DONE = 'done'
+ACTION_RETRY = 'retry'
+ACTION_SKIP = 'skip'
+ACTION_PAUSE = 'pause'
+ACTION_ALERT = 'alert'
+ACTION_STOP = 'stop'
+
+DEFAULT_ACTIONS = {
+    RESULT_OK: ACTION_DONE,
+    RESULT_RATE_LIMITED: ACTION_RETRY,
+    RESULT_TOO_LONG: ACTION_SKIP,
+    RESULT_FILTERED: ACTION_SKIP,
+    RESULT_NOT_LOGGED_IN: ACTION_STOP,  # cookie过期后重发多少次都不会成功，要更新配置
+    RESULT_BANNED: ACTION_STOP,
+    RESULT_NETWORK: ACTION_RETRY,
+    RESULT_SERVER_ERROR: ACTION_RETRY,
+    RESULT_UNKNOWN: ACTION_ALERT,
+}
+
+RESULT_DESCRIPTIONS = {
+    RESULT_OK: '发送成功',
+    RESULT_RATE_LIMITED: '发送太快',
+    RESULT_TOO_LONG: '超出长度限制',
+    RESULT_FILTERED: '被屏蔽',
+    RESULT_NOT_LOGGED_IN: '账号未登录，请更新cookie和csrf',
+    RESULT_BANNED: '账号被禁言',
+    RESULT_NETWORK: '网络错误',
+    RESULT_SERVER_ERROR: '服务器错误',
+    RESULT_UNKNOWN: '未知错误',
+}
+
+
+class SendResult():
+    def __init__(self, result_class, code=None, message=''):
+        self.result_class = result_class
+        self.code = code  # 返回json中的code，没有收到回复时为HTTP状态码或None
+        self.message = message  # 返回json中的message或异常信息
+
+    def isOk(self):
+        return self.result_class == RESULT_OK
+
+    def describe(self):
+        info = RESULT_DESCRIPTIONS[self.result_class]
+        if self.result_class != RESULT_OK and len(self.message) > 0:
+            info += '(' + self.message + ')'
+        return info
+
+
+def classifyResponse(status_code, body):
+    # 根据HTTP状态码和解析后的json分类，json解析失败时body为None
+    if status_code in (412, 429):
+        return SendResult(RESULT_RATE_LIMITED, status_code, 'HTTP ' + str(status_code))  # 412是b站的风控
+    if status_code >= 500:
+        return SendResult(RESULT_SERVER_ERROR, status_code, 'HTTP ' + str(status_code))
+    if status_code != 200 or not isinstance(body, dict):
+        return SendResult(RESULT_UNKNOWN, status_code, 'HTTP ' + str(status_code))
+
+    code = body.get('code')
+    message = str(body.get('message') or body.get('msg') or '')
+    if code in (-101, -111):
+        result_class = RESULT_NOT_LOGGED_IN  # -101未登录，-111csrf校验失败
+    elif code == 1003 or '禁言' in message:
+        result_class = RESULT_BANNED
+    elif code == 1003212 or '超出限制长度' in message or 'too long' in message:
+        result_class = RESULT_TOO_LONG
+    elif 'msg in' in message or '频率' in message or '过快' in message or code == 10030:
+        result_class = RESULT_RATE_LIMITED
+    elif message in ('f', 'k', 'fire') or '屏蔽' in message:
+        result_class = RESULT_FILTERED  # 发送成功但被系统屏蔽，只有自己能看到
+    elif code == 0 and len(message) == 0:
+        result_class = RESULT_OK
+    else:
+        result_class = RESULT_UNKNOWN
+    return SendResult(result_class, code, message)
+
+
+def classifyException(e):
+    # 请求过程中抛出异常，一般是网络问题
+    return SendResult(RESULT_NETWORK, None, type(e).__name__)
+
+
+class SendDecision():
+    # ResultPolicy.decide的结果，status为这个直播间的最终状态，为None时过delay秒重发
+    def __init__(self, status, delay=0.0, alert=None, pause_time=0.0, stop_account=False):
+        self.status = status
+        self.delay = delay
+        self.alert = alert  # 要提示的信息，不用提示时为None
+        self.pause_time = pause_time  # 大于0时整个账号暂停这么久
+        self.stop_account = stop_account  # 这个账号不再发送
+
+
+class ResultPolicy():
+    def __init__(self, actions, retry_base, retry_max_delay, retry_max, pause_time):
+        self.actions = actions  # key为结果类别，value为处理方式
+        self.retry_base = retry_base  # 第一次重发前等多久
+        self.retry_max_delay = retry_max_delay  # 重发前最多等多久
+        self.retry_max = retry_max  # 一条弹幕在一个直播间最多重发几次
+        self.pause_time = pause_time  # 暂停账号时停多久
+
+    def getAction(self, result):
+        return self.actions.get(result.result_class, ACTION_ALERT)
+
+    def decide(self, result, attempt, label, rng):
+        # 第attempt次重发得到result后怎么处理，两种发送器都用这个，label为提示中的"房间xx「弹幕」"，rng见retryDelay
+        action = self.getAction(result)
+        if action == ACTION_DONE:
+            return SendDecision(transmit_listener.ROOM_SENT)
+        if action == ACTION_SKIP:
+            return SendDecision(transmit_listener.ROOM_SKIPPED)
+        info = label + result.describe()
+        if action == ACTION_ALERT:
+            return SendDecision(transmit_listener.ROOM_FAILED, alert=info)
+        if action == ACTION_STOP:
+            return SendDecision(transmit_listener.ROOM_FAILED, alert=info + '，这个账号停止发送，剩下的消息都记为失败',
+                                stop_account=True)
+        if attempt >= self.retry_max:
+            return SendDecision(transmit_listener.ROOM_FAILED, alert=info + '，重发' + str(attempt) + '次后放弃')
+        delay = self.retryDelay(attempt, rng)
+        if action == ACTION_PAUSE:
+            return SendDecision(None, max(delay, self.pause_time),
+                                info + '，暂停发送' + str(int(self.pause_time)) + '秒', self.pause_time)
+        return SendDecision(None, delay)
+
+    def retryDelay(self, attempt, rng):
+        # 第attempt次重发前等多久，指数退避，再随机缩短最多一半，避免多个直播间同时重发
+        # rng为发送器自己的random.Random，模拟时传入固定了种子的，不用改random模块的全局状态
+        delay = min(self.retry_max_delay, self.retry_base * (2 ** attempt))
+        return delay * rng.uniform(0.5, 1.0)
+
+
+def createResultPolicy(running_info):
+    actions = dict(DEFAULT_ACTIONS)
+    for result_class in actions:
+        if result_class == RESULT_OK:
+            continue
+        action = running_info.get('policy_' + result_class)
+        if action in (ACTION_RETRY, ACTION_SKIP, ACTION_PAUSE, ACTION_ALERT, ACTION_STOP):
+            actions[result_class] = action
+    return ResultPolicy(
+        actions,
+        float(running_info.get('retry_base', '1.0')),
+        float(running_info.get('retry_max_delay', '30')),
+        int(running_info.get('retry_max', '5')),
+        float(running_info.get('pause_time', '60')),
+    )
+
+
+if __name__ == "__main__":
+    pass
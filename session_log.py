@@ -0,0 +1,92 @@
+"""
+结构化的发送日志
+和history中的txt记录放在一起，文件名相同，扩展名为.jsonl，每行一个json事件，只追加
+记录消息加入队列、各直播间的每次发送(用时、结果)、重发、最终结果，每个事件都有单调时间mono和实际时间wall
+事后分析时一行一行读就行，不用整个文件读进来
+写入用history_writer.HistoryWriter，在后台线程中批量写
+"""
+import json
+import time
+import history_writer
+import transmit_listener
+
+
+EVENT_SESSION = 'session'  # 文件开头，这次发送的直播间、前后缀等
+EVENT_ENQUEUE = 'enqueue'
+EVENT_DEQUEUE = 'dequeue'
+EVENT_SEND = 'send'  # 一次发送完成，包括实际发出去的内容、结果和用时
+EVENT_RETRY = 'retry'
+EVENT_ROOM_DONE = 'room_done'  # 这条消息在这个直播间的最终结果，failed和skipped就是没发出去的
+EVENT_MSG_DONE = 'msg_done'
+
+
+class SessionLog(transmit_listener.TransmitListener):
+    def __init__(self, writer):
+        self.writer = writer
+
+    def writeEvent(self, event, **fields):
+        # 发送线程中也会调用，HistoryWriter.write只是放到缓冲里
+        record = {'event': event, 'mono': round(time.monotonic(), 6), 'wall': round(time.time(), 6)}
+        record.update(fields)
+        self.writer.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def onSession(self, room_id_list, content_sample, word_fix_list):
+        self.writeEvent(EVENT_SESSION, rooms=list(room_id_list), content_sample=content_sample,
+                        word_fix_list=[list(word_fix) for word_fix in word_fix_list])
+
+    def onEnqueue(self, msg):
+        self.writeEvent(EVENT_ENQUEUE, msg=msg.msg_id, text=msg.text, body=msg.body,
+                        prefix=msg.prefix, suffix=msg.suffix, priority=msg.priority)
+
+    def onDequeue(self, msg, account):
+        self.writeEvent(EVENT_DEQUEUE, msg=msg.msg_id, account=account)
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        # text为实际发出去的内容，合并发送的是合并后的内容，避开重复弹幕时是换了前后缀的内容
+        fields = {}
+        if len(msg.part_list) > 1:
+            fields['parts'] = [part.msg_id for part in msg.part_list]
+        self.writeEvent(EVENT_SEND, msg=msg.msg_id, room=room_target.room_id, real_id=room_target.real_id,
+                        account=account, attempt=attempt, text=text, result=result.result_class, code=result.code,
+                        message=result.message, latency=round(latency, 6), sleep=round(sleep_time, 6), **fields)
+
+    def onRetry(self, msg, room_target, account, attempt, delay):
+        self.writeEvent(EVENT_RETRY, msg=msg.msg_id, room=room_target.room_id, account=account,
+                        attempt=attempt, delay=round(delay, 6))
+
+    def onRoomDone(self, msg, room_target, status):
+        self.writeEvent(EVENT_ROOM_DONE, msg=msg.msg_id, room=room_target.room_id, status=status)
+
+    def onMsgDone(self, msg):
+        self.writeEvent(EVENT_MSG_DONE, msg=msg.msg_id)
+
+    def getErrors(self):
+        return self.writer.getErrors()
+
+    def close(self):
+        self.writer.close()
+
+
+def createSessionLog(path, running_info):
+    # session_log为0时不记录，返回None
+    if running_info.get('session_log', '1') != '1':
+        return None
+    return SessionLog(history_writer.createHistoryWriter(path, running_info))
+
+
+def readSessionLog(path):
+    # 一行一行读出事件，不会把整个文件读进来，没写完的行(程序异常退出时)跳过
+    with open(path, 'r', encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            yield event
+
+
+if __name__ == "__main__":
+    pass
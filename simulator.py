@@ -0,0 +1,190 @@
+"""
+用虚拟时间模拟一个账号的发送过程，不联网也不真的等待
+发送器还是ActualTransimitter，只是把时间换成clock.VirtualClock，把请求换成SimulatedTransport
+两个小时、几十个直播间的发送几秒就能模拟完，可以用来检查发送间隔、队列增长和结束时的行为，也可以对比不同的发送策略
+多个账号的直播间是分开的，互不影响，每个账号单独模拟即可
+"""
+import os
+import random
+import clock
+import danmu_multitransmit
+import metrics
+import msg_queue
+import rate_scheduler
+import send_result
+import transmit_listener
+
+
+class SimulatedTransport():
+    # 模拟b站的发送接口，和benchmark/mock_live_server.py的判定方式一样
+    def __init__(self, sim_clock, rng, latency=0.1, jitter=0.0, send_interval=1.0, room_interval=0.0,
+                 fail_rate=0.0, filter_rate=0.0):
+        self.clock = sim_clock
+        self.random = rng
+        self.latency = latency  # 请求用时，发送器要等这么久
+        self.jitter = jitter
+        self.send_interval = send_interval  # 两条弹幕至少隔多久，太快返回"msg in 1s"，0为不限制
+        self.room_interval = room_interval  # 同一个直播间两条弹幕至少隔多久
+        self.fail_rate = fail_rate  # 按比例返回HTTP 500
+        self.filter_rate = filter_rate  # 按比例返回被屏蔽
+        self.last_time = -1e9
+        self.room_last_time = {}
+
+    def post(self, data):
+        self.clock.sleep(self.latency + (self.random.uniform(0, self.jitter) if self.jitter > 0 else 0.0))
+        now = self.clock.now()
+        room_id = data['roomid']
+        dice = self.random.random()
+        if dice < self.fail_rate:
+            return send_result.classifyResponse(500, None)
+        if now - self.last_time < self.send_interval or \
+                now - self.room_last_time.get(room_id, -1e9) < self.room_interval:
+            return send_result.classifyResponse(200, {'code': 0, 'message': 'msg in 1s'})
+        self.last_time = now
+        self.room_last_time[room_id] = now
+        if dice < self.fail_rate + self.filter_rate:
+            return send_result.classifyResponse(200, {'code': 0, 'message': 'f'})
+        return send_result.classifyResponse(200, {'code': 0, 'message': ''})
+
+    def close(self):
+        pass
+
+
+class SimulationStats(transmit_listener.TransmitListener):
+    # 按虚拟时间统计
+    def __init__(self, sim_clock):
+        self.clock = sim_clock
+        self.queue_wait = metrics.RollingHistogram(None)
+        self.fanout_time = metrics.RollingHistogram(None)
+        self.http_latency = metrics.RollingHistogram(None)
+        self.sleep_total = 0.0
+        self.result_count = {}  # key为结果类别
+        self.status_count = {}  # key为直播间的最终状态
+        self.last_done_time = None  # 最后一条消息处理完的时间
+
+    def onDequeue(self, msg, account):
+        self.queue_wait.add(self.clock.now() - msg.enqueue_time)
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        self.http_latency.add(latency)
+        self.sleep_total += sleep_time
+        self.result_count[result.result_class] = self.result_count.get(result.result_class, 0) + 1
+
+    def onRoomDone(self, msg, room_target, status):
+        self.status_count[status] = self.status_count.get(status, 0) + 1
+
+    def onMsgDone(self, msg):
+        self.fanout_time.add(self.clock.now() - msg.enqueue_time)
+        self.last_done_time = self.clock.now()
+
+
+def makeWorkload(duration, msg_interval, rng, burst_interval=0.0, burst_size=0, priority=msg_queue.PRIORITY_NORMAL):
+    """
+    生成要发送的消息，返回按时间排序的[(时间, 内容, 优先级)]
+    平均每msg_interval秒一条(指数分布)，burst_interval大于0时每隔这么久一次性来burst_size条，模拟刷屏
+    """
+    workload = []
+    t = rng.expovariate(1.0 / msg_interval) if msg_interval > 0 else duration
+    while t < duration:
+        workload.append((t, 'msg' + str(len(workload)), priority))
+        t += rng.expovariate(1.0 / msg_interval)
+    if burst_interval > 0:
+        t = burst_interval
+        while t < duration:
+            for index in range(burst_size):
+                workload.append((t, 'burst' + str(len(workload)), priority))
+            t += burst_interval
+    workload.sort(key=lambda item: item[0])
+    return workload
+
+
+class Simulation():
+    def __init__(self, running_info, room_num, workload, seed=0, sample_interval=60.0, **transport_args):
+        # running_info和RunningConfig.txt一样，transport_args传给SimulatedTransport
+        self.running_info = dict(running_info)
+        # 不读写真实的自适应间隔记录，每次模拟都从send_interval开始
+        self.running_info['pacing_state_path'] = os.devnull
+        self.workload = workload
+        self.sample_interval = sample_interval  # 多久记录一次队列长度
+        self.clock = clock.VirtualClock()
+        self.random = random.Random(seed)  # 服务器的随机判定和重发间隔都用这个，同一个种子结果一样
+        self.stats = SimulationStats(self.clock)
+        self.transport = SimulatedTransport(self.clock, self.random, **transport_args)
+        self.scheduler = rate_scheduler.createScheduler(self.running_info, self.clock.now)
+        self.room_target_list = []
+        for index in range(room_num):
+            room_target = danmu_multitransmit.RoomTarget(str(index + 1))
+            room_target.setResult(index + 100001, None)
+            self.room_target_list.append(room_target)
+        account = {'name': '1', 'csrf_token': 'sim', 'cookie': 'sim',
+                   'words_limit': int(self.running_info.get('words_limit', '20'))}
+        self.sender = danmu_multitransmit.ActualTransimitter(
+            self.room_target_list, account, self.running_info, self.scheduler, self.stats,
+            send_clock=self.clock, send_transport=self.transport, send_random=self.random)
+        self.rejected_num = 0
+        self.queue_samples = []  # [(时间, 队列中的消息数, 还要发送的次数)]
+        self.max_pending = 0
+
+    def deliver(self, arrive_time, text, priority):
+        msg = danmu_multitransmit.DanmuMsg(text, priority, len(self.room_target_list))
+        msg.enqueue_time = arrive_time
+        self.stats.onEnqueue(msg)
+        if not self.sender.addMsg(msg):
+            self.rejected_num += 1
+            for room_target in self.room_target_list:
+                danmu_multitransmit.finishRoom(self.stats, msg, room_target, transmit_listener.ROOM_FAILED)
+
+    def sample(self):
+        pending = self.sender.getPendingSendNum()
+        self.max_pending = max(self.max_pending, pending)
+        self.queue_samples.append((self.clock.now(), len(self.sender.msg_queue), pending))
+
+    def run(self):
+        # 单线程推进：送达到时间的消息，让发送器做一步，没事可做时把时间拨到下一件事
+        index = 0
+        next_sample_time = 0.0
+        closed = False
+        while True:
+            while index < len(self.workload) and self.workload[index][0] <= self.clock.now():
+                self.deliver(*self.workload[index])
+                index += 1
+            if not closed and index == len(self.workload):
+                self.sender.msg_queue.close()  # 和stop一样，剩余消息发完后结束
+                closed = True
+            while next_sample_time <= self.clock.now():
+                self.sample()
+                next_sample_time += self.sample_interval
+            if not self.sender.step(0):
+                break
+            wake_time = self.sender.nextWakeTime()
+            if wake_time == 0:
+                continue
+            wait_list = [wait for wait in (wake_time, next_sample_time - self.clock.now()) if wait is not None]
+            if index < len(self.workload):
+                wait_list.append(self.workload[index][0] - self.clock.now())
+            self.clock.sleep(min(wait_list))
+        self.sample()
+        return self.getReport()
+
+    def getReport(self):
+        last_arrive_time = self.workload[-1][0] if len(self.workload) > 0 else 0.0
+        end_time = self.clock.now()
+        return {
+            'duration': end_time,
+            'messages': len(self.workload),
+            'rejected': self.rejected_num,
+            'sends': sum(self.stats.result_count.values()),
+            'results': dict(self.stats.result_count),
+            'room_status': dict(self.stats.status_count),
+            'queue_wait': self.stats.queue_wait.percentiles([50, 95, 99]),
+            'fanout': self.stats.fanout_time.percentiles([50, 95, 99]),
+            'sleep_ratio': self.stats.sleep_total / end_time if end_time > 0 else 0.0,
+            'max_pending': self.max_pending,
+            'drain_time': end_time - last_arrive_time,  # 最后一条消息到达之后还要多久才发完
+            'final_interval': self.scheduler.getAccountInterval(self.sender.account),
+            'queue_samples': self.queue_samples,
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,33 @@
+"""
+发送结果传回界面
+发送线程不能直接操作界面，各直播间的发送结果先放到这里，界面线程定时一批批取走，更新记录框中对应的行
+放入只是deque.append，取出只是popleft，两个都是原子操作，发送线程不用等锁
+"""
+import collections
+import transmit_listener
+
+
+ROOM_PENDING = 'pending'  # 还没发完，界面上的初始状态
+
+
+class StatusChannel(transmit_listener.TransmitListener):
+    def __init__(self):
+        self.event_deque = collections.deque()  # 元素为(消息编号, 房间号, 状态)
+
+    def onRoomDone(self, msg, room_target, status):
+        # 在发送线程中调用，合并发送的消息会按原来的每一条分别调用
+        self.event_deque.append((msg.msg_id, room_target.room_id, status))
+
+    def drain(self, max_num):
+        # 在界面线程中调用，最多取出max_num个，剩下的下次再取，不会一次卡住界面太久
+        event_list = []
+        while len(event_list) < max_num:
+            try:
+                event_list.append(self.event_deque.popleft())
+            except IndexError:
+                break
+        return event_list
+
+
+if __name__ == "__main__":
+    pass
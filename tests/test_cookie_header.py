@@ -0,0 +1,77 @@
+"""
+发送时cookie请求头的测试
+在本地起一个http服务，检查线程版和asyncio版实际发出的Cookie请求头，要和配置中的cookie字符串完全一样
+在程序目录运行: python -m unittest discover tests
+"""
+import http.server
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_transmit
+import danmu_multitransmit
+import rate_scheduler
+import transmit_listener
+
+
+class CaptureHandler(http.server.BaseHTTPRequestHandler):
+    # 记下每次发送收到的Cookie请求头，原样保存，不做解析
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', '0'))
+        self.rfile.read(length)
+        self.server.cookie_list.append(self.headers.get('Cookie'))
+        body = b'{"code": 0, "data": [], "message": "", "msg": ""}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CookieHeaderTest(unittest.TestCase):
+    COOKIE = 'SESSDATA=abc%2C123%2Cxyz*; bili_jct=c1; DedeUserID=1'
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), CaptureHandler)
+        self.server.cookie_list = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sendOne(self, sender_class):
+        # 用sender_class发一条弹幕，返回服务端收到的Cookie请求头
+        running_info = {
+            'api_base': 'http://127.0.0.1:%d' % self.server.server_port,
+            'send_interval': '0',
+            'room_interval': '0',
+        }
+        account = {'name': '1', 'csrf_token': 'c1', 'cookie': self.COOKIE, 'words_limit': 20}
+        room_target = danmu_multitransmit.RoomTarget('1')
+        room_target.setResult(1, None)
+        scheduler = rate_scheduler.createScheduler(running_info)
+        sender = sender_class([room_target], account, running_info, scheduler, transmit_listener.ListenerGroup())
+        sender.start()
+        sender.addMsg(danmu_multitransmit.DanmuMsg('测试', room_num=1))
+        sender.stop()
+        sender.thread.join(10)
+        self.assertFalse(sender.thread.is_alive())
+        return self.server.cookie_list
+
+    def testThreadEngine(self):
+        self.assertEqual(self.sendOne(danmu_multitransmit.ActualTransimitter), [self.COOKIE])
+
+    @unittest.skipUnless(async_transmit.isAvailable(), '没有安装aiohttp')
+    def testAsyncEngine(self):
+        self.assertEqual(self.sendOne(async_transmit.AsyncTransimitter), [self.COOKIE])
+
+
+if __name__ == "__main__":
+    unittest.main()
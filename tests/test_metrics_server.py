@@ -0,0 +1,67 @@
+"""
+统计接口计数器的测试
+多个线程同时加时计数要准确，不能少计
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics_server
+
+
+THREAD_NUM = 8
+INC_NUM = 20000
+
+
+def runThreads(target):
+    thread_list = [threading.Thread(target=target) for _ in range(THREAD_NUM)]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+
+
+class CounterTest(unittest.TestCase):
+    def testConcurrentInc(self):
+        counter = metrics_server.Counter()
+
+        def work():
+            for _ in range(INC_NUM):
+                counter.inc()
+        runThreads(work)
+        self.assertEqual(counter.value(), THREAD_NUM * INC_NUM)
+
+    def testLabeledCounter(self):
+        counter = metrics_server.LabeledCounter()
+
+        def work():
+            for index in range(INC_NUM):
+                counter.inc('room', str(index % 2))
+        runThreads(work)
+        self.assertEqual(sorted(counter.items()), [(('room', '0'), THREAD_NUM * INC_NUM // 2),
+                                                   (('room', '1'), THREAD_NUM * INC_NUM // 2)])
+
+
+class HistogramTest(unittest.TestCase):
+    def testConcurrentObserve(self):
+        histogram = metrics_server.Histogram([1.0, 2.0])
+
+        def work():
+            for index in range(INC_NUM):
+                histogram.observe(0.5 if index % 2 == 0 else 3.0)
+        runThreads(work)
+        lines = histogram.render('test', 'help')
+        total = THREAD_NUM * INC_NUM
+        self.assertIn('test_bucket{le="1.0"} ' + str(total // 2), lines)
+        self.assertIn('test_bucket{le="2.0"} ' + str(total // 2), lines)
+        self.assertIn('test_bucket{le="+Inf"} ' + str(total), lines)
+        self.assertIn('test_sum ' + repr(float(total // 2 * 0.5 + total // 2 * 3.0)), lines)
+        self.assertIn('test_count ' + str(total), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
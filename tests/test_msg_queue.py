@@ -0,0 +1,133 @@
+"""
+消息队列的测试
+按优先级取出、同一优先级内先进先出，满了之后的三种策略(block、drop_oldest、reject)，关闭之后取到STOP
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import queue
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msg_queue
+
+
+class LaneTest(unittest.TestCase):
+    def testPriorityOrder(self):
+        q = msg_queue.MsgQueue()
+        q.put('n1')
+        q.put('b1', priority=msg_queue.PRIORITY_BACKGROUND)
+        q.put('h1', priority=msg_queue.PRIORITY_HIGH)
+        q.put_many(['n2', 'n3'])
+        q.put('h2', priority=msg_queue.PRIORITY_HIGH)
+        self.assertEqual(q.get(), 'h1')
+        self.assertEqual(q.get_many(10), ['h2', 'n1', 'n2', 'n3', 'b1'])
+
+    def testDropOldestLowestLane(self):
+        # 满了时先丢优先级最低的
+        dropped_list = []
+        q = msg_queue.MsgQueue(2, msg_queue.POLICY_DROP_OLDEST, dropped_list.append)
+        q.put('h1', priority=msg_queue.PRIORITY_HIGH)
+        q.put('b1', priority=msg_queue.PRIORITY_BACKGROUND)
+        q.put('n1')
+        self.assertEqual(dropped_list, ['b1'])
+        self.assertEqual(q.get_many(10), ['h1', 'n1'])
+
+    def testGetIf(self):
+        q = msg_queue.MsgQueue()
+        q.put('n1')
+        q.put('h1', priority=msg_queue.PRIORITY_HIGH)
+        self.assertIsNone(q.get_if(lambda msg: msg.startswith('n')))  # 下一条是h1
+        self.assertEqual(q.get_if(lambda msg: msg.startswith('h')), 'h1')
+        self.assertEqual(len(q), 1)
+
+
+class PolicyTest(unittest.TestCase):
+    def testUnknownPolicy(self):
+        with self.assertRaises(ValueError):
+            msg_queue.MsgQueue(1, 'unknown')
+
+    def testReject(self):
+        q = msg_queue.MsgQueue(2, msg_queue.POLICY_REJECT)
+        self.assertTrue(q.put('a'))
+        self.assertTrue(q.put('b'))
+        self.assertFalse(q.put('c'))
+        self.assertEqual(q.put_many(['c', 'd']), 0)
+        self.assertEqual(q.get_many(10), ['a', 'b'])
+
+    def testDropOldest(self):
+        dropped_list = []
+        q = msg_queue.MsgQueue(2, msg_queue.POLICY_DROP_OLDEST, dropped_list.append)
+        self.assertEqual(q.put_many(['a', 'b', 'c']), 3)
+        self.assertTrue(q.put('d'))
+        self.assertEqual(dropped_list, ['a', 'b'])
+        self.assertEqual(q.dropped_num, 2)
+        self.assertEqual(q.get_many(10), ['c', 'd'])
+
+    def testBlockTimeout(self):
+        q = msg_queue.MsgQueue(1, msg_queue.POLICY_BLOCK)
+        self.assertTrue(q.put('a'))
+        self.assertFalse(q.put('b', timeout=0.01))
+        self.assertEqual(len(q), 1)
+
+    def testBlockUntilGet(self):
+        q = msg_queue.MsgQueue(1, msg_queue.POLICY_BLOCK)
+        q.put('a')
+        result_list = []
+        thread = threading.Thread(target=lambda: result_list.append(q.put('b', timeout=5)))
+        thread.start()
+        self.assertEqual(q.get(), 'a')
+        thread.join()
+        self.assertEqual(result_list, [True])
+        self.assertEqual(q.get(), 'b')
+
+    def testBlockWakesOnClose(self):
+        q = msg_queue.MsgQueue(1, msg_queue.POLICY_BLOCK)
+        q.put('a')
+        result_list = []
+        thread = threading.Thread(target=lambda: result_list.append(q.put('b', timeout=5)))
+        thread.start()
+        q.close()
+        thread.join()
+        self.assertEqual(result_list, [False])
+
+
+class StopTest(unittest.TestCase):
+    def testGetAfterClose(self):
+        q = msg_queue.MsgQueue()
+        q.put('a')
+        q.close()
+        self.assertFalse(q.put('b'))
+        self.assertEqual(q.get(), 'a')  # 关闭前的消息还能取出来
+        self.assertIs(q.get(), msg_queue.MsgQueue.STOP)
+        self.assertIs(q.get(), msg_queue.MsgQueue.STOP)
+
+    def testGetManyAroundClose(self):
+        q = msg_queue.MsgQueue()
+        q.put_many(['a', 'b', 'c'])
+        self.assertEqual(q.get_many(2), ['a', 'b'])
+        q.close()
+        self.assertEqual(q.get_many(2), ['c'])
+        self.assertEqual(q.get_many(2), [])
+
+    def testTimeoutWhenEmpty(self):
+        q = msg_queue.MsgQueue()
+        with self.assertRaises(queue.Empty):
+            q.get(timeout=0.01)
+        with self.assertRaises(queue.Empty):
+            q.get_many(10, timeout=0.01)
+
+    def testCloseWakesWaitingGet(self):
+        q = msg_queue.MsgQueue()
+        result_list = []
+        thread = threading.Thread(target=lambda: result_list.append(q.get_many(10, timeout=5)))
+        thread.start()
+        q.close()
+        thread.join()
+        self.assertEqual(result_list, [[]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+自适应发送间隔的测试
+用simulator在虚拟时间里对比static和aimd，aimd不能比固定间隔更差
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pacing
+import send_result
+import simulator
+
+
+def simulate(pacing_name, jitter, burst_interval=0.0, burst_size=0):
+    running_info = {
+        'send_interval': '1.0',
+        'room_interval': '1.0',
+        'pacing': pacing_name,
+        'queue_size': '1000',
+    }
+    workload = simulator.makeWorkload(1800, 60.0, random.Random(0), burst_interval, burst_size)
+    simulation = simulator.Simulation(running_info, 10, workload, seed=0, latency=0.1, jitter=jitter)
+    return simulation.run()
+
+
+class AimdPacerTest(unittest.TestCase):
+    def testFloorDefaultsToSendInterval(self):
+        pacer = pacing.createPacer(
+            {'pacing': 'aimd', 'send_interval': '1.0', 'pacing_state_path': os.devnull}, {'name': '1', 'cookie': ''})
+        for _ in range(100):
+            pacer.onResult(send_result.SendResult(send_result.RESULT_OK))
+        self.assertEqual(pacer.interval, 1.0)
+
+    def testBackoffOnRateLimited(self):
+        pacer = pacing.AimdPacer(1.0, 1.0, 3.0, 0.02, 1.5)
+        pacer.onResult(send_result.SendResult(send_result.RESULT_RATE_LIMITED))
+        self.assertEqual(pacer.interval, 1.5)
+        pacer.onResult(send_result.SendResult(send_result.RESULT_NETWORK))
+        self.assertEqual(pacer.interval, 1.5)
+
+
+class AimdVersusStaticTest(unittest.TestCase):
+    def assertNotWorse(self, **scenario):
+        static = simulate('static', **scenario)
+        aimd = simulate('aimd', **scenario)
+        self.assertLessEqual(aimd['results'].get(send_result.RESULT_RATE_LIMITED, 0),
+                             static['results'].get(send_result.RESULT_RATE_LIMITED, 0))
+        self.assertLessEqual(aimd['drain_time'], static['drain_time'] * 1.05)
+        self.assertGreaterEqual(aimd['room_status'].get('sent', 0), static['room_status'].get('sent', 0))
+
+    def testNoJitter(self):
+        self.assertNotWorse(jitter=0.0)
+
+    def testJitter(self):
+        self.assertNotWorse(jitter=0.05)
+
+    def testBurst(self):
+        self.assertNotWorse(jitter=0.05, burst_interval=300.0, burst_size=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
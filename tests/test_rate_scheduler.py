@@ -0,0 +1,98 @@
+"""
+发送速率控制的测试
+用手动拨动的时钟检查令牌桶和预约发送时返回的等待时间
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_scheduler
+
+
+class FakeClock():
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        return self.time
+
+
+class TokenBucketTest(unittest.TestCase):
+    def testBurstThenRate(self):
+        bucket = rate_scheduler.TokenBucket(1.0, 2, 0.0)
+        self.assertEqual(bucket.delay(0.0), 0.0)
+        bucket.consume(0.0)
+        bucket.consume(0.0)
+        self.assertAlmostEqual(bucket.delay(0.0), 1.0)
+        self.assertAlmostEqual(bucket.delay(0.4), 0.6)
+
+    def testCapacityLimit(self):
+        # 很久没发送，令牌也不会超过capacity
+        bucket = rate_scheduler.TokenBucket(1.0, 2, 0.0)
+        bucket.refill(100.0)
+        self.assertEqual(bucket.tokens, 2.0)
+
+    def testFutureConsume(self):
+        # 预约到以后的令牌，下一个要再往后等
+        bucket = rate_scheduler.TokenBucket(1.0, 1, 0.0)
+        bucket.consume(0.0)
+        bucket.consume(1.0)
+        self.assertAlmostEqual(bucket.delay(0.0), 2.0)
+
+
+class RateSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def testAccountInterval(self):
+        scheduler = rate_scheduler.RateScheduler(1.0, 1, 0.0, 1, self.clock.now)
+        self.assertEqual(scheduler.reserve('a', 1), 0.0)
+        self.assertAlmostEqual(scheduler.reserve('a', 2), 1.0)
+        self.assertAlmostEqual(scheduler.reserve('a', 3), 2.0)  # 已经预约的也算上
+        self.assertEqual(scheduler.reserve('b', 1), 0.0)  # 账号之间互不影响
+        self.clock.time = 2.5
+        self.assertAlmostEqual(scheduler.reserve('a', 1), 0.5)
+
+    def testRoomInterval(self):
+        scheduler = rate_scheduler.RateScheduler(0.0, 1, 2.0, 1, self.clock.now)
+        self.assertEqual(scheduler.reserve('a', 1), 0.0)
+        self.assertAlmostEqual(scheduler.reserve('b', 1), 2.0)  # 不同账号发同一个直播间也要等
+        self.assertEqual(scheduler.reserve('a', 2), 0.0)
+
+    def testWaitForSlowerBucket(self):
+        # 两个桶都要有令牌，等得久的那个说了算，两个桶的令牌都被取走
+        scheduler = rate_scheduler.RateScheduler(1.0, 1, 3.0, 1, self.clock.now)
+        scheduler.reserve('a', 1)
+        self.assertAlmostEqual(scheduler.reserve('a', 1), 3.0)
+        self.assertAlmostEqual(scheduler.reserve('a', 2), 4.0)
+
+    def testBurst(self):
+        scheduler = rate_scheduler.RateScheduler(1.0, 3, 0.0, 1, self.clock.now)
+        self.assertEqual([scheduler.reserve('a', room) for room in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(scheduler.reserve('a', 3), 1.0)
+
+    def testMargin(self):
+        scheduler = rate_scheduler.RateScheduler(1.0, 1, 0.0, 1, self.clock.now, margin=0.5)
+        scheduler.reserve('a', 1)
+        self.assertAlmostEqual(scheduler.reserve('a', 1), 1.5)
+
+    def testSetAccountInterval(self):
+        scheduler = rate_scheduler.RateScheduler(1.0, 1, 0.0, 1, self.clock.now)
+        scheduler.reserve('a', 1)
+        self.clock.time = 1.0
+        scheduler.setAccountInterval('a', 2.0)
+        scheduler.reserve('a', 1)
+        self.assertAlmostEqual(scheduler.reserve('a', 1), 2.0)
+        self.assertEqual(scheduler.getAccountInterval('a'), 2.0)
+        self.assertEqual(scheduler.getAccountInterval('b'), 1.0)
+
+    def testCreateScheduler(self):
+        scheduler = rate_scheduler.createScheduler({'send_interval': '1.5'}, self.clock.now)
+        self.assertEqual((scheduler.account_interval, scheduler.room_interval, scheduler.margin), (1.5, 1.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+长消息分段的测试
+没有安装regex模块时用简化的规则划分字，代理对、零宽连接符的emoji组合、组合符号都不能被分开
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import segmentation
+
+
+def surrogatePairs(text):
+    # 把基本平面以外的字符拆成UTF-16代理对，界面中取出的emoji可能是这样的两个字符
+    result = []
+    for c in text:
+        code = ord(c) - 0x10000
+        if code >= 0:
+            result.append(chr(0xD800 + (code >> 10)) + chr(0xDC00 + (code & 0x3FF)))
+        else:
+            result.append(c)
+    return ''.join(result)
+
+
+class FallbackGraphemeTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(segmentation, 'regex', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testSurrogatePair(self):
+        text = surrogatePairs('a\U0001f600b\U0001f44d\U0001f3fd')
+        self.assertEqual(len(text), 8)
+        self.assertEqual(segmentation.splitGraphemes(text), ['a', '\U0001f600', 'b', '\U0001f44d\U0001f3fd'])
+
+    def testZwjSequence(self):
+        family = '\U0001f468\u200d\U0001f469\u200d\U0001f467\u200d\U0001f466'
+        self.assertEqual(segmentation.splitGraphemes('x' + family + 'y'), ['x', family, 'y'])
+        self.assertEqual(segmentation.splitGraphemes(surrogatePairs(family)), [family])
+
+    def testCombiningMark(self):
+        self.assertEqual(segmentation.splitGraphemes('e\u0301\u0302a'), ['e\u0301\u0302', 'a'])
+        self.assertEqual(segmentation.splitGraphemes('1\ufe0f\u20e3'), ['1\ufe0f\u20e3'])
+        self.assertEqual(segmentation.splitGraphemes('\u0e01\u0e33'), ['\u0e01\u0e33'])
+
+    def testHangulJamo(self):
+        self.assertEqual(segmentation.splitGraphemes('\u1100\u1161\u11a8\u1100'), ['\u1100\u1161\u11a8', '\u1100'])
+        self.assertEqual(segmentation.splitGraphemes('\uac00\u11a8\uac00'), ['\uac00\u11a8', '\uac00'])
+
+    def testSplitTextKeepsClusters(self):
+        family = '\U0001f468\u200d\U0001f469\u200d\U0001f467\u200d\U0001f466'
+        for text in ('哈' * 9 + family * 3, surrogatePairs('哈' * 9 + family * 3), 'e\u0301' * 30):
+            segment_list = segmentation.splitText(text, 20)
+            self.assertEqual(''.join(segment_list), segmentation.joinSurrogates(text))
+            for segment in segment_list:
+                self.assertLessEqual(segmentation.textLen(segment), 20)
+                self.assertNotIn(segment[0], '\u200d\u0301')
+
+
+class TextLenTest(unittest.TestCase):
+    def testEmojiCountsTwo(self):
+        self.assertEqual(segmentation.textLen('a\U0001f600'), 3)
+        self.assertEqual(segmentation.textLen(surrogatePairs('a\U0001f600')), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+发送结果处理方式的测试
+未登录、被禁言时整个账号停止发送，只提示一次；设为pause时一个账号只暂停一次
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import send_result
+import simulator
+import transmit_listener
+
+
+def runNotLoggedIn(extra_info, room_num=5, msg_num=4):
+    # 服务器一直返回未登录，返回(模拟结果, 提示列表)
+    running_info = {'send_interval': '1.0', 'room_interval': '0', 'retry_base': '1.0', 'retry_max': '3'}
+    running_info.update(extra_info)
+    workload = [(0.0, 'msg' + str(index), 1) for index in range(msg_num)]
+    simulation = simulator.Simulation(running_info, room_num, workload)
+    simulation.transport.post = lambda data: send_result.classifyResponse(200, {'code': -101, 'message': '账号未登录'})
+    report = simulation.run()
+    return report, list(simulation.sender.alert_deque)
+
+
+class DecideTest(unittest.TestCase):
+    def testDefaultStopsAccount(self):
+        policy = send_result.createResultPolicy({})
+        for result_class in (send_result.RESULT_NOT_LOGGED_IN, send_result.RESULT_BANNED):
+            decision = policy.decide(send_result.SendResult(result_class), 0, '房间1「a」', None)
+            self.assertEqual(decision.status, transmit_listener.ROOM_FAILED)
+            self.assertTrue(decision.stop_account)
+
+    def testRetryMax(self):
+        policy = send_result.createResultPolicy({'retry_max': '2'})
+        rate_limited = send_result.SendResult(send_result.RESULT_RATE_LIMITED)
+        decision = policy.decide(rate_limited, 1, '房间1「a」', random.Random(0))
+        self.assertIsNone(decision.status)
+        decision = policy.decide(rate_limited, 2, '房间1「a」', None)
+        self.assertEqual(decision.status, transmit_listener.ROOM_FAILED)
+        self.assertIn('重发2次后放弃', decision.alert)
+
+
+class AccountStopTest(unittest.TestCase):
+    def testStopOnce(self):
+        report, alert_list = runNotLoggedIn({})
+        self.assertEqual(report['sends'], 1)  # 之后的都不再发送
+        self.assertEqual(report['room_status'], {transmit_listener.ROOM_FAILED: 20})
+        self.assertEqual(len(alert_list), 1)
+
+    def testPauseOnce(self):
+        report, alert_list = runNotLoggedIn({'policy_not_logged_in': 'pause', 'pause_time': '60'})
+        self.assertEqual(report['sends'], 2)  # 暂停前一次，暂停后一次，然后停止发送
+        self.assertEqual(report['room_status'], {transmit_listener.ROOM_FAILED: 20})
+        self.assertEqual(len(alert_list), 2)
+        self.assertIn('暂停发送60秒', alert_list[0])
+        self.assertIn('停止发送', alert_list[1])
+        self.assertLess(report['duration'], 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
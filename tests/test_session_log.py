@@ -0,0 +1,39 @@
+"""
+发送日志的测试
+send事件记录实际发出去的内容，避开重复弹幕时是换过的内容
+在程序目录运行: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_log
+import simulator
+import transmit_listener
+
+
+class SendTextTest(unittest.TestCase):
+    def testVariantText(self):
+        running_info = {'send_interval': '1.0', 'room_interval': '0', 'dedup': 'variant',
+                        'dedup_variant_suffixes': '～,。'}
+        workload = [(0.0, 'same', 1) for _ in range(3)]
+        simulation = simulator.Simulation(running_info, 1, workload)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'session.jsonl')
+            log = session_log.createSessionLog(path, running_info)
+            listener = transmit_listener.ListenerGroup()
+            listener.addListener(simulation.stats)
+            listener.addListener(log)
+            simulation.sender.listener = listener
+            simulation.run()
+            log.close()
+            text_list = [record['text'] for record in session_log.readSessionLog(path)
+                         if record['event'] == session_log.EVENT_SEND]
+        self.assertEqual(text_list, ['same', 'same～', 'same。'])
+
+
+if __name__ == "__main__":
+    unittest.main()
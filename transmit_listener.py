@@ -0,0 +1,80 @@
+"""
+发送过程中的事件，统计、日志等需要知道发送情况的地方继承TransmitListener，只实现自己关心的方法
+发送器在发送线程(或事件循环)中调用这些方法，所以实现时不能太耗时，也不能直接操作界面
+"""
+
+ROOM_SENT = 'sent'  # 发送成功
+ROOM_FAILED = 'failed'  # 发送失败，重发次数用完或直播间获取失败等
+ROOM_SKIPPED = 'skipped'  # 按处理方式不再发送，如被屏蔽、超出长度
+
+
+class TransmitListener():
+    def onEnqueue(self, msg):
+        # 消息加入队列，在界面线程中调用
+        pass
+
+    def onDequeue(self, msg, account):
+        # 某个账号的发送器从队列中取出消息
+        pass
+
+    def onSendStart(self, msg, room_target, account, attempt):
+        # 开始向一个直播间发送，attempt为第几次重发，0表示第一次发送
+        pass
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        # 发送完成，result为send_result.SendResult，latency为请求用时，sleep_time为发送前按发送间隔等了多久
+        # text为实际发出去的内容，避开重复弹幕时换了前后缀，会和msg.text不一样
+        pass
+
+    def onRetry(self, msg, room_target, account, attempt, delay):
+        # 过delay秒后进行第attempt次重发
+        pass
+
+    def onRoomDone(self, msg, room_target, status):
+        # 这条消息在这个直播间不会再发了，status为ROOM_SENT、ROOM_FAILED或ROOM_SKIPPED
+        pass
+
+    def onMsgDone(self, msg):
+        # 这条消息在所有直播间都处理完了
+        pass
+
+
+class ListenerGroup(TransmitListener):
+    # 把事件转给多个listener
+    def __init__(self):
+        self.listener_list = []
+
+    def addListener(self, listener):
+        self.listener_list.append(listener)
+
+    def onEnqueue(self, msg):
+        for listener in self.listener_list:
+            listener.onEnqueue(msg)
+
+    def onDequeue(self, msg, account):
+        for listener in self.listener_list:
+            listener.onDequeue(msg, account)
+
+    def onSendStart(self, msg, room_target, account, attempt):
+        for listener in self.listener_list:
+            listener.onSendStart(msg, room_target, account, attempt)
+
+    def onSendEnd(self, msg, room_target, account, attempt, result, latency, sleep_time, text):
+        for listener in self.listener_list:
+            listener.onSendEnd(msg, room_target, account, attempt, result, latency, sleep_time, text)
+
+    def onRetry(self, msg, room_target, account, attempt, delay):
+        for listener in self.listener_list:
+            listener.onRetry(msg, room_target, account, attempt, delay)
+
+    def onRoomDone(self, msg, room_target, status):
+        for listener in self.listener_list:
+            listener.onRoomDone(msg, room_target, status)
+
+    def onMsgDone(self, msg):
+        for listener in self.listener_list:
+            listener.onMsgDone(msg)
+
+
+if __name__ == "__main__":
+    pass
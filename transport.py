@@ -0,0 +1,32 @@
+"""
+发送弹幕的请求，发送器通过transport发送，返回send_result.SendResult
+默认用requests的会话，模拟时换成simulator.SimulatedTransport
+"""
+import requests
+import send_result
+
+
+class RequestsTransport():
+    def __init__(self, session, send_url, timeout):
+        self.session = session  # 请求头和cookie已经在会话中
+        self.send_url = send_url
+        self.timeout = timeout
+
+    def post(self, data):
+        try:
+            send_response = self.session.post(self.send_url, data=data, timeout=self.timeout)
+            # 响应时间大概在0.1~0.2s左右
+            try:
+                body = send_response.json()
+            except ValueError:
+                body = None
+            return send_result.classifyResponse(send_response.status_code, body)
+        except requests.RequestException as e:
+            return send_result.classifyException(e)
+
+    def close(self):
+        self.session.close()  # 关闭连接池
+
+
+if __name__ == "__main__":
+    pass